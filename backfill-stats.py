@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import copy
 from datetime import datetime
 import logging
@@ -8,8 +9,13 @@ import os
 import time
 
 # local imports
+from github_stats.discovery import discover_repos
 from github_stats.github_api import GithubAccess
-from github_stats.outputs.influx import InfluxOutput
+from github_stats.journal import BackfillJournal
+from github_stats.outputs.fanout import OUTPUTS, OutputFanout
+from github_stats.profiling import PROFILE_MODES, Profiler
+from github_stats.ratelimit import RateLimitBudget
+from github_stats.usercache import load_user_cache
 from github_stats.util import load_config
 
 SCRIPTDIR = os.path.dirname(os.path.realpath(__file__))
@@ -38,9 +44,10 @@ def cli_opts():
     parser.add_argument(
         "-w",
         "--window",
-        default=1,
+        default=[1],
+        nargs="+",
         type=int,
-        help="Number of days worth of data to collect",
+        help="Number of days worth of data to collect (several windows are collected in one pass)",
     )
     parser.add_argument(
         "--start-timestamp",
@@ -64,7 +71,60 @@ def cli_opts():
         "--sleep-time",
         default=3600,
         type=float,
-        help="Time (in seconds) to wait between runs (will be <= 3600 seconds)",
+        help="Time (in seconds) to wait between runs with '--pacing clock' (will be <= 3600 seconds)",
+    )
+    parser.add_argument(
+        "--pacing",
+        default="quota",
+        choices=["quota", "clock"],
+        help="Run back-to-back while API quota remains (quota) or at fixed times each hour (clock)",
+    )
+    parser.add_argument(
+        "--output",
+        action="append",
+        # scrape endpoints can't take historical data
+        choices=[o for o in OUTPUTS if o != "prometheus"],
+        help="Where to send collected stats (repeatable, defaults to 'outputs' in config or influx)",
+    )
+    parser.add_argument(
+        "--collect-once",
+        action="store_true",
+        default=False,
+        help="Fetch each repo's data once and compute every timestamp from memory (no sleeping between runs)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        default=24,
+        type=int,
+        help="Number of timestamps to write at once with --collect-once",
+    )
+    parser.add_argument(
+        "--workers",
+        default=1,
+        type=int,
+        help="Number of units (repo/timestamp, or repos with --collect-once) to process concurrently",
+    )
+    parser.add_argument(
+        "--journal",
+        default="",
+        help="File recording finished units so an interrupted backfill can resume (defaults to <repo_folder>/backfill-journal.jsonl)",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        default=False,
+        help="Ignore (and remove) any existing journal and backfill everything",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=PROFILE_MODES,
+        default=None,
+        help="Profile each collection section and output step (cpu or memory)",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        default="profiles",
+        help="Where to write profiling reports",
     )
     return parser.parse_args()
 
@@ -107,15 +167,137 @@ def _wait(positions):
     time.sleep(sleep_time)
 
 
-def main():
-    args = cli_opts()
-    if args.debug:
-        logger.setLevel(logging.DEBUG)
+def _load_stats(gh, timestamp, window, attempts=3):
+    """
+    retry stat collection a few times in case we get a failure
+
+    The last failure is raised, so the unit stays out of the journal
+    (and is collected again on the next run)
+    """
+    for attempt in range(attempts):
+        # don't double count whatever a failed attempt collected
+        if attempt:
+            gh.reset_stats()
+        try:
+            gh.load_all_stats(timestamp, window)
+            return
+        except Exception as e:
+            logger.warning(
+                f"Attempt {attempt + 1}/{attempts} to collect {gh.repo_name} at {timestamp} failed: {e}"
+            )
+            if attempt == attempts - 1:
+                raise
+
+
+def backfill_once(
+    config, repo, timestamps, args, budget, journal, profiler=None, user_cache=None
+):
+    """
+    Collect a repo's raw data (API results and commit logs) once and
+    compute stats for every timestamp from that in-memory copy
+
+    Stats are written every `--batch-size` timestamps so we make
+    a handful of bulk writes instead of one per timestamp
 
+    :returns: None
     """
-    Bucket time into chunks based on our sleep time
-    so we run the script at the same time(s) every hour
+    timestamps = [ts for ts in timestamps if not journal.done(repo["name"], ts)]
+    if not timestamps:
+        logger.info(f"{repo['name']} is already backfilled, skipping")
+        return
+    local_config = copy.deepcopy(config)
+    local_config.pop("repos", None)
+    local_config["repo"] = repo
+    gh = GithubAccess(local_config, budget, profiler, user_cache=user_cache)
+    gh.cache_raw_data = True
+    output = OutputFanout(
+        local_config, datetime.utcfromtimestamp(timestamps[0]), args.output, profiler
+    )
+    starttime = time.time()
+    batch = list()
+    for run in timestamps:
+        timestamp = datetime.utcfromtimestamp(run)
+        logger.info(f"Processing data for {repo['name']} at {timestamp}...")
+        gh.reset_stats()
+        try:
+            _load_stats(gh, timestamp, args.window)
+        except Exception:
+            # keep what we've already collected
+            if batch:
+                output.write_stats()
+                journal.record(repo["name"], batch)
+            raise
+        output.set_timestamp(timestamp)
+        output.format_stats(gh.stats)
+        batch.append(run)
+        if len(batch) >= args.batch_size:
+            output.write_stats()
+            journal.record(repo["name"], batch)
+            batch = list()
+    if batch:
+        output.write_stats()
+        journal.record(repo["name"], batch)
+    logger.info(
+        f"Backfilled {len(timestamps)} timestamps for {repo['name']} in {time.time() - starttime} seconds ({budget.requests} API requests so far)"
+    )
+
+
+def backfill_unit(
+    config, repo, run, args, budget, journal, profiler=None, user_cache=None
+):
+    """
+    Collect and write a single (repo, timestamp) unit
+
+    :returns: None
+    """
+    local_config = copy.deepcopy(config)
+    local_config.pop("repos", None)
+    local_config["repo"] = repo
+    timestamp = datetime.utcfromtimestamp(run)
+    logger.info(f"Processing data for {repo['name']} at {timestamp}...")
+    # we should load GithubAccess every run to ensure we don't lose access tokens/etc.
+    gh = GithubAccess(local_config, budget, profiler, user_cache=user_cache)
+    output = OutputFanout(local_config, timestamp, args.output, profiler)
+    _load_stats(gh, timestamp, args.window)
+    output.format_stats(gh.stats)
+    output.write_stats()
+    journal.record(repo["name"], [run])
+
+
+def _run_all(func, jobs, workers):
+    """
+    Run jobs (tuples of arguments) on a pool, logging failures
+    rather than stopping (the journal tells us what's left)
+
+    :returns: number of failed jobs
+    :rtype: int
+    """
+    failures = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(func, *job) for job in jobs]
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception:
+                logger.exception("Backfill unit failed")
+                failures += 1
+    return failures
+
+
+def _run_serial(
+    config, timestamps, args, budget, journal, profiler=None, user_cache=None
+):
+    """
+    Run every unit one at a time, pacing runs by the clock or the rate limit
+
+    Like _run_all, failures are logged rather than stopping the backfill
+    (the journal tells us what's left)
+
+    :returns: number of failed units
+    :rtype: int
     """
+    # bucket time into chunks based on our sleep time
+    # so we run the script at the same time(s) every hour
     if args.sleep_time > 3600:
         sleep_time = 3600
     else:
@@ -134,34 +316,113 @@ def main():
     positions = sorted(positions)
     logger.debug(f"{positions=}")
 
-    # actually set up environment
+    # the most requests a single run has needed so far
+    run_cost = 0
+    failures = 0
+    for run in timestamps:
+        repos = [
+            repo for repo in config["repos"] if not journal.done(repo["name"], run)
+        ]
+        if not repos:
+            continue
+        requests = budget.requests
+        for repo in repos:
+            try:
+                backfill_unit(
+                    config, repo, run, args, budget, journal, profiler, user_cache
+                )
+            except Exception:
+                logger.exception("Backfill unit failed")
+                failures += 1
+        if args.pacing == "clock":
+            # sleep for however long it takes to get to our next position
+            _wait(positions)
+            continue
+        """
+        Only pause when the next run probably won't fit in
+        the quota we have left (budget.acquire() still protects
+        us if a run turns out to be more expensive)
+        """
+        run_cost = max(run_cost, budget.requests - requests)
+        logger.debug(f"Run used {budget.requests - requests} requests ({run_cost=})")
+        budget.wait_for(run_cost)
+    return failures
+
+
+def main():
+    args = cli_opts()
+    if args.debug:
+        logger.setLevel(logging.DEBUG)
+    if args.workers > 1 and args.pacing == "clock":
+        raise Exception("Can't use '--pacing clock' with multiple workers")
+    if args.workers > 1 and args.profile:
+        raise Exception("Can't use '--profile' with multiple workers")
+
+    timestamps = list(
+        range(
+            int(args.start_timestamp),
+            int(args.stop_timestamp),
+            int(args.timestamp_step),
+        )
+    )
     config = load_config(args.config)
+    # every repo uses the same token, so they share one rate limit
+    budget = RateLimitBudget(config.get("query", {}).get("rate_limit_reserve", 100))
+    config["repos"] = discover_repos(config, budget)
+    # people work across repos, so resolve each Github login once per process
+    user_cache = load_user_cache(config)
+    profiler = None
+    if args.profile:
+        profiler = Profiler(args.profile, args.profile_dir)
+    journal = BackfillJournal(
+        args.journal or f"{config['repo_folder']}/backfill-journal.jsonl",
+        args.restart,
+    )
+    if args.collect_once:
+        failures = _run_all(
+            backfill_once,
+            [
+                (config, repo, timestamps, args, budget, journal, profiler, user_cache)
+                for repo in config["repos"]
+            ],
+            max(args.workers, 1),
+        )
+        if failures:
+            raise SystemExit(1)
+        return
+
+    units = [
+        (run, repo)
+        for run in timestamps
+        for repo in config["repos"]
+        if not journal.done(repo["name"], run)
+    ]
+    logger.info(
+        f"{len(units)} of {len(timestamps) * len(config['repos'])} units left to backfill"
+    )
+    if args.workers > 1:
+        """
+        Units are independent, so just run them concurrently.
+        The shared budget pauses every worker when we get
+        close to the rate limit
+        """
+        failures = _run_all(
+            backfill_unit,
+            [
+                (config, repo, run, args, budget, journal, profiler, user_cache)
+                for run, repo in units
+            ],
+            args.workers,
+        )
+        if failures:
+            raise SystemExit(1)
+        return
 
-    for run in range(
-        int(args.start_timestamp),
-        int(args.stop_timestamp),
-        int(args.timestamp_step),
-    ):
-        for repo in config["repos"]:
-            local_config = copy.deepcopy(config)
-            local_config.pop("repos", None)
-            local_config["repo"] = repo
-            timestamp = datetime.utcfromtimestamp(run)
-            logger.info(f"Processing data for {timestamp}...")
-            # we should load GithubAccess every run to ensure we don't lose access tokens/etc.
-            gh = GithubAccess(local_config)
-            influx = InfluxOutput(local_config, timestamp)
-            # retry stat collection a few times in case we get a failure
-            for _ in range(3):
-                try:
-                    gh.load_all_stats(timestamp, args.window)
-                    break
-                except Exception:
-                    pass
-            influx.format_stats(gh.stats)
-            influx.write_stats()
-        # sleep for however long it takes to get to our next position
-        _wait(positions)
+    failures = _run_serial(
+        config, timestamps, args, budget, journal, profiler, user_cache
+    )
+    if failures:
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":
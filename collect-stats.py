@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from concurrent.futures import ThreadPoolExecutor
 import copy
 from datetime import datetime
 import logging
@@ -8,11 +9,16 @@ import os
 import time
 
 # local imports
+from github_stats.discovery import discover_repos
 from github_stats.github_api import GithubAccess
-from github_stats.outputs.influx import InfluxOutput
+from github_stats.outputs.fanout import OUTPUTS, OutputFanout
+from github_stats.profiling import PROFILE_MODES, Profiler
+from github_stats.ratelimit import RateLimitBudget
+from github_stats.usercache import load_user_cache
 from github_stats.util import load_config
 
 SCRIPTDIR = os.path.dirname(os.path.realpath(__file__))
+logger = logging.getLogger("github-stats")
 
 
 def cli_opts():
@@ -35,9 +41,10 @@ def cli_opts():
     parser.add_argument(
         "-w",
         "--window",
-        default=1,
+        default=[1],
+        nargs="+",
         type=int,
-        help="Number of days worth of data to collect",
+        help="Number of days worth of data to collect (several windows are collected in one pass)",
     )
     parser.add_argument(
         "--timestamp",
@@ -45,32 +52,139 @@ def cli_opts():
         type=float,
         help="UTC timestamp to start looking at data from",
     )
+    parser.add_argument(
+        "--output",
+        action="append",
+        choices=list(OUTPUTS),
+        help="Where to send collected stats (repeatable, defaults to 'outputs' in config or influx)",
+    )
+    parser.add_argument(
+        "--interval",
+        default=0,
+        type=int,
+        help="Run as a daemon, collecting every N seconds with clients, repos and caches kept warm (0 collects once and exits)",
+    )
+    parser.add_argument(
+        "--workers",
+        default=1,
+        type=int,
+        help="Number of repos to collect concurrently",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=PROFILE_MODES,
+        default=None,
+        help="Profile each collection section and output step (cpu or memory)",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        default="profiles",
+        help="Where to write profiling reports",
+    )
     return parser.parse_args()
 
 
+def collect_repo(
+    config, repo, timestamp, args, budget, collectors, profiler=None, user_cache=None
+):
+    """
+    Collect, format, and write stats for a single repo
+
+    When running as a daemon, `collectors` keeps each repo's
+    GithubAccess and outputs between runs so later runs only
+    do incremental work
+
+    :returns: summary of the run
+    :rtype: dict
+    """
+    starttime = time.time()
+    summary = {"repo": repo["name"], "stats": 0, "error": None}
+    try:
+        if repo["name"] in collectors:
+            gh, output = collectors[repo["name"]]
+            gh.refresh()
+            output.set_timestamp(timestamp)
+        else:
+            local_config = copy.deepcopy(config)
+            local_config.pop("repos", None)
+            local_config["repo"] = repo
+            gh = GithubAccess(local_config, budget, profiler, user_cache=user_cache)
+            output = OutputFanout(local_config, timestamp, args.output, profiler)
+        gh.load_all_stats(timestamp, args.window)
+        output.format_stats(gh.stats)
+        output.write_stats()
+        summary["stats"] = output.output_stat_count
+        if args.interval:
+            collectors[repo["name"]] = (gh, output)
+    except Exception as e:
+        logger.exception(f"Failed collecting stats for {repo['name']}")
+        summary["error"] = repr(e)
+        # start from scratch next time in case our clients are in a bad state
+        collectors.pop(repo["name"], None)
+    summary["time"] = time.time() - starttime
+    logger.info(
+        f"Loaded, formatted, and sent {summary['stats']} stats for {repo['name']} in {summary['time']} seconds"
+    )
+    return summary
+
+
 def main():
     args = cli_opts()
-    logger = logging.getLogger("github-stats")
     logger.setLevel(logging.INFO)
     logger.addHandler(logging.StreamHandler())
     if args.debug:
         logger.setLevel(logging.DEBUG)
+    if args.workers > 1 and args.profile:
+        raise Exception("Can't use '--profile' with multiple workers")
     config = load_config(args.config)
-    for repo in config["repos"]:
-        local_config = copy.deepcopy(config)
-        local_config.pop("repos", None)
-        local_config["repo"] = repo
-        timestamp = datetime.utcfromtimestamp(args.timestamp)
-        starttime = time.time()
-        gh = GithubAccess(local_config)
-        influx = InfluxOutput(local_config, timestamp)
-        gh.load_all_stats(timestamp, args.window)
-        influx.format_stats(gh.stats)
-        influx.write_stats()
-
+    timestamp = datetime.utcfromtimestamp(args.timestamp)
+    # every repo uses the same token, so they share one rate limit
+    budget = RateLimitBudget(config.get("query", {}).get("rate_limit_reserve", 100))
+    # people work across repos, so resolve each Github login once per process
+    user_cache = load_user_cache(config)
+    collectors = dict()
+    profiler = None
+    if args.profile:
+        profiler = Profiler(args.profile, args.profile_dir)
+    while True:
+        runstart = time.time()
+        requests = budget.requests
+        # re-discover every run so new repos get picked up by long-running collectors
+        repos = discover_repos(config, budget)
+        for name in set(collectors) - set(repo["name"] for repo in repos):
+            collectors.pop(name)
+        with ThreadPoolExecutor(max_workers=max(args.workers, 1)) as pool:
+            summaries = list(
+                pool.map(
+                    lambda repo: collect_repo(
+                        config,
+                        repo,
+                        timestamp,
+                        args,
+                        budget,
+                        collectors,
+                        profiler,
+                        user_cache,
+                    ),
+                    repos,
+                )
+            )
+        failures = [s for s in summaries if s["error"]]
         logger.info(
-            f"Loaded, formatted, and sent {influx.output_stat_count} stats in {time.time() - starttime} seconds"
+            f"Collected {len(summaries) - len(failures)}/{len(summaries)} repos in {time.time() - runstart} seconds ({budget.requests - requests} API requests, {user_cache.hits} user cache hits)"
         )
+        for s in sorted(summaries, key=lambda x: x["time"], reverse=True):
+            logger.info(
+                f"  {s['repo']}: {round(s['time'], 2)} seconds, {s['stats']} stats{', FAILED: ' + s['error'] if s['error'] else ''}"
+            )
+        if not args.interval:
+            if failures:
+                raise SystemExit(1)
+            break
+        sleep_time = max(args.interval - (time.time() - runstart), 0)
+        logger.debug(f"Sleeping {sleep_time} seconds until next collection")
+        time.sleep(sleep_time)
+        timestamp = datetime.utcfromtimestamp(time.time())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,55 @@
+"""
+Decide which merged pull requests were bug fixes (for MTTR)
+
+A pull request is a bug fix when one of its labels is a `bug_matching`
+label, or its title matches one of the `bug_matching` patterns. Rather
+than trying every pattern in turn, the patterns are combined into one
+alternation (each pattern keeps its own inline flags inside its group),
+so a title is scanned once. Patterns with capture groups are left out of
+the combined pattern (their backreferences would be renumbered) and
+tried on their own.
+
+Matches are kept in a list sorted by merge time, without duplicates, so
+Repo.match_bugfixes can walk them in order.
+"""
+from bisect import insort
+from operator import itemgetter
+
+import regex
+
+
+class BugfixClassifier(object):
+    def __init__(self, patterns=[], labels=[]):
+        """
+        :param patterns: compiled title patterns
+        :param labels: label names
+        """
+        self.labels = frozenset(labels)
+        combined = [p.pattern for p in patterns if not p.groups]
+        self.patterns = [p for p in patterns if p.groups]
+        if combined:
+            self.patterns.insert(
+                0, regex.compile("|".join(f"(?:{p})" for p in combined))
+            )
+
+    def is_bugfix(self, title, labels=()):
+        """
+        :returns: whether a pull request (title and label names) is a bug fix
+        :rtype: bool
+        """
+        if not self.labels.isdisjoint(labels):
+            return True
+        return any(pattern.match(title) for pattern in self.patterns)
+
+
+def add_bug_match(matches, seen, match):
+    """
+    Add a (title, commit, merge time) match to a list sorted by merge
+    time, skipping matches already in `seen`
+
+    :returns: None
+    """
+    if match in seen:
+        return
+    seen.add(match)
+    insort(matches, match, key=itemgetter(2))
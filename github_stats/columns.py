@@ -0,0 +1,158 @@
+"""
+Typed columns for Github results we aggregate in bulk
+
+Pull requests and workflow runs arrive by the thousand, and processing
+them one dict at a time (parsing up to four timestamps per item with
+strptime/dateutil and updating nested counters per item) dominated
+collection time. Instead each item is decoded once into columns:
+    * timestamps as int64 epoch seconds (array("q"))
+    * states, labels, workflows, events and users as integer codes
+      into a shared table of strings (`Codes`)
+and aggregates are computed over the columns, grouping by code, before
+being folded into the stats dicts once per group.
+
+Github timestamps ("2023-01-02T03:04:05Z") are UTC. The collector compares
+them with naive dates (`base_date`) as if those were UTC too, so use
+`naive_ts` to put a naive date on the same scale.
+"""
+from array import array
+import calendar
+from datetime import datetime
+
+
+def parse_ts(value):
+    """
+    Parse a Github timestamp
+
+    :returns: epoch seconds (0 for empty values)
+    :rtype: int
+    """
+    if not value:
+        return 0
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+def naive_ts(date):
+    """
+    Epoch seconds of a naive datetime, read as UTC
+
+    :returns: epoch seconds
+    :rtype: float
+    """
+    return calendar.timegm(date.timetuple()) + date.microsecond / 1000000
+
+
+class Codes(object):
+    """
+    Interned strings, numbered in the order they're first seen
+    """
+
+    def __init__(self):
+        self.codes = dict()
+        self.values = list()
+
+    def __len__(self):
+        return len(self.values)
+
+    def code(self, value):
+        """
+        :returns: code for a value (adding it if it's new)
+        :rtype: int
+        """
+        if value not in self.codes:
+            self.codes[value] = len(self.values)
+            self.values.append(value)
+        return self.codes[value]
+
+
+class PullRequestColumns(object):
+    def __init__(self):
+        self.logins = Codes()
+        self.labels = Codes()
+        self.titles = list()
+        self.commits = list()
+        self.author = array("l")
+        self.created = array("q")
+        self.updated = array("q")
+        # merged (or closed, when not merged) time, 0 while open
+        self.ended = array("q")
+        self.merged = array("q")
+        self.open = array("b")
+        self.draft = array("b")
+        # labels of pull request i are label_codes[label_offsets[i]:label_offsets[i + 1]]
+        self.label_codes = array("l")
+        self.label_offsets = array("l", [0])
+
+    def __len__(self):
+        return len(self.created)
+
+    def append(self, pull, created=None):
+        """
+        Decode one pull request
+
+        :returns: None
+        """
+        if created is None:
+            created = parse_ts(pull["created_at"])
+        merged = parse_ts(pull.get("merged_at", None))
+        self.titles.append(pull["title"])
+        self.commits.append(pull["head"]["sha"])
+        self.author.append(self.logins.code(pull["user"]["login"]))
+        self.created.append(created)
+        self.updated.append(parse_ts(pull["updated_at"]))
+        self.ended.append(merged or parse_ts(pull.get("closed_at", None)))
+        self.merged.append(merged)
+        self.open.append(pull["state"] == "open")
+        self.draft.append(bool(pull["draft"]))
+        self.label_codes.extend(
+            self.labels.code(label["name"]) for label in pull["labels"]
+        )
+        self.label_offsets.append(len(self.label_codes))
+
+    def labels_of(self, i):
+        """
+        :returns: label codes of one pull request
+        :rtype: array
+        """
+        start = self.label_offsets[i]
+        end = self.label_offsets[i + 1]
+        return self.label_codes[start:end]
+
+
+class WorkflowRunColumns(object):
+    def __init__(self):
+        self.workflows = Codes()
+        self.statuses = Codes()
+        self.events = Codes()
+        self.users = Codes()
+        self.workflow = array("l")
+        self.status = array("l")
+        self.event = array("l")
+        self.user = array("l")
+        self.created = array("q")
+        self.run_time = array("d")
+        self.run_number = array("q")
+        self.attempt = array("l")
+
+    def __len__(self):
+        return len(self.created)
+
+    def append(self, run, user, created=None):
+        """
+        Decode one (completed) workflow run, triggered by `user`
+
+        :returns: None
+        """
+        if created is None:
+            created = parse_ts(run["created_at"])
+        self.workflow.append(self.workflows.code(run["name"]))
+        self.status.append(self.statuses.code(run["conclusion"]))
+        self.event.append(self.events.code(run["event"]))
+        self.user.append(self.users.code(user))
+        self.created.append(created)
+        # runs are "finished" when they were last updated
+        self.run_time.append(
+            parse_ts(run["updated_at"]) - parse_ts(run["run_started_at"])
+        )
+        self.run_number.append(run["run_number"])
+        self.attempt.append(run["run_attempt"])
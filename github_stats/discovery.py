@@ -0,0 +1,104 @@
+"""
+Find the repos to collect by listing an org instead of naming every repo
+
+    discovery:
+      org: civic-eagle
+      include: ["*"]
+      exclude: ["*-archive"]
+      skip_archived: true
+      skip_forks: true
+      # settings every discovered repo starts with (same keys as a `repos` entry)
+      defaults:
+        tag_patterns: [...]
+
+Discovered repos track their default branch unless `defaults` says otherwise.
+An explicit `repos` entry with the same name overrides the discovered
+settings, and explicit repos that weren't discovered are still collected.
+"""
+from copy import deepcopy
+from fnmatch import fnmatchcase
+import logging
+import os
+import urllib.parse
+
+from github_stats import projections
+from github_stats.github_api import GithubAccess, github_session
+from github_stats.projections import project
+from github_stats.ratelimit import RateLimitBudget
+
+log = logging.getLogger("github-stats.discovery")
+
+
+def _matches(name, patterns):
+    return any(fnmatchcase(name, pattern) for pattern in patterns)
+
+
+def list_org_repos(config, budget=None):
+    """
+    Page through every repo in the discovery org
+
+    :returns: generator of Github repo objects
+    """
+    discovery = config["discovery"]
+    auth_token = os.environ.get("GITHUB_TOKEN", None)
+    if not auth_token:
+        auth_token = discovery.get("github_token", None)
+    if not budget:
+        budget = RateLimitBudget(config.get("query", {}).get("rate_limit_reserve", 100))
+    session = github_session(auth_token)
+    base_url = config.get("github_url", GithubAccess.BASE_URL).rstrip("/") + "/"
+    url = urllib.parse.urljoin(base_url, f"orgs/{discovery['org']}/repos")
+    params = {"type": "all", "per_page": 100}
+    while url:
+        budget.acquire()
+        res = session.get(url, params=params, timeout=10)
+        budget.update(res.headers)
+        res.raise_for_status()
+        yield from project(res.json(), projections.REPO)
+        # the next link already carries our parameters
+        params = None
+        url = res.links.get("next", dict()).get("url", "")
+
+
+def discover_repos(config, budget=None):
+    """
+    Build the list of repo configs to collect
+
+    Without a `discovery` section this is just `config["repos"]`
+
+    :returns: repo configs
+    :rtype: list
+    """
+    explicit = {repo["name"]: repo for repo in config.get("repos", [])}
+    discovery = config.get("discovery", {})
+    if not discovery:
+        return list(explicit.values())
+    if "org" not in discovery:
+        raise Exception("Can't discover repos without 'discovery.org'")
+    include = discovery.get("include", ["*"])
+    exclude = discovery.get("exclude", [])
+    repos = list()
+    skipped = 0
+    for ghrepo in list_org_repos(config, budget):
+        name = ghrepo["name"]
+        if (
+            not _matches(name, include)
+            or _matches(name, exclude)
+            or (discovery.get("skip_archived", True) and ghrepo.get("archived", False))
+            or (discovery.get("skip_forks", True) and ghrepo.get("fork", False))
+        ):
+            skipped += 1
+            continue
+        branch = ghrepo.get("default_branch", "main")
+        repo = {"branches": {"main": branch, "release": branch}}
+        repo.update(deepcopy(discovery.get("defaults", {})))
+        repo["name"] = name
+        repo["org"] = discovery["org"]
+        repo["folder"] = config["repo_folder"]
+        repo.update(explicit.pop(name, {}))
+        repos.append(repo)
+    repos.extend(explicit.values())
+    log.info(
+        f"Discovered {len(repos)} repos in {discovery['org']} ({skipped} skipped by filters)"
+    )
+    return repos
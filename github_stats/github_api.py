@@ -7,54 +7,94 @@ A general note:
     Of course, this pattern isn't perfect, and can be a bit confusing to read at times.
 """
 import calendar
+from contextlib import nullcontext
 from copy import deepcopy
-from datetime import datetime, timedelta
-from dateutil import parser
+from datetime import datetime, timedelta, timezone
 import logging
 import os
-import pprint
 import requests
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 import time
 import urllib.parse
 
-from github_stats.schema import user_schema, DEFAULT_WINDOW
+from github_stats.bugfixes import BugfixClassifier, add_bug_match
+from github_stats.columns import naive_ts, parse_ts
+from github_stats.columns import PullRequestColumns, WorkflowRunColumns
+from github_stats.schema import DEFAULT_WINDOW
 from github_stats.schema import user_login_cache as user_login_cache_schema
 from github_stats.schema import stats as stats_schema
+from github_stats.schema import sections as sections_schema
+from github_stats.schema import collector_schema
+from github_stats.schema import window_schema, window_user_schema
+from github_stats.sketch import QuantileSketch, merge_sketch
 from github_stats.gitops import Repo
-from github_stats.util import load_patterns
+from github_stats import projections
+from github_stats.projections import project
+from github_stats.ratelimit import RateLimitBudget
+from github_stats.usercache import UserCache
+from github_stats.userstats import UserStats
+from github_stats.util import load_patterns, window_list
 
 calendar.setfirstweekday(calendar.SUNDAY)
 
 
+def github_session(auth_token=None):
+    """
+    Set up a requests session for the Github API
+    (headers, auth, and retries on server errors)
+
+    :returns: session
+    :rtype: requests.Session
+    """
+    headers = {
+        "Accept": "application/vnd.github.v3+json",
+    }
+    if auth_token:
+        headers["Authorization"] = f"token {auth_token}"
+
+    retry = Retry(
+        total=3,
+        read=3,
+        connect=3,
+        backoff_factor=0.3,
+        status_forcelist=(500, 502, 503, 504, 429),
+        allowed_methods=["GET"],
+    )
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(headers)
+    return session
+
+
 class GithubAccess(object):
     BASE_URL = "https://api.github.com/"
 
-    def __init__(self, config):
+    def __init__(self, config, budget=None, profiler=None, repo=None, user_cache=None):
         self.log = logging.getLogger("github-stats.collection")
         auth_token = os.environ.get("GITHUB_TOKEN", None)
         if not auth_token:
             auth_token = config["repo"].get("github_token", None)
-        headers = {
-            "Accept": "application/vnd.github.v3+json",
-        }
-        if auth_token:
-            headers["Authorization"] = f"token {auth_token}"
-
-        retry = Retry(
-            total=3,
-            read=3,
-            connect=3,
-            backoff_factor=0.3,
-            status_forcelist=(500, 502, 503, 504, 429),
-            method_whitelist=["GET"],
-        )
-        self._request = requests.Session()
-        adapter = HTTPAdapter(max_retries=retry)
-        self._request.mount("https://", adapter)
-        self._request.headers.update(headers)
-        self.repo = Repo(config)
+        # Github Enterprise (or a local stand-in) lives somewhere else
+        self.base_url = config.get("github_url", self.BASE_URL).rstrip("/") + "/"
+        self._request = github_session(auth_token)
+        # share a budget between collectors using the same token
+        if not budget:
+            budget = RateLimitBudget(
+                config.get("query", {}).get("rate_limit_reserve", 100)
+            )
+        self.budget = budget
+        # share resolved Github profiles between every repo in a run
+        if not user_cache:
+            user_cache = UserCache()
+        self.user_cache = user_cache
+        # optional github_stats.profiling.Profiler wrapped around each section
+        self.profiler = profiler
+        if not repo:
+            repo = Repo(config)
+        self.repo = repo
 
         self.tagged_releases = config["repo"].get("tagged_releases", False)
         self.branch_releases = config["repo"].get("branch_releases", False)
@@ -68,14 +108,20 @@ class GithubAccess(object):
         self.release_branch = config["repo"]["branches"].get("release", "main")
         self.non_user_events = config["repo"].get("non_user_events", ["schedule"])
         self.per_page = config.get("query", {}).get("results_per_page", 500)
+        # how long to wait before asking again for empty (still computing) results
+        self.empty_retry_delay = config.get("query", {}).get("empty_retry_delay", 3)
         self.special_logins = config["repo"].get("special_logins", {})
         self.special_names = {v: k for k, v in self.special_logins.items()}
         self.broken_users = config["repo"].get("broken_users", [])
+        # attribute commits to the user whose profile has the author's email
+        # (moves commits from 'unknown' to real users, so counts change)
+        self.match_author_emails = config["repo"].get("match_author_emails", False)
 
         self.tag_matches, self.bug_matches, self.pr_bug_matches = load_patterns(
             config["repo"].get("tag_patterns", []),
             config["repo"].get("bug_matching", {}),
         )
+        self.bugfixes = BugfixClassifier(self.bug_matches, self.pr_bug_matches)
 
         """
         Many label matching patterns
@@ -84,23 +130,84 @@ class GithubAccess(object):
             labelname: labels
             for labelname, labels in config["repo"].get("additional_labels", {}).items()
         }
+        # and the other way around: raw label -> the labels it counts towards
+        self.label_index = dict()
+        for labelname, labels in self.label_matches.items():
+            for label in labels:
+                if label not in self.label_index:
+                    self.label_index[label] = list()
+                if labelname not in self.label_index[label]:
+                    self.label_index[label].append(labelname)
+
+        """
+        Optional per-section schedules (seconds between collections).
+        Sections that aren't due re-use the values from their last run,
+        which only happens in long-running collectors
+        """
+        self.sections = deepcopy(sections_schema)
+        if self.branch_releases:
+            # release counts come from the commit walk in this mode
+            self.sections["commits"]["stats"].extend(self.sections["releases"]["stats"])
+            self.sections["commits"]["users"].extend(self.sections["releases"]["users"])
+            self.sections["releases"] = {"stats": [], "users": []}
+        self.schedules = config.get("schedules", {})
+        for section in self.schedules:
+            if section not in self.sections:
+                raise Exception(
+                    f"Unknown schedule section {section}, expected one of {list(self.sections)}"
+                )
+        self._section_runs = dict()
+
+        """
+        When collecting many timestamps from the same data (backfills),
+        keep every API result and commit log in memory so we only
+        fetch/walk them once
+        """
+        self.cache_raw_data = False
+        self._raw_cache = dict()
 
         """
         Actual stats object
         """
         self.contributor_collection_time = 0
+        # which section API calls/git walks are counted against
+        self.section = "prep"
         self.user_login_cache = deepcopy(user_login_cache_schema)
-        self.stats = deepcopy(stats_schema)
-        self.stats["pull_requests"]["labels"] = {
+        self.stats = self._new_stats()
+        self.starttime = time.time()
+        self._load_contributors()
+
+    def _new_stats(self):
+        """
+        :returns: empty stats object for this repo
+        :rtype: dict
+        """
+        stats = deepcopy(stats_schema)
+        stats["pull_requests"]["labels"] = {
             label: {
                 "total_window_prs": 0,
                 "total_prs": 0,
             }
             for label in self.label_matches
         }
-        self.stats["tag_matches"] = {t: 0 for t in self.tag_matches.keys()}
+        stats["tag_matches"] = {t: 0 for t in self.tag_matches.keys()}
+        return stats
+
+    def reset_stats(self):
+        """
+        Start a fresh stats object while keeping our clients, repo,
+        user cache (and any cached raw data) around
+
+        Users we've already resolved won't be re-added by
+        _cache_user_login, so carry them over with empty stats
+
+        :returns: None
+        """
+        users = list(self.stats["users"].keys())
+        self.stats = self._new_stats()
+        for user in users:
+            self.stats["users"][user] = UserStats()
         self.starttime = time.time()
-        self._load_contributors()
 
     def _retry_empty(self, url):
         """
@@ -112,16 +219,103 @@ class GithubAccess(object):
         a whole timeout object.
         """
         for retry in range(0, 3):
+            self.budget.acquire()
             res = self._request.get(url, timeout=10)
+            self.budget.update(res.headers)
+            self._count_response(res, retry)
             res.raise_for_status()
             data = res.json()
             if data:
                 return data, res.links
-            time.sleep(3)
+            time.sleep(self.empty_retry_delay)
         else:
             return [], {}
 
-    def _github_query(self, url, key=None, params=None):
+    def _count(self, key, value=1):
+        """
+        Add to one of the collector's own counters for the current section
+
+        :returns: None
+        """
+        if self.section not in self.stats["collector"]:
+            self.stats["collector"][self.section] = deepcopy(collector_schema)
+        self.stats["collector"][self.section][key] += value
+
+    def _count_response(self, res, retry):
+        """
+        Record what a single API response cost us
+
+        Retries include our own retries of empty results and
+        any retries urllib3 did before handing us the response.
+
+        :returns: None
+        """
+        self._count("requests")
+        self._count("bytes", len(res.content))
+        retries = getattr(res.raw, "retries", None)
+        if retries is not None:
+            self._count("retries", len(retries.history))
+        if retry:
+            self._count("retries")
+        if (
+            res.headers.get("X-RateLimit-Resource", "core") == "core"
+            and "X-RateLimit-Remaining" in res.headers
+        ):
+            self._count("quota_used")
+
+    def refresh(self):
+        """
+        Prepare a long-lived collector for another collection
+
+        Our session (and its connection pool), the opened git repo and
+        the user cache are kept, so we only pay for new work:
+        a fetch of the repo and one pass over the contributor list
+
+        :returns: None
+        """
+        self.reset_stats()
+        self.repo.update()
+        self._load_contributors()
+
+    def _github_query(self, url, key=None, params=None, fields=None):
+        """
+        Query paginated endpoint from Github
+
+        `fields` (see github_stats.projections) cuts every result
+        down to the fields we read as soon as its page is decoded
+
+        When caching raw data, the (projected) result is kept in memory
+        and replayed for repeated queries
+
+        :returns: generator of results
+        """
+        if not self.cache_raw_data:
+            yield from self._github_pages(url, key, params, fields)
+            return
+        cache_key = ("query", url, key, tuple(sorted((params or {}).items())))
+        if cache_key not in self._raw_cache:
+            self._raw_cache[cache_key] = list(
+                self._github_pages(url, key, params, fields)
+            )
+        yield from self._raw_cache[cache_key]
+
+    def _page_results(self, data, key=None, fields=None):
+        """
+        Pull the results out of one decoded page
+
+        :returns: (projected) results
+        :rtype: list
+        """
+        if key and isinstance(data, dict) and key in data:
+            data = data[key]
+            if not isinstance(data, list):
+                data = [data]
+        elif not isinstance(data, list):
+            # just return the entire object as a default
+            data = [data]
+        return project(data, fields)
+
+    def _github_pages(self, url, key=None, params=None, fields=None):
         """
         Query paginated endpoint from Github
 
@@ -131,39 +325,41 @@ class GithubAccess(object):
         if not params:
             params = {}
         params["per_page"] = self.per_page
-        url = urllib.parse.urljoin(self.BASE_URL, url.strip("/"))
+        url = urllib.parse.urljoin(self.base_url, url.strip("/"))
         self.log.debug(f"Requesting {url}")
         req = requests.models.PreparedRequest()
         req.prepare_url(url, params)
-        data, links = self._retry_empty(req.url)
-        datatype = type(data)
-        if key and datatype == dict and key in data:
-            if isinstance(data[key], list):
-                yield from data[key]
-            else:
-                yield data[key]
-        elif datatype == list:
-            yield from data
-        else:
-            # just return the entire object as a default
-            yield data
-
-        next_url = links.get("next", dict()).get("url", "")
+        next_url = req.url
         while next_url:
             self.log.debug(f"Requesting {next_url}")
             data, links = self._retry_empty(next_url)
-            datatype = type(data)
-            if key and datatype == dict and key in data:
-                if isinstance(data[key], list):
-                    yield from data[key]
-                else:
-                    yield data[key]
-            elif isinstance(data, list):
-                yield from data
-            else:
-                yield data
+            self._count("pages")
+            yield from self._page_results(data, key, fields)
             next_url = links.get("next", dict()).get("url", "")
 
+    def _list_branches(self):
+        """
+        :returns: branch names and last commit times (cached when caching raw data)
+        :rtype: list
+        """
+        if not self.cache_raw_data:
+            return self.repo.list_branches()
+        if "branches" not in self._raw_cache:
+            self._raw_cache["branches"] = list(self.repo.list_branches())
+        return self._raw_cache["branches"]
+
+    def _branch_commit_log(self, branch):
+        """
+        :returns: commits on a branch (cached when caching raw data)
+        :rtype: list
+        """
+        if not self.cache_raw_data:
+            return self.repo.branch_commit_log(branch)
+        cache_key = ("commits", branch)
+        if cache_key not in self._raw_cache:
+            self._raw_cache[cache_key] = list(self.repo.branch_commit_log(branch))
+        return self._raw_cache[cache_key]
+
     def _cache_user_login(self, login):
         """
         Return user's name based on their Github login
@@ -174,9 +370,8 @@ class GithubAccess(object):
         """
         if login in self.user_login_cache["logins"]:
             return self.user_login_cache["logins"][login]
-        url = f"/users/{login}"
         try:
-            user = [u for u in self._github_query(url)][0]
+            user = self.user_cache.get(login, self._fetch_user)
         except Exception as e:
             self.log.warning(f"{login} doesn't match a Github user! {e}")
             return ""
@@ -187,10 +382,20 @@ class GithubAccess(object):
         self.user_login_cache["logins"][login] = name
         self.user_login_cache["names"][name] = login
         if name not in self.stats["users"]:
-            self.stats["users"][name] = deepcopy(user_schema)
+            self.stats["users"][name] = UserStats()
         self.log.debug(f"Returned name: {self.user_login_cache['logins'][login]}")
         return self.user_login_cache["logins"][login]
 
+    def _fetch_user(self, login):
+        """
+        Look up a user's profile from Github
+
+        :returns: user profile
+        :rtype: dict
+        """
+        url = f"/users/{login}"
+        return [u for u in self._github_query(url, fields=projections.USER)][0]
+
     def _cache_user_name(self, name):
         """
         Return user's actual login based on their Github name
@@ -209,6 +414,25 @@ class GithubAccess(object):
             f"User {name} doesn't exist in cache or in {self.special_logins}!"
         )
 
+    def _cache_commit_author(self, author):
+        """
+        Return the user behind a commit author ("Name <email>"),
+        optionally falling back to the login a known profile uses that email for
+
+        :returns: User's name (or "unknown")
+        :rtype: str
+        """
+        name, _, email = author.partition(" <")
+        try:
+            return self._cache_user_name(name)
+        except Exception:
+            pass
+        if self.match_author_emails:
+            login = self.user_cache.login_for_email(email.rstrip(">"))
+            if login:
+                return self._cache_user_login(login)
+        return "unknown"
+
     def _load_contributors(self):
         """
         Configure all users that have commits into the repo
@@ -220,11 +444,11 @@ class GithubAccess(object):
         self.log.info("Loading repo contributors...")
         starttime = time.time()
         url = f"/repos/{self.repo_name}/contributors"
-        for contributor in self._github_query(url):
+        for contributor in self._github_query(url, fields=projections.CONTRIBUTOR):
             # we rely on the caching function to add the user properly
             _ = self._cache_user_login(contributor["login"])
         _ = self._cache_user_login("unknown")
-        self.stats["users"]["unknown"] = deepcopy(user_schema)
+        self.stats["users"]["unknown"] = UserStats()
         self.contributor_collection_time = time.time() - starttime
         self.log.info(
             f"Loaded contributors in {self.contributor_collection_time} seconds"
@@ -235,49 +459,188 @@ class GithubAccess(object):
             self.stats["collection_date"] = date
             self.log.debug(f"Collection timestamp: {date}")
         if not self.stats["window"]:
-            self.stats["window"] = window * 4
-            self.log.debug(f"Collection window: {window}")
+            windows = window_list(window)
+            self.stats["window"] = max(windows) * 4
+            self.stats["windows"] = windows
+            for days in windows[1:]:
+                window_stats = deepcopy(window_schema)
+                window_stats["pull_requests"]["labels"] = {
+                    label: {"total_window_prs": 0} for label in self.label_matches
+                }
+                self.stats["window_stats"][days] = window_stats
+            self.log.debug(f"Collection windows: {windows}")
+
+    def _window_targets(self, base_date, window):
+        """
+        Window-scoped counters are counted for every collection window in
+        the same pass: the first window into our stats as usual, and
+        the others into their own (same shaped) stats in `window_stats`
+
+        :returns: (window, stats to count into) for each collection window
+        :rtype: list
+        """
+        self._set_collection_date(base_date, window)
+        windows = self.stats["windows"]
+        return [(windows[0], self.stats)] + [
+            (days, self.stats["window_stats"][days]) for days in windows[1:]
+        ]
+
+    def _window_user(self, stats, user):
+        """
+        :returns: a user's window-scoped counters in a window's stats
+        """
+        if user not in stats["users"]:
+            stats["users"][user] = deepcopy(window_user_schema)
+        return stats["users"][user]
 
     def load_all_stats(self, base_date=datetime.today(), window=DEFAULT_WINDOW):
         """
         Wrapper to execute all stat collection functions
 
+        `window` can be a list of windows (in days), which are
+        all collected in the same pass
+
         :returns: None
         """
-        self._set_collection_date(base_date, window)
-        self.load_pull_requests(base_date, window)
-        self.load_commits(base_date, window)
-        self.load_branches(base_date, window)
-        self.load_repo_stats(base_date, window)
-        mttr, windowed_mttr = self.repo.match_bugfixes(self.stats["bug_matches"])
+        targets = self._window_targets(base_date, window)
+        self._run_section("pull_requests", self.load_pull_requests, base_date, window)
+        self._run_section("commits", self.load_commits, base_date, window)
+        self._run_section("branches", self.load_branches, base_date, window)
+        self._run_section("repo_stats", self.load_repo_stats, base_date, window)
+        mttr, windowed_mttr = self.repo.match_bugfixes(
+            self.stats["bug_matches"], base_date, self.stats["windows"]
+        )
         self.stats["mttr"] = mttr
-        self.stats["windowed_mttr"] = windowed_mttr
+        for days, stats in targets:
+            stats["windowed_mttr"] = windowed_mttr[days]
         if self.tagged_releases:
             self.log.debug(f"Tracking releases with tags: {self.tag_matches}")
-            rt = self.repo.tag_releases(base_date, window)
-            self.stats["releases"]["total_releases"] = rt["total_releases"]
-            self.stats["releases"]["total_window_releases"] = rt[
-                "total_window_releases"
-            ]
-            for user, rd in rt["users"].items():
-                author = self._cache_user_name(user.split(" <")[0])
-                if not author:
-                    self.log.warning(
-                        f"{user} doesn't have a reasonable commit author name. Skipping"
-                    )
-                    continue
-                self.stats["users"][author]["total_releases"] = rd["total_releases"]
-                self.stats["users"][author]["total_window_releases"] = rd[
-                    "total_window_releases"
-                ]
+            self._run_section("releases", self.load_tagged_releases, base_date, window)
         elif not self.branch_releases:
             self.log.debug("Using Github releases to track releases")
-            self.load_releases(base_date, window)
+            self._run_section("releases", self.load_releases, base_date, window)
         else:
             self.log.debug(f"Tracking releases as commits to {self.release_branch}")
-        self.load_workflow_runs(base_date, window)
+        self._run_section("workflows", self.load_workflow_runs, base_date, window)
         self.stats["collection_time_secs"] = time.time() - self.starttime
 
+    def _run_section(self, section, func, base_date, window):
+        """
+        Run a collection section, unless it has a schedule and isn't due yet,
+        in which case we restore the values from its last run
+
+        Schedules are ignored when re-evaluating cached raw data
+        (backfills need every section for every timestamp)
+
+        :returns: None
+        """
+        interval = self.schedules.get(section, 0)
+        if self.cache_raw_data:
+            interval = 0
+        last_run = self._section_runs.get(section, None)
+        if interval and last_run and time.time() - last_run[0] < interval:
+            self.log.info(
+                f"Skipping {section}, last collected {int(time.time() - last_run[0])} seconds ago"
+            )
+            self._restore_section(section, last_run[1])
+            return
+        self.section = section
+        walked = self.repo.objects_walked
+        if self.profiler:
+            profile = self.profiler.section(
+                f"{self.repo_name.replace('/', '_')}.{section}"
+            )
+        else:
+            profile = nullcontext()
+        with profile:
+            func(base_date, window)
+        self._count("git_objects", self.repo.objects_walked - walked)
+        self.section = "prep"
+        if interval:
+            self._section_runs[section] = (time.time(), self._save_section(section))
+
+    def _save_section(self, section):
+        """
+        :returns: copy of the stats a section filled in
+        :rtype: dict
+        """
+        keys = self.sections[section]
+        return deepcopy(
+            {
+                "stats": {key: self.stats[key] for key in keys["stats"]},
+                "users": {
+                    user: data.export(keys["users"])
+                    for user, data in self.stats["users"].items()
+                },
+                "window_stats": {
+                    days: {
+                        "stats": {
+                            key: window_stats[key]
+                            for key in keys["stats"]
+                            if key in window_stats
+                        },
+                        "users": {
+                            user: {
+                                key: value
+                                for key, value in data.items()
+                                if key in keys["users"]
+                            }
+                            for user, data in window_stats["users"].items()
+                        },
+                    }
+                    for days, window_stats in self.stats["window_stats"].items()
+                },
+            }
+        )
+
+    def _restore_section(self, section, saved):
+        """
+        Put a section's saved stats back into the current stats object
+
+        :returns: None
+        """
+        saved = deepcopy(saved)
+        self.stats.update(saved["stats"])
+        for user, data in saved["users"].items():
+            if user not in self.stats["users"]:
+                self.stats["users"][user] = UserStats()
+            self.stats["users"][user].update(data)
+        for days, window_saved in saved["window_stats"].items():
+            if days not in self.stats["window_stats"]:
+                continue
+            window_stats = self.stats["window_stats"][days]
+            window_stats.update(window_saved["stats"])
+            for user, data in window_saved["users"].items():
+                self._window_user(window_stats, user).update(data)
+
+    def load_tagged_releases(self, base_date=datetime.today(), window=DEFAULT_WINDOW):
+        """
+        Count releases from tags matching our tag patterns
+
+        :returns: None
+        """
+        starttime = time.time()
+        targets = self._window_targets(base_date, window)
+        rt = self.repo.tag_releases(base_date, self.stats["windows"])
+        self.stats["releases"]["total_releases"] = rt["total_releases"]
+        for days, stats in targets:
+            stats["releases"]["total_window_releases"] = rt["total_window_releases"][
+                days
+            ]
+        for user, rd in rt["users"].items():
+            author = self._cache_user_name(user.split(" <")[0])
+            if not author:
+                self.log.warning(
+                    f"{user} doesn't have a reasonable commit author name. Skipping"
+                )
+                continue
+            self.stats["users"][author]["total_releases"] = rd["total_releases"]
+            for days, stats in targets:
+                self._window_user(stats, author)["total_window_releases"] = rd[
+                    "total_window_releases"
+                ][days]
+        self.stats["releases"]["collection_time"] = time.time() - starttime
+
     def load_pull_requests(self, base_date=datetime.today(), window=DEFAULT_WINDOW):
         """
         Collect pull request data
@@ -287,108 +650,165 @@ class GithubAccess(object):
 
         :returns: None
         """
-        self._set_collection_date(base_date, window)
-        td = base_date - timedelta(days=window)
+        targets = self._window_targets(base_date, window)
+        window_starts = [
+            naive_ts(base_date - timedelta(days=days)) for days, _ in targets
+        ]
+        base_ts = naive_ts(base_date)
         starttime = time.time()
         self.log.info("Loading Pull Request Data...")
         url = f"/repos/{self.repo_name}/pulls"
-        for pull in self._github_query(url, params={"state": "all"}):
-            title = pull["title"]
-            commit = pull["head"]["sha"]
-            created = datetime.strptime(pull["created_at"], "%Y-%m-%dT%H:%M:%SZ")
-            if created > base_date:
+        prs = PullRequestColumns()
+        for pull in self._github_query(
+            url, params={"state": "all"}, fields=projections.PULL_REQUEST
+        ):
+            created = parse_ts(pull["created_at"])
+            if created > base_ts:
                 self.log.debug(f"{pull['title']} was created in the future. Skipping")
                 continue
-            modified_time = datetime.strptime(pull["updated_at"], "%Y-%m-%dT%H:%M:%SZ")
-            self.stats["pull_requests"]["total_pull_requests"] += 1
-            author = self._cache_user_login(pull["user"]["login"])
-            self.stats["users"][author]["total_pull_requests"] += 1
-
-            if pull["state"] == "open":
-                self.stats["pull_requests"]["total_open_pull_requests"] += 1
-                self.stats["users"][author]["total_open_pull_requests"] += 1
-            if pull["draft"]:
-                self.stats["pull_requests"]["total_draft_pull_requests"] += 1
-                self.stats["users"][author]["total_draft_pull_requests"] += 1
-
-            # worth also catching pull requests created in our window
-            if created < base_date and created > td:
-                self.stats["pull_requests"]["total_window_pull_requests"] += 1
-                self.stats["users"][author]["total_window_pull_requests"] += 1
-            elif modified_time < base_date and modified_time > td:
-                self.stats["pull_requests"]["total_window_pull_requests"] += 1
-                self.stats["users"][author]["total_window_pull_requests"] += 1
-
-            # Calculate avg PR time
-            created = datetime.strptime(pull["created_at"], "%Y-%m-%dT%H:%M:%SZ")
-            closed = False
-            merged = pull.get("merged_at", None)
-            merged_ts = None
-            if not merged:
-                closed = pull.get("closed_at", None)
-                self.stats["pull_requests"]["total_closed_pull_requests"] += 1
-                self.stats["users"][author]["total_closed_pull_requests"] += 1
+            prs.append(pull, created)
+        # every login only needs resolving once
+        authors = [self._cache_user_login(login) for login in prs.logins.values]
+
+        """
+        Count per login (and per label) over the columns,
+        then fold the totals into our stats
+        Window counts are kept per collection window
+        """
+        logins = len(prs.logins)
+        user_totals = {
+            "total_pull_requests": [0] * logins,
+            "total_open_pull_requests": [0] * logins,
+            "total_draft_pull_requests": [0] * logins,
+            "total_closed_pull_requests": [0] * logins,
+            "total_merged_pull_requests": [0] * logins,
+            "total_pr_time_open_secs": [0] * logins,
+        }
+        pulls = user_totals["total_pull_requests"]
+        opened = user_totals["total_open_pull_requests"]
+        drafts = user_totals["total_draft_pull_requests"]
+        closed = user_totals["total_closed_pull_requests"]
+        merged = user_totals["total_merged_pull_requests"]
+        time_open = user_totals["total_pr_time_open_secs"]
+        time_open_sketches = [QuantileSketch() for _ in range(logins)]
+        windowed = [[0] * logins for _ in targets]
+        label_totals = [0] * len(prs.labels)
+        label_window = [[0] * len(prs.labels) for _ in targets]
+        # bug fixes stay sorted by merge time (and unique) as we add them
+        bug_matches_seen = set(self.stats["bug_matches"])
+        for i, (
+            author,
+            created,
+            updated,
+            ended,
+            merged_at,
+            is_open,
+            draft,
+        ) in enumerate(
+            zip(
+                prs.author,
+                prs.created,
+                prs.updated,
+                prs.ended,
+                prs.merged,
+                prs.open,
+                prs.draft,
+            )
+        ):
+            pulls[author] += 1
+            if is_open:
+                opened[author] += 1
+            if draft:
+                drafts[author] += 1
+            if merged_at:
+                merged[author] += 1
             else:
-                self.stats["pull_requests"]["total_merged_pull_requests"] += 1
-                self.stats["users"][author]["total_merged_pull_requests"] += 1
-            if merged or closed:
-                if merged:
-                    endtime = datetime.strptime(merged, "%Y-%m-%dT%H:%M:%SZ")
-                else:
-                    endtime = datetime.strptime(closed, "%Y-%m-%dT%H:%M:%SZ")
-                timeopen = (endtime - created).total_seconds()
-                self.stats["pull_requests"]["total_pr_time_open_secs"] += timeopen
-                self.stats["users"][author]["total_pr_time_open_secs"] += timeopen
-            if merged:
-                merged_ts = datetime.strptime(merged, "%Y-%m-%dT%H:%M:%SZ").timestamp()
-
-            # process/count labels of this PR
-            for label in pull["labels"]:
-                name = label["name"]
-                for labelname, matches in self.label_matches.items():
-                    if name not in matches:
-                        continue
-                    self.log.debug(f"{title}: {name} ({matches=}) for {label}")
-                    self.stats["pull_requests"]["labels"][labelname]["total_prs"] += 1
-                    if modified_time < base_date and modified_time > td:
-                        self.stats["pull_requests"]["labels"][labelname][
-                            "total_window_prs"
-                        ] += 1
-                if name not in self.label_matches.keys():
-                    if name not in self.stats["pull_requests"]["labels"]:
-                        self.stats["pull_requests"]["labels"][name] = {
-                            "total_prs": 1,
-                            "total_window_prs": 0,
-                        }
-                    else:
-                        self.stats["pull_requests"]["labels"][name]["total_prs"] += 1
-                    if modified_time < base_date and modified_time > td:
-                        self.stats["pull_requests"]["labels"][name][
-                            "total_window_prs"
-                        ] += 1
-                if merged_ts and name in self.pr_bug_matches:
-                    self.stats["bug_matches"].append((title, commit, merged_ts))
-
-            # Regex match PR as a bugfix
-            for pattern in self.bug_matches:
-                """
-                To properly track MTTR, we should only look at closed PRs,
-                so if a PR is closed or still open,
-                we shouldn't try to track it's MTTR
-                """
-                if not merged_ts:
-                    break
-                if not pattern.match(title):
-                    continue
-                self.stats["bug_matches"].append((title, commit, merged_ts))
+                closed[author] += 1
+            if ended:
+                time_open[author] += float(ended - created)
+                time_open_sketches[author].add(float(ended - created))
+
+            title = prs.titles[i]
+            merged_ts = None
+            if merged_at:
+                # naive (UTC) merge time, like the other times we match on
+                merged_ts = (
+                    datetime.fromtimestamp(merged_at, timezone.utc)
+                    .replace(tzinfo=None)
+                    .timestamp()
+                )
+
+            # count labels of this PR
+            pr_labels = prs.labels_of(i)
+            for code in pr_labels:
+                label_totals[code] += 1
+            for n, td_ts in enumerate(window_starts):
+                if td_ts < updated < base_ts:
+                    windowed[n][author] += 1
+                    for code in pr_labels:
+                        label_window[n][code] += 1
+                # worth also catching pull requests created in our window
+                elif td_ts < created < base_ts:
+                    windowed[n][author] += 1
+
             """
-            ensure we're sorted in date order
-            so our scans for matching releases can go faster
-            also ensure no duplicates
+            To properly track MTTR, we should only look at merged PRs,
+            so if a PR is closed or still open,
+            we shouldn't try to track it's MTTR
             """
-            self.stats["bug_matches"] = list(
-                set(sorted(self.stats["bug_matches"], key=lambda x: x[2]))
-            )
+            if merged_ts and self.bugfixes.is_bugfix(
+                title, (prs.labels.values[code] for code in pr_labels)
+            ):
+                add_bug_match(
+                    self.stats["bug_matches"],
+                    bug_matches_seen,
+                    (title, prs.commits[i], merged_ts),
+                )
+
+        """
+        Each raw label counts towards itself (unless it shares a name with
+        one of our additional labels) and every additional label it's part of
+        """
+        labels = self.stats["pull_requests"]["labels"]
+        for code, name in enumerate(prs.labels.values):
+            labelnames = self.label_index.get(name, [])
+            for labelname in labelnames:
+                self.log.debug(f"{name} counts towards {labelname}")
+            if name not in self.label_matches:
+                labelnames = labelnames + [name]
+                if name not in labels:
+                    labels[name] = {"total_prs": 0, "total_window_prs": 0}
+            for labelname in labelnames:
+                labels[labelname]["total_prs"] += label_totals[code]
+                for (days, stats), window_totals in zip(targets, label_window):
+                    window_labels = stats["pull_requests"]["labels"]
+                    if labelname not in window_labels:
+                        window_labels[labelname] = {"total_window_prs": 0}
+                    window_labels[labelname]["total_window_prs"] += window_totals[code]
+
+        for key, totals in user_totals.items():
+            self.stats["pull_requests"][key] += sum(totals)
+        for code, author in enumerate(authors):
+            for key, totals in user_totals.items():
+                self.stats["users"][author][key] += totals[code]
+            if time_open_sketches[code]:
+                merge_sketch(
+                    self.stats["pull_requests"],
+                    "pr_time_open_sketch",
+                    time_open_sketches[code],
+                )
+                merge_sketch(
+                    self.stats["users"][author],
+                    "pr_time_open_sketch",
+                    time_open_sketches[code],
+                )
+        for (days, stats), totals in zip(targets, windowed):
+            stats["pull_requests"]["total_window_pull_requests"] += sum(totals)
+            for code, author in enumerate(authors):
+                if totals[code]:
+                    self._window_user(stats, author)[
+                        "total_window_pull_requests"
+                    ] += totals[code]
 
         """
         Generate average PR time after collecting all stats
@@ -420,26 +840,24 @@ class GithubAccess(object):
 
         :returns: None
         """
-        self._set_collection_date(base_date, window)
-        td = base_date - timedelta(days=window)
-        td_ts = td.timestamp()
+        targets = self._window_targets(base_date, window)
+        window_starts = [
+            (base_date - timedelta(days=days)).timestamp() for days, _ in targets
+        ]
         base_ts = base_date.timestamp()
         starttime = time.time()
         self.log.info("Loading commit details...")
         self.stats["commits"]["collection_time"] = time.time() - starttime
-        for branchdata in self.repo.list_branches():
+        for branchdata in self._list_branches():
             branch, last_commit = branchdata
             self.log.debug(f"Processing commits to {branch}")
-            for commit in self.repo.branch_commit_log(branch):
+            for commit in self._branch_commit_log(branch):
                 if commit["time"] > base_ts:
                     self.log.debug(
                         f"{commit['hash']} for {commit['author']} is in the future. Skipping"
                     )
                     continue
-                try:
-                    user = self._cache_user_name(commit["author"].split(" <")[0])
-                except Exception:
-                    user = "unknown"
+                user = self._cache_commit_author(commit["author"])
                 if not user:
                     user = "unknown"
                 if branch == self.release_branch and self.branch_releases:
@@ -448,39 +866,37 @@ class GithubAccess(object):
                 self.stats["users"][user]["total_commits"] += 1
                 if commit["time"] > self.stats["users"][user]["last_commit_time"]:
                     self.stats["users"][user]["last_commit_time"] = commit["time"]
-                if td_ts < commit["time"] < base_ts:
-                    self.stats["commits"]["window_commits"] += 1
-                    self.stats["users"][user]["total_window_commits"] += 1
-                    if branch == self.release_branch and self.branch_releases:
-                        self.stats["releases"]["total_window_releases"] += 1
-                        self.stats["users"][user]["total_window_releases"] += 1
-                if branch in self.stats["commits"]["branch_commits"]:
-                    self.stats["commits"]["branch_commits"][branch][
-                        "total_commits"
-                    ] += 1
-                    if td_ts < commit["time"] < base_ts:
-                        self.log.debug(f"Window commit: {pprint.pformat(commit)}")
-                        self.stats["commits"]["branch_commits"][branch][
-                            "window_commits"
-                        ] += 1
-                else:
+                if branch not in self.stats["commits"]["branch_commits"]:
                     self.stats["commits"]["branch_commits"][branch] = {
-                        "total_commits": 1,
+                        "total_commits": 0,
                         "window_commits": 0,
                     }
-                    if td_ts < commit["time"] < base_ts:
-                        self.stats["commits"]["branch_commits"][branch][
-                            "window_commits"
-                        ] += 1
+                    for days, stats in targets[1:]:
+                        stats["commits"]["branch_commits"][branch] = {
+                            "window_commits": 0
+                        }
+                self.stats["commits"]["branch_commits"][branch]["total_commits"] += 1
+                for (days, stats), td_ts in zip(targets, window_starts):
+                    if not td_ts < commit["time"] < base_ts:
+                        continue
+                    self.log.debug(f"Window ({days}) commit: {commit['hash']}")
+                    window_user = self._window_user(stats, user)
+                    stats["commits"]["window_commits"] += 1
+                    window_user["total_window_commits"] += 1
+                    if branch == self.release_branch and self.branch_releases:
+                        stats["releases"]["total_window_releases"] += 1
+                        window_user["total_window_releases"] += 1
+                    stats["commits"]["branch_commits"][branch]["window_commits"] += 1
 
         (
             avg_commit_time,
             windowed_commit_time,
             unreleased_commits,
             total_commits,
-        ) = self.repo.commit_release_matching(base_date, window)
+        ) = self.repo.commit_release_matching(base_date, self.stats["windows"])
         self.stats["commits"]["avg_commit_time"] = avg_commit_time
-        self.stats["commits"]["windowed_commit_time"] = windowed_commit_time
+        for days, stats in targets:
+            stats["commits"]["windowed_commit_time"] = windowed_commit_time[days]
         self.stats["commits"]["unreleased_commits"] = unreleased_commits
         self.stats["commits"]["collection_time"] = time.time() - starttime
         self.stats["commits"]["total_commits"] = total_commits
@@ -498,22 +914,22 @@ class GithubAccess(object):
 
         :returns: None
         """
-        self._set_collection_date(base_date, window)
-        td = base_date - timedelta(days=window)
-        td_ts = td.timestamp()
+        targets = self._window_targets(base_date, window)
+        window_starts = [base_date - timedelta(days=days) for days, _ in targets]
         base_ts = base_date.timestamp()
         starttime = time.time()
         self.log.info("Loading branch details...")
         url = f"/repos/{self.repo_name}/branches"
         self.stats["commits"]["collection_time"] = time.time() - starttime
-        for branchdata in self.repo.list_branches():
+        for branchdata in self._list_branches():
             branch, last_commit = branchdata
             self.log.debug(f"Processing meta data for {branch}")
             self.stats["branches"]["total_branches"] += 1
             if branch == self.main_branch:
                 self.stats["main_branch_commits"] += 1
-            if td_ts < int(last_commit) < base_ts:
-                self.stats["branches"]["total_window_branches"] += 1
+            for (days, stats), td in zip(targets, window_starts):
+                if td.timestamp() < int(last_commit) < base_ts:
+                    stats["branches"]["total_window_branches"] += 1
 
             """
             Branch author data is harder to suss out from git
@@ -523,7 +939,7 @@ class GithubAccess(object):
             """
             url = f"/repos/{self.repo_name}/branches/{branch}"
             try:
-                data = [q for q in self._github_query(url)]
+                data = [q for q in self._github_query(url, fields=projections.BRANCH)]
                 if data:
                     data = data[0]
             except Exception:
@@ -550,9 +966,12 @@ class GithubAccess(object):
                     author = self._cache_user_login(data["commit"]["author"]["login"])
                     self.stats["users"][author]["total_branches"] += 1
                     # 2020-12-30T03:19:29Z (RFC3339)
-                    if dt_updated < base_date and dt_updated > td:
-                        self.stats["users"][author]["total_window_branches"] += 1
-                        self.log.debug(f"{branch=}: created {dt_updated}")
+                    for (days, stats), td in zip(targets, window_starts):
+                        if dt_updated < base_date and dt_updated > td:
+                            self._window_user(stats, author)[
+                                "total_window_branches"
+                            ] += 1
+                            self.log.debug(f"{branch=}: created {dt_updated}")
 
         self.stats["branches"]["collection_time"] = time.time() - starttime
         self.log.info(
@@ -671,7 +1090,9 @@ class GithubAccess(object):
         """
         self.log.debug("Loading contributor stats...")
         url = f"/repos/{self.repo_name}/stats/contributors"
-        for contributor in self._github_query(url):
+        for contributor in self._github_query(
+            url, fields=projections.CONTRIBUTOR_STATS
+        ):
             if not contributor:
                 self.log.warning(f"Received empty reply from {url}...")
                 continue
@@ -780,18 +1201,20 @@ class GithubAccess(object):
         """
         self.log.info("Loading release details...")
         starttime = time.time()
-        td = base_date - timedelta(days=window)
+        targets = self._window_targets(base_date, window)
+        window_starts = [base_date - timedelta(days=days) for days, _ in targets]
         url = f"/repos/{self.repo_name}/releases"
-        for release in self._github_query(url):
+        for release in self._github_query(url, fields=projections.RELEASE):
             name = release["name"]
             user = self._cache_user_login(release["author"]["login"])
             dt_created = datetime.strptime(release["created_at"], "%Y-%m-%dT%H:%M:%SZ")
             if dt_created > base_date:
                 self.log.debug(f"Release {name} was created in the future. Skipping.")
                 continue
-            if dt_created <= base_date and dt_created >= td:
-                self.stats["releases"]["total_window_releases"] += 1
-                self.stats["users"][user]["total_window_releases"] += 1
+            for (days, stats), td in zip(targets, window_starts):
+                if dt_created <= base_date and dt_created >= td:
+                    stats["releases"]["total_window_releases"] += 1
+                    self._window_user(stats, user)["total_window_releases"] += 1
             self.stats["releases"]["total_releases"] += 1
             self.stats["releases"]["releases"][name] = {
                 "created_at": str(dt_created),
@@ -811,12 +1234,18 @@ class GithubAccess(object):
         :returns: None
         """
         self.log.info("Loading workflow details...")
-        self._set_collection_date(base_date, window)
+        targets = self._window_targets(base_date, window)
         starttime = time.time()
-        td = base_date - timedelta(days=window)
+        window_starts = [
+            naive_ts(base_date - timedelta(days=days)) for days, _ in targets
+        ]
+        base_ts = naive_ts(base_date)
         url = f"/repos/{self.repo_name}/actions/runs"
+        runs = WorkflowRunColumns()
         # only request workflow detail within window
-        for run in self._github_query(url, key="workflow_runs"):
+        for run in self._github_query(
+            url, key="workflow_runs", fields=projections.WORKFLOW_RUN
+        ):
             workflow = run["name"]
             status = run["conclusion"]
             # reasons to skip
@@ -831,8 +1260,8 @@ class GithubAccess(object):
             if not status:
                 self.log.debug(f"Empty status for {workflow}...skipping")
                 continue
-            dt_created = datetime.strptime(run["created_at"], "%Y-%m-%dT%H:%M:%SZ")
-            if dt_created > base_date:
+            created = parse_ts(run["created_at"])
+            if created > base_ts:
                 self.log.debug(
                     f"Workflow {workflow} was created in the future. Skipping."
                 )
@@ -850,88 +1279,135 @@ class GithubAccess(object):
                         f"{name} doesn't exist in user cache or additional configs"
                     )
                     continue
-            start_time = parser.parse(run["run_started_at"]).timestamp()
-            """
-            the closed to 'finished' time is only collecting completed runs
-            and tracking the updated_at key
-            """
-            last_time = parser.parse(run["updated_at"]).timestamp()
-            run_time = last_time - start_time
-            event = run["event"]
-            # Track event stats
-            if event in self.stats["workflows"]["events"]:
-                self.stats["workflows"]["events"][event]["total"] += 1
-            else:
-                self.stats["workflows"]["events"][event] = {"total": 1, "window": 0}
-            if dt_created > td and dt_created < base_date:
-                self.stats["workflows"]["events"][event]["window"] += 1
-
-            # Track user stats
-            if event not in self.non_user_events:
-                if event in self.stats["users"][user]["events"]:
-                    self.stats["users"][user]["events"][event] += 1
-                else:
-                    self.stats["users"][user]["events"][event] = 1
-                if workflow in self.stats["users"][user]["workflows"]:
-                    if status in self.stats["users"][user]["workflows"][workflow]:
-                        self.stats["users"][user]["workflows"][workflow][status][
-                            "count"
-                        ] += 1
-                        self.stats["users"][user]["workflows"][workflow][status][
-                            "runtime"
-                        ] += run_time
-                    else:
-                        self.stats["users"][user]["workflows"][workflow][status] = {
-                            "count": 1,
-                            "runtime": run_time,
-                        }
-                else:
-                    self.stats["users"][user]["workflows"][workflow] = {
-                        status: {"count": 1, "runtime": run_time}
-                    }
+            runs.append(run, user, created)
 
-                if status in self.stats["users"][user]["workflow_totals"]:
-                    self.stats["users"][user]["workflow_totals"][status]["count"] += 1
-                    self.stats["users"][user]["workflow_totals"][status][
-                        "runtime"
-                    ] += run_time
-                else:
-                    self.stats["users"][user]["workflow_totals"][status] = {
-                        "count": 1,
-                        "runtime": run_time,
-                    }
+        """
+        Group the runs by event, by workflow (and status)
+        and by user/workflow/status, then fold each group into our stats.
+        Groups are keyed by codes in the order they were first seen,
+        so our stats keep the same ordering as the results
+        """
+        events = dict()
+        workflows = dict()
+        workflow_runs = dict()
+        user_events = dict()
+        user_runs = dict()
+        # run time sketches per workflow and per user (the repo's is merged from them)
+        workflow_sketches = [QuantileSketch() for _ in runs.workflows.values]
+        user_sketches = [QuantileSketch() for _ in runs.users.values]
+        user_event_codes = [
+            event not in self.non_user_events for event in runs.events.values
+        ]
+        for (
+            workflow,
+            status,
+            event,
+            user,
+            created,
+            run_time,
+            run_number,
+            attempt,
+        ) in zip(
+            runs.workflow,
+            runs.status,
+            runs.event,
+            runs.user,
+            runs.created,
+            runs.run_time,
+            runs.run_number,
+            runs.attempt,
+        ):
+            # [runs, runs in each window]
+            if event not in events:
+                events[event] = [0, [0] * len(targets)]
+            events[event][0] += 1
+            for n, td_ts in enumerate(window_starts):
+                if td_ts < created < base_ts:
+                    events[event][1][n] += 1
 
-            # Track workflow stats
-            if workflow in self.stats["workflows"]["workflows"]:
-                self.stats["workflows"]["workflows"][workflow]["total_window_runs"] += 1
-                if status in self.stats["workflows"]["workflows"][workflow]["runs"]:
-                    self.stats["workflows"]["workflows"][workflow]["runs"][status][
-                        "count"
-                    ] += 1
-                    self.stats["workflows"]["workflows"][workflow]["runs"][status][
-                        "runtime"
-                    ] += run_time
-                else:
-                    self.stats["workflows"]["workflows"][workflow]["runs"][status] = {
-                        "count": 1,
-                        "runtime": run_time,
-                    }
-            else:
-                self.stats["workflows"]["workflows"][workflow] = {
+            if user_event_codes[event]:
+                if (user, event) not in user_events:
+                    user_events[(user, event)] = 0
+                user_events[(user, event)] += 1
+                if (user, workflow, status) not in user_runs:
+                    user_runs[(user, workflow, status)] = [0, 0.0]
+                user_runs[(user, workflow, status)][0] += 1
+                user_runs[(user, workflow, status)][1] += run_time
+                user_sketches[user].add(run_time)
+
+            # [runs, retries, last run number]
+            if workflow not in workflows:
+                workflows[workflow] = [0, 0, run_number]
+            workflows[workflow][0] += 1
+            if attempt > 1:
+                workflows[workflow][1] += 1
+            if run_number > workflows[workflow][2]:
+                workflows[workflow][2] = run_number
+            if (workflow, status) not in workflow_runs:
+                workflow_runs[(workflow, status)] = [0, 0.0]
+            workflow_runs[(workflow, status)][0] += 1
+            workflow_runs[(workflow, status)][1] += run_time
+            workflow_sketches[workflow].add(run_time)
+
+        # Track event stats
+        for event, (total, windowed) in events.items():
+            name = runs.events.values[event]
+            if name not in self.stats["workflows"]["events"]:
+                self.stats["workflows"]["events"][name] = {"total": 0, "window": 0}
+            self.stats["workflows"]["events"][name]["total"] += total
+            for (days, stats), count in zip(targets, windowed):
+                if name not in stats["workflows"]["events"]:
+                    stats["workflows"]["events"][name] = {"window": 0}
+                stats["workflows"]["events"][name]["window"] += count
+
+        # Track user stats
+        for (user, event), count in user_events.items():
+            self.stats["users"][runs.users.values[user]].add_event(
+                runs.events.values[event], count
+            )
+        for (user, workflow, status), (count, run_time) in user_runs.items():
+            self.stats["users"][runs.users.values[user]].add_workflow_run(
+                runs.workflows.values[workflow],
+                runs.statuses.values[status],
+                run_time,
+                count,
+            )
+        for user, sketch in enumerate(user_sketches):
+            if sketch:
+                merge_sketch(
+                    self.stats["users"][runs.users.values[user]],
+                    "workflow_run_time_sketch",
+                    sketch,
+                )
+
+        # Track workflow stats
+        for workflow, (total, retries, last_run) in workflows.items():
+            name = runs.workflows.values[workflow]
+            if name not in self.stats["workflows"]["workflows"]:
+                self.stats["workflows"]["workflows"][name] = {
                     "retries": 0,
-                    "last_run": run["run_number"],
-                    "total_window_runs": 1,
-                    "runs": {status: {"count": 1, "runtime": run_time}},
+                    "last_run": last_run,
+                    "total_window_runs": 0,
+                    "runs": {},
+                    "run_time_sketch": None,
                 }
-            if run["run_attempt"] > 1:
-                self.stats["workflows"]["workflows"][workflow]["retries"] += 1
-            if (
-                run["run_number"]
-                > self.stats["workflows"]["workflows"][workflow]["last_run"]
-            ):
-                self.stats["workflows"]["workflows"][workflow]["last_run"] = run[
-                    "run_number"
-                ]
+            data = self.stats["workflows"]["workflows"][name]
+            data["total_window_runs"] += total
+            data["retries"] += retries
+            if last_run > data["last_run"]:
+                data["last_run"] = last_run
+            merge_sketch(data, "run_time_sketch", workflow_sketches[workflow])
+            merge_sketch(
+                self.stats["workflows"], "run_time_sketch", workflow_sketches[workflow]
+            )
+        for (workflow, status), (count, run_time) in workflow_runs.items():
+            data = self.stats["workflows"]["workflows"][runs.workflows.values[workflow]]
+            status = runs.statuses.values[status]
+            if status in data["runs"]:
+                data["runs"][status]["count"] += count
+                data["runs"][status]["runtime"] += run_time
+            else:
+                data["runs"][status] = {"count": count, "runtime": run_time}
 
         """
         calculate percentage of runs executed in this window
@@ -1,12 +1,28 @@
+from bisect import bisect_left
 from datetime import datetime, timedelta
 import logging
 import os
 import pygit2
 import time
 
-from github_stats.util import load_patterns
+from github_stats.util import load_patterns, window_list
 from github_stats.schema import DEFAULT_WINDOW
 
+"""
+pygit2 1.14 moved its constants into enums (and later releases
+dropped the old names), so support both
+"""
+try:
+    from pygit2.enums import ObjectType, ReferenceType
+
+    GIT_REF_OID = ReferenceType.DIRECT
+    GIT_OBJ_COMMIT = ObjectType.COMMIT
+    GIT_OBJ_TAG = ObjectType.TAG
+except ImportError:
+    GIT_REF_OID = pygit2.GIT_REF_OID
+    GIT_OBJ_COMMIT = pygit2.GIT_OBJ_COMMIT
+    GIT_OBJ_TAG = pygit2.GIT_OBJ_TAG
+
 
 class Repo(object):
     def __init__(self, config):
@@ -26,6 +42,10 @@ class Repo(object):
                 f"https://github.com/{config['repo']['org']}/{config['repo']['name']}"
             )
         self.repo_path = f"{config['repo']['folder']}/{config['repo']['name']}"
+        # running count of commits we've walked (for collector stats)
+        self.objects_walked = 0
+        # (commits, unreleased commits, commit time per release) of our last walk
+        self._release_matches = None
         self.primary_branches = config["repo"]["branches"]
         self.tag_matches, self.bug_matches, _ = load_patterns(
             config["repo"].get("tag_patterns", []),
@@ -47,8 +67,19 @@ class Repo(object):
                 self.repo_path,
                 callbacks=self.callbacks,
             )
-        self.log.info(f"Updating {self.repo_path}...")
         self.repoobj = pygit2.Repository(self.repo_path)
+        self.update()
+
+    def update(self):
+        """
+        Fetch the latest changes into our (already open) repo
+        and refresh the main branch and release tags
+
+        Long-running collectors call this instead of re-opening the repo
+
+        :returns: None
+        """
+        self.log.info(f"Updating {self.repo_path}...")
         remote = self.repoobj.remotes["origin"]
         progress = remote.fetch(callbacks=self.callbacks)
         # pulling data from repo is async, so we have to wait here
@@ -57,6 +88,7 @@ class Repo(object):
         self.main_branch_id = self._checkout_branch(
             self.primary_branches["main"]
         ).target
+        self._release_matches = None
 
         """
         find all matching tags
@@ -73,15 +105,15 @@ class Repo(object):
             # use this to short-circuit larger reference lists
             if (
                 "tag" in r
-                and self.repoobj.references[r].type == pygit2.GIT_REF_OID
+                and self.repoobj.references[r].type == GIT_REF_OID
                 and any(v.match(r) for v in self.tag_matches.values())
             ):
                 target = self.repoobj[self.repoobj.references[r].target]
-                if target.type == pygit2.GIT_OBJ_TAG:
+                if target.type == GIT_OBJ_TAG:
                     target = self.repoobj[target.target]
                 self.releases.append(
                     (
-                        str(target.hex),
+                        str(target.id),
                         int(target.commit_time),
                         str(target.author),
                     )
@@ -143,15 +175,20 @@ class Repo(object):
 
     def tag_releases(self, base_date=datetime.today(), window=DEFAULT_WINDOW):
         """
+        Windowed counts are kept per window (`window` may be a list of windows)
+
         :returns: total count of releases, windowed releases
         """
+        windows = window_list(window)
         tagged_releases = {
             "total_releases": 0,
             "users": dict(),
-            "total_window_releases": 0,
+            "total_window_releases": {days: 0 for days in windows},
         }
         window_end_ts = base_date.timestamp()
-        window_start_ts = (base_date - timedelta(window)).timestamp()
+        window_starts = [
+            (days, (base_date - timedelta(days)).timestamp()) for days in windows
+        ]
         for release in self.releases:
             user = release[2]
             tagged_releases["total_releases"] += 1
@@ -159,13 +196,14 @@ class Repo(object):
                 tagged_releases["users"][user]["total_releases"] += 1
             else:
                 tagged_releases["users"][user] = {
-                    "total_window_releases": 0,
+                    "total_window_releases": {days: 0 for days in windows},
                     "total_releases": 1,
                 }
             # because we check for the user above this if statement, we don't have to check again inside it
-            if window_start_ts < release[1] < window_end_ts:
-                tagged_releases["total_window_releases"] += 1
-                tagged_releases["users"][user]["total_window_releases"] += 1
+            for days, window_start_ts in window_starts:
+                if window_start_ts < release[1] < window_end_ts:
+                    tagged_releases["total_window_releases"][days] += 1
+                    tagged_releases["users"][user]["total_window_releases"][days] += 1
         self.log.debug(f"{tagged_releases=}")
         return tagged_releases
 
@@ -178,71 +216,75 @@ class Repo(object):
         A "matching" release in this case is the nearest release in the
         commit log that is newer than the commit itself
 
-        :returns: rough mttr, rough windowed mttr
-        :rtype: float
+        Windowed mttr is kept per window (`window` may be a list of windows)
+
+        :returns: rough mttr, rough windowed mttr (per window)
+        :rtype: tuple(float, dict)
         """
+        windows = window_list(window)
         if not self.releases or not pr_list:
-            return 0, 0
+            return 0, {days: 0 for days in windows}
         window_end_ts = base_date.timestamp()
-        window_start_ts = (base_date - timedelta(window)).timestamp()
-        windowed_mttr = 0
-        windowed_releases = list()
+        window_starts = [
+            (days, (base_date - timedelta(days)).timestamp()) for days in windows
+        ]
+        windowed_mttr = {days: 0 for days in windows}
+        windowed_releases = {days: set() for days in windows}
         mttr = 0
         self.log.debug("Tracking MTTR...")
+        # releases are sorted by time, so the first release at or after
+        # a fix is where a binary search for the fix's time lands
+        release_times = [release[1] for release in self.releases]
         for pr in pr_list:
-            for release in self.releases:
-                # if timestamp is greater than release timestamp, then this belongs to a newer release
-                if pr[2] > release[1]:
-                    continue
-                elif pr[2] <= release[1]:
-                    self.log.debug(f"{pr[0]} ({pr[1]}) belongs to {release}")
-                    # diff between the release time and the commit time
-                    release_time = release[1] - pr[2]
-                    mttr += release_time
-                    """
-                    add this release to windowed releases
-                    don't worry about duplicates because we can
-                    filter them afterwards
-                    """
-                    if window_start_ts < release[1] < window_end_ts:
-                        windowed_releases.append(release[0])
-                        windowed_mttr += release_time
-                    break
+            idx = bisect_left(release_times, pr[2])
+            if idx == len(self.releases):
+                # not released yet
+                continue
+            release = self.releases[idx]
+            self.log.debug(f"{pr[0]} ({pr[1]}) belongs to {release}")
+            # diff between the release time and the commit time
+            release_time = release[1] - pr[2]
+            mttr += release_time
+            """
+            add this release to windowed releases
+            (a set, so each release is only counted once)
+            """
+            for days, window_start_ts in window_starts:
+                if window_start_ts < release[1] < window_end_ts:
+                    windowed_releases[days].add(release[0])
+                    windowed_mttr[days] += release_time
         mttr = mttr / len(pr_list)
-        if windowed_releases:
-            # ensure no duplicate releases are counted here
-            windowed_releases = list(set(windowed_releases))
-            windowed_mttr = windowed_mttr / len(windowed_releases)
-        else:
-            windowed_mttr = 0
+        for days, releases in windowed_releases.items():
+            if releases:
+                windowed_mttr[days] = windowed_mttr[days] / len(releases)
         self.log.debug(f"{mttr=}, {windowed_mttr=}")
         return mttr, windowed_mttr
 
-    def commit_release_matching(
-        self, base_date=datetime.today(), window=DEFAULT_WINDOW
-    ):
+    def _match_commits_to_releases(self):
         """
         1. Loop through a sorted list of all commits to the repo
         2. find the nearest tagged release to each individual commit
         3. diff the time between the commit and the release
-        4. do a rolling average on number of releases
 
-        :returns: Avg commit time, avg windowed commit time, count of unreleased commits, count of all commits
-        :rtype: tuple(int, int, int, int)
+        The walk doesn't depend on when we collect, so its result is
+        kept until the next `update` (a backfill computes many
+        timestamps from one walk)
+
+        :returns: count of all commits, count of unreleased commits, total commit time per release (by index)
+        :rtype: tuple(int, int, dict)
         """
-        window_end_ts = base_date.timestamp()
-        window_start_ts = (base_date - timedelta(window)).timestamp()
-        avg_commit_time = 0
+        if self._release_matches is not None:
+            return self._release_matches
         unreleased_commits = 0
         commits = 0
-        windowed_releases = list()
-        windowed_commit_time = 0
+        release_times = dict()
         walker = self.repoobj.walk(
             self.main_branch_id, pygit2.GIT_SORT_TOPOLOGICAL | pygit2.GIT_SORT_REVERSE
         )
         for commit in walker:
+            self.objects_walked += 1
             timestamp = int(commit.commit_time)
-            commit_hex = str(commit.hex)
+            commit_hex = str(commit.id)
             commits += 1
 
             # short-circuit evaluation if we're missing releases
@@ -251,7 +293,7 @@ class Repo(object):
             # skip super old timestamps that have bad tags/etc.
             if timestamp < self.releases[0][1]:
                 continue
-            for release in self.releases:
+            for idx, release in enumerate(self.releases):
                 # if timestamp is greater than release timestamp, then this belongs to a newer release
                 if timestamp > release[1]:
                     continue
@@ -261,32 +303,61 @@ class Repo(object):
                 elif timestamp <= release[1]:
                     self.log.debug(f"{commit_hex} belongs to {release}")
                     # diff between the release time and the commit time
-                    release_time = release[1] - timestamp
-                    avg_commit_time += release_time
-                    if window_start_ts < release[1] < window_end_ts:
-                        windowed_releases.append(release[0])
-                        windowed_commit_time += release_time
+                    if idx not in release_times:
+                        release_times[idx] = 0
+                    release_times[idx] += release[1] - timestamp
                     break
             else:
                 self.log.debug(f"No release found for {commit_hex}")
                 unreleased_commits += 1
+        self._release_matches = (commits, unreleased_commits, release_times)
+        return self._release_matches
+
+    def commit_release_matching(
+        self, base_date=datetime.today(), window=DEFAULT_WINDOW
+    ):
+        """
+        Average the time between commits and the release they went out in
+        (a rolling average on number of releases)
+
+        The windowed average is kept per window (`window` may be a list of
+        windows), all computed from the same (cached) walk of the commit log
+
+        :returns: Avg commit time, avg windowed commit time (per window), count of unreleased commits, count of all commits
+        :rtype: tuple(int, dict, int, int)
+        """
+        windows = window_list(window)
+        window_end_ts = base_date.timestamp()
+        window_starts = [
+            (days, (base_date - timedelta(days)).timestamp()) for days in windows
+        ]
+        commits, unreleased_commits, release_times = self._match_commits_to_releases()
+        windowed_releases = {days: set() for days in windows}
+        windowed_commit_time = {days: 0 for days in windows}
+        avg_commit_time = 0
+        for idx, release_time in release_times.items():
+            release = self.releases[idx]
+            avg_commit_time += release_time
+            for days, window_start_ts in window_starts:
+                if window_start_ts < release[1] < window_end_ts:
+                    windowed_releases[days].add(release[0])
+                    windowed_commit_time[days] += release_time
 
         if self.releases:
             # add one additional release to address commits before the initial release that we skip
             avg_commit_time = avg_commit_time / (len(self.releases) + 1)
-            if windowed_releases:
-                # ensure no duplicate releases are counted here
-                windowed_releases = list(set(windowed_releases))
-                windowed_commit_time = windowed_commit_time / len(windowed_releases)
-            else:
-                # no releases in our window
-                windowed_commit_time = 0
+            for days, releases in windowed_releases.items():
+                # (no releases in a window leaves it at 0)
+                if releases:
+                    windowed_commit_time[days] = windowed_commit_time[days] / len(
+                        releases
+                    )
             self.log.debug(
                 f"{avg_commit_time=}, {windowed_commit_time=}, {unreleased_commits=}, {commits=}"
             )
             return avg_commit_time, windowed_commit_time, unreleased_commits, commits
         else:
-            return 0, 0, commits, commits
+            return 0, windowed_commit_time, commits, commits
 
     def branch_commit_log(self, branch_name):
         """
@@ -322,9 +393,10 @@ class Repo(object):
                 walker.hide(self.main_branch_id)
             for commit in walker:
                 commit_count += 1
+                self.objects_walked += 1
                 # commit objects are C objects, need to convert types
                 commitobj = {
-                    "hash": str(commit.hex),
+                    "hash": str(commit.id),
                     "author": str(commit.author),
                     "time": int(commit.commit_time),
                     "branch": branch_name,
@@ -0,0 +1,66 @@
+"""
+Durable record of backfill progress
+
+Every (repo, timestamp) unit that has been collected *and written* gets a line
+in an append-only JSON lines file. Lines are flushed and fsync'd before we
+move on, so after a crash we only redo units that were in flight. A partially
+written last line (from a crash mid-write) is ignored.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+
+class BackfillJournal(object):
+    def __init__(self, path, restart=False):
+        self.log = logging.getLogger("github-stats.journal")
+        self.path = path
+        self._lock = threading.Lock()
+        self.completed = set()
+        if restart and os.path.exists(path):
+            self.log.info(f"Discarding existing journal {path}")
+            os.remove(path)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        self.log.warning(f"Skipping damaged journal entry: {line!r}")
+                        continue
+                    self.completed.add((entry["repo"], entry["timestamp"]))
+            self.log.info(f"Loaded {len(self.completed)} completed units from {path}")
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def done(self, repo, timestamp):
+        """
+        :returns: whether a unit was already written
+        :rtype: bool
+        """
+        return (repo, int(timestamp)) in self.completed
+
+    def record(self, repo, timestamps):
+        """
+        Mark units as written (call only after the write succeeded)
+
+        :returns: None
+        """
+        written_at = int(time.time())
+        lines = "".join(
+            json.dumps({"repo": repo, "timestamp": int(ts), "written_at": written_at})
+            + "\n"
+            for ts in timestamps
+        )
+        with self._lock:
+            self._file.write(lines)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.completed.update((repo, int(ts)) for ts in timestamps)
+
+    def close(self):
+        self._file.close()
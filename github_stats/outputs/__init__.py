@@ -1,11 +1,39 @@
 from datetime import timedelta
 from copy import deepcopy
 import logging
+import time
 
+from github_stats.outputs.cardinality import CardinalityGuard
+from github_stats.outputs.dedup import SeriesDeduplicator
 from github_stats.schema import tmp_statobj
+from github_stats.sketch import DEFAULT_QUANTILES
+
+# series counted per collection window
+WINDOW_SERIES = frozenset(
+    [
+        "window_commits_total",
+        "avg_windowed_commit_release_time_secs",
+        "branch_window_commits_total",
+        "windowed_mttr_secs",
+        "window_releases_total",
+        "window_pull_requests_total",
+        "window_labelled_prs_total",
+        "window_branches_total",
+        "workflows_events_window_total",
+        "users_window_releases_total",
+        "users_window_branches_total",
+        "users_window_commits_total",
+        "users_window_pull_requests_total",
+    ]
+)
 
 
 class StatsOutput(object):
+    # used to keep per-output state (e.g. dedup fingerprints) apart
+    output_name = "stats"
+    # only outputs that push series somewhere opt in to dedup
+    dedup_supported = False
+
     def __init__(self, config, timestamp=0.0):
         self.log = logging.getLogger("github-stats.output")
         default_labels = {"repository_name": config["repo"]["name"]}
@@ -16,10 +44,80 @@ class StatsOutput(object):
         self.main_branch = config["repo"]["branches"].get("main", "main")
         self.release_branch = config["repo"]["branches"].get("release", "main")
         self.float_measurements = ["percent", "gauge"]
+        self.quantiles = config.get("quantiles", DEFAULT_QUANTILES)
         self.broken_users = config["repo"].get("broken_users", [])
         self.user_time_filter = config["repo"].get("user_time_filter", False)
+        self.cardinality = None
+        if config.get("cardinality", {}):
+            self.cardinality = CardinalityGuard(config["cardinality"])
+        self.dedup = None
+        dedup_config = config.get("dedup", {})
+        if dedup_config.get("enabled", False) and self.dedup_supported:
+            folder = dedup_config.get("state_folder", config["repo"].get("folder", "."))
+            self.dedup = SeriesDeduplicator(
+                f"{folder}/.{self.output_name}-{config['repo']['name']}.dedup.json",
+                dedup_config.get("full_refresh_interval", 86400),
+            )
+
+    def set_timestamp(self, timestamp):
+        """
+        Change the timestamp attached to series we build
+        (lets one output handle many collections, e.g. a backfill)
+
+        :returns: None
+        """
+        self.tmpobj["timestamp"] = timestamp
 
     def format_stats(self, stats_object):
+        """
+        Build the shared series list and hand it to this output
+
+        :returns: whatever format_series returns
+        """
+        return self.format_series(self.build_stats(stats_object))
+
+    def format_series(self, formatted_stats):
+        """
+        Output-specific handling of already built series
+
+        Outputs override this to reformat series for their backend like so:
+
+        formatted_stats = super().format_series(formatted_stats)
+
+        Series may be shared with other outputs (see OutputFanout),
+        so never modify them in place.
+
+        :returns: series this output should write
+        :rtype: list
+        """
+        if self.dedup:
+            if "timestamp" in self.tmpobj:
+                now = self.tmpobj["timestamp"].timestamp()
+            else:
+                now = time.time()
+            formatted_stats = self.dedup.filter(formatted_stats, now)
+        return formatted_stats
+
+    def _quantile_stats(self, formatted_stats, name, sketch, labels, description):
+        """
+        Add a series per configured quantile of a sketch
+        (skipped when the sketch is empty)
+
+        :returns: None
+        """
+        if not sketch:
+            return
+        for q, value in zip(self.quantiles, sketch.quantiles(self.quantiles)):
+            stat = deepcopy(self.tmpobj)
+            stat["name"] = name
+            stat["labels"].update(labels)
+            stat["labels"]["quantile"] = str(q)
+            stat["measurement_type"] = "gauge"
+            stat["value"] = value
+            stat["description"] = description
+            formatted_stats.append(stat)
+
+    def build_stats(self, stats_object):
         """
         function to ensure all out-going stats
         are in a consistent format
@@ -27,12 +125,9 @@ class StatsOutput(object):
         The basic idea being we can convert a massive
         dictionary object into a list of individual stats
 
-        call this within an overridden subobject like so:
-
-        formatted_stats = super().format_stats(stats_object)
-
-        Then we can process any additional stats or formatting
-        changes needed for individual outputs.
+        This is the expensive part of formatting and doesn't depend on
+        the output, so it only needs to run once per collection no
+        matter how many outputs we write to.
 
         Each "section" below is simply a group of metrics being
         re-formatted from the initial collection. Sectioning just helps
@@ -168,6 +263,54 @@ class StatsOutput(object):
         stat["description"] = "Total time (in seconds) that collection took"
         formatted_stats.append(stat)
 
+        """
+        Collector self-instrumentation
+        What each collection section cost us (API requests, quota, git walks)
+        These are per-collection amounts (not running totals), so they're gauges
+
+        example:
+         'collector': {'pull_requests': {'bytes': 1234567,
+                                         'git_objects': 0,
+                                         'pages': 4,
+                                         'quota_used': 4,
+                                         'requests': 4,
+                                         'retries': 0}}
+        """
+        collector_desc = {
+            "requests": (
+                "collector_requests",
+                "HTTP requests made to the Github API",
+            ),
+            "retries": (
+                "collector_retries",
+                "Github API requests that had to be retried",
+            ),
+            "bytes": (
+                "collector_received_bytes",
+                "Bytes received from the Github API",
+            ),
+            "pages": (
+                "collector_pages",
+                "Result pages read from the Github API",
+            ),
+            "git_objects": (
+                "collector_git_objects_walked",
+                "Commits walked in the local git repo",
+            ),
+            "quota_used": (
+                "collector_quota_used",
+                "Github API rate limit quota consumed",
+            ),
+        }
+        for section, counters in stats_object.get("collector", {}).items():
+            for key, value in counters.items():
+                stat = deepcopy(self.tmpobj)
+                stat["name"], stat["description"] = collector_desc[key]
+                stat["measurement_type"] = "gauge"
+                stat["labels"]["section"] = section
+                stat["value"] = value
+                formatted_stats.append(stat)
+
         """
         Pull requests
 
@@ -257,6 +400,13 @@ class StatsOutput(object):
             stat["measurement_type"] = desc["type"]
             stat["value"] = pulls[desc["key"]]
             formatted_stats.append(stat)
+        self._quantile_stats(
+            formatted_stats,
+            "pr_time_open_secs",
+            pulls.get("pr_time_open_sketch"),
+            {},
+            "Seconds closed/merged PRs were open (quantiles)",
+        )
         for label, data in pulls["labels"].items():
             for k, v in label_desc.items():
                 stat = deepcopy(self.tmpobj)
@@ -412,6 +562,13 @@ class StatsOutput(object):
             stat["measurement_type"] = "gauge"
             stat["value"] = timetaken
             formatted_stats.append(stat)
+        self._quantile_stats(
+            formatted_stats,
+            "workflow_run_time_secs",
+            workflows.get("run_time_sketch"),
+            {},
+            "Seconds taken by workflow runs (quantiles)",
+        )
         for k, counts in workflows.get("events", {}).items():
             for key, val in counts.items():
                 stat = deepcopy(self.tmpobj)
@@ -453,6 +610,13 @@ class StatsOutput(object):
                 stat["description"] = desc["desc"]
                 stat["measurement_type"] = desc["type"]
                 formatted_stats.append(stat)
+            self._quantile_stats(
+                formatted_stats,
+                "workflows_run_time_secs",
+                v.get("run_time_sketch"),
+                {"workflow": k},
+                "Seconds taken by runs of a workflow (quantiles)",
+            )
         """
         Format user/contributor stats
 
@@ -530,7 +694,7 @@ class StatsOutput(object):
             "window_pull_requests_total": {
                 "desc": "all created PRs by user in time range",
                 "type": "gauge",
-                "key": "total_pull_requests",
+                "key": "total_window_pull_requests",
             },
             "pull_requests_total": {
                 "desc": "all created PRs by user",
@@ -542,7 +706,7 @@ class StatsOutput(object):
             stats_object["collection_date"] - timedelta(days=stats_object["window"])
         ).timestamp()
         dropped_users = 0
-        accepted_users = 0
+        accepted_users = list()
         for user, data in stats_object.get("users", {}).items():
             if user in self.broken_users:
                 self.log.warning(
@@ -555,7 +719,7 @@ class StatsOutput(object):
                 )
                 dropped_users += 1
                 continue
-            accepted_users += 1
+            accepted_users.append(user)
             for wkstat, desc in user_descriptions.items():
                 stat = deepcopy(self.tmpobj)
                 stat["name"] = f"users_{wkstat}"
@@ -564,6 +728,20 @@ class StatsOutput(object):
                 stat["value"] = data[desc["key"]]
                 stat["description"] = desc["desc"]
                 formatted_stats.append(stat)
+            self._quantile_stats(
+                formatted_stats,
+                "users_pr_time_open_secs",
+                data.get("pr_time_open_sketch"),
+                {"user": user},
+                "Seconds a user's closed/merged PRs were open (quantiles)",
+            )
+            self._quantile_stats(
+                formatted_stats,
+                "users_workflow_run_time_secs",
+                data.get("workflow_run_time_sketch"),
+                {"user": user},
+                "Seconds taken by workflow runs a user triggered (quantiles)",
+            )
             for wktype, runobj in data["workflow_totals"].items():
                 stat = deepcopy(self.tmpobj)
                 stat["name"] = "users_workflow_total"
@@ -616,7 +794,7 @@ class StatsOutput(object):
         stat = deepcopy(self.tmpobj)
         stat["name"] = "users_accepted"
         stat["measurement_type"] = "gauge"
-        stat["value"] = accepted_users
+        stat["value"] = len(accepted_users)
         stat["description"] = "Number of user objects that pass filtering"
         formatted_stats.append(stat)
 
@@ -811,8 +989,120 @@ class StatsOutput(object):
             stat["value"] = timetaken
             formatted_stats.append(stat)
 
+        if len(stats_object.get("windows", [])) > 1:
+            formatted_stats.extend(
+                self._window_series(formatted_stats, stats_object, accepted_users)
+            )
+
+        if self.cardinality:
+            formatted_stats = self.cardinality.apply(formatted_stats)
+            for family, dropped in self.cardinality.dropped.items():
+                stat = deepcopy(self.tmpobj)
+                stat["name"] = "cardinality_dropped_series"
+                stat["measurement_type"] = "gauge"
+                stat["labels"]["family"] = family
+                stat["value"] = dropped
+                stat[
+                    "description"
+                ] = "Series folded into an 'other' label value to stay within budget"
+                formatted_stats.append(stat)
         return formatted_stats
 
+    def _window_series(self, formatted_stats, stats_object, users):
+        """
+        With more than one collection window, every window-scoped series
+        gets a `window` label ("7d"). The first window's series are
+        already built (from the usual stats keys), so label those, then
+        build the same series for each other window
+
+        :returns: series for the other windows
+        :rtype: list
+        """
+        windows = stats_object["windows"]
+        templates = dict()
+        for stat in formatted_stats:
+            if stat["name"] in WINDOW_SERIES:
+                stat["labels"]["window"] = f"{windows[0]}d"
+                templates[stat["name"]] = stat
+
+        window_stats = list()
+        for days in windows[1:]:
+            data = stats_object["window_stats"][days]
+            commits = data["commits"]
+            values = [
+                ("window_commits_total", {}, commits["window_commits"]),
+                (
+                    "avg_windowed_commit_release_time_secs",
+                    {},
+                    commits["windowed_commit_time"],
+                ),
+                ("windowed_mttr_secs", {}, data["windowed_mttr"]),
+                (
+                    "window_releases_total",
+                    {},
+                    data["releases"]["total_window_releases"],
+                ),
+                (
+                    "window_pull_requests_total",
+                    {},
+                    data["pull_requests"]["total_window_pull_requests"],
+                ),
+                (
+                    "window_branches_total",
+                    {},
+                    data["branches"]["total_window_branches"],
+                ),
+            ]
+            for branchname, counts in commits["branch_commits"].items():
+                values.append(
+                    (
+                        "branch_window_commits_total",
+                        {"branch": branchname},
+                        counts["window_commits"],
+                    )
+                )
+            for label, counts in data["pull_requests"]["labels"].items():
+                values.append(
+                    (
+                        "window_labelled_prs_total",
+                        {"label": label},
+                        counts["total_window_prs"],
+                    )
+                )
+            for event, counts in data["workflows"]["events"].items():
+                values.append(
+                    (
+                        "workflows_events_window_total",
+                        {"event_type": event},
+                        counts["window"],
+                    )
+                )
+            for user in users:
+                counts = data["users"].get(user, {})
+                for name, key in [
+                    ("users_window_releases_total", "total_window_releases"),
+                    ("users_window_branches_total", "total_window_branches"),
+                    ("users_window_commits_total", "total_window_commits"),
+                    (
+                        "users_window_pull_requests_total",
+                        "total_window_pull_requests",
+                    ),
+                ]:
+                    values.append((name, {"user": user}, counts.get(key, 0)))
+
+            for name, labels, value in values:
+                if name not in templates:
+                    continue
+                stat = deepcopy(self.tmpobj)
+                stat["name"] = name
+                stat["measurement_type"] = templates[name]["measurement_type"]
+                stat["description"] = templates[name]["description"]
+                stat["labels"].update(labels)
+                stat["labels"]["window"] = f"{days}d"
+                stat["value"] = value
+                window_stats.append(stat)
+        return window_stats
+
     def write_stats(self, formatted_stats):
         """
         Actually write stats to output
@@ -0,0 +1,96 @@
+"""
+Keep high-cardinality metric families inside a series budget
+
+A budget applies to every metric whose name matches a (fnmatch-style) pattern
+and that carries a particular label (e.g. `user` or `workflow`). The top K
+label values (ranked by the sum of their counts, or by a single metric with
+`rank_by`) are kept exactly, every other label value is folded into a single
+`other` value. Only counts (and anything named `*_total`) add up, so only
+they are folded (summed, so totals are preserved). Everything else
+(timestamps, durations, averages, quantiles) means nothing summed or
+averaged across label values, so those series are dropped for label values
+outside the budget.
+"""
+from fnmatch import fnmatchcase
+import logging
+
+OTHER_LABEL = "other"
+
+
+def _additive(stat):
+    return stat["measurement_type"] == "count" or stat["name"].endswith("_total")
+
+
+class CardinalityGuard(object):
+    def __init__(self, budgets):
+        self.log = logging.getLogger("github-stats.output.cardinality")
+        self.budgets = budgets
+        # pattern -> series folded into 'other' during the last apply()
+        self.dropped = dict()
+
+    def apply(self, formatted_stats):
+        """
+        Apply every budget in order
+
+        :returns: stats within budget
+        :rtype: list
+        """
+        self.dropped = dict()
+        for pattern, budget in self.budgets.items():
+            formatted_stats = self._apply_budget(
+                formatted_stats,
+                pattern,
+                budget["label"],
+                budget.get("top_k", 25),
+                budget.get("rank_by", None),
+            )
+        return formatted_stats
+
+    def _apply_budget(self, formatted_stats, pattern, label, top_k, rank_by):
+        scores = dict()
+        for stat in formatted_stats:
+            if label not in stat["labels"] or not fnmatchcase(stat["name"], pattern):
+                continue
+            if (rank_by and stat["name"] != rank_by) or (
+                not rank_by and not _additive(stat)
+            ):
+                scores.setdefault(stat["labels"][label], 0)
+                continue
+            value = stat["labels"][label]
+            scores[value] = scores.get(value, 0) + abs(stat["value"] or 0)
+        if len(scores) <= top_k:
+            self.dropped[pattern] = 0
+            return formatted_stats
+        ranked = sorted(scores.items(), key=lambda x: (-x[1], str(x[0])))
+        keep = set(k for k, _ in ranked[:top_k])
+        keep.add(OTHER_LABEL)
+
+        kept = list()
+        rolled = dict()
+        dropped = 0
+        for stat in formatted_stats:
+            if (
+                label not in stat["labels"]
+                or stat["labels"][label] in keep
+                or not fnmatchcase(stat["name"], pattern)
+            ):
+                kept.append(stat)
+                continue
+            dropped += 1
+            if not _additive(stat):
+                continue
+            labels = dict(stat["labels"])
+            labels[label] = OTHER_LABEL
+            key = (stat["name"], tuple(sorted(labels.items())))
+            if key in rolled:
+                rolled[key]["value"] += stat["value"] or 0
+            else:
+                rolled[key] = dict(stat)
+                rolled[key]["labels"] = labels
+                rolled[key]["value"] = stat["value"] or 0
+        kept.extend(rolled.values())
+        self.dropped[pattern] = dropped
+        self.log.info(
+            f"Folded {dropped} series ({len(scores) - top_k} {label} values) matching {pattern} into '{OTHER_LABEL}' (counts) or dropped them"
+        )
+        return kept
@@ -0,0 +1,96 @@
+"""
+Suppress series whose value hasn't changed since we last wrote them
+
+Most series are identical from one run to the next, so we keep a small
+fingerprint of every series we've written (a hash of the series key and
+a hash of its value) and only pass along series that are new or changed.
+Every `full_refresh_interval` seconds we write everything again so a TSDB
+with a retention/staleness window never loses a series entirely. Series
+that weren't part of a full refresh (closed branches, removed users,
+labels folded into "other") are dropped from our state then, so it only
+grows with the series we actually emit.
+"""
+from hashlib import blake2b
+import json
+import logging
+import os
+
+
+def _digest(value, size):
+    return blake2b(value.encode("utf-8"), digest_size=size).hexdigest()
+
+
+def series_key(stat):
+    """
+    Stable identity of a series: metric name plus its sorted labels
+
+    :returns: short hash of the series identity
+    :rtype: str
+    """
+    labels = ",".join(f"{k}={v}" for k, v in sorted(stat["labels"].items()))
+    return _digest(f"{stat['name']}{{{labels}}}", 8)
+
+
+class SeriesDeduplicator(object):
+    def __init__(self, state_file, full_refresh_interval=86400):
+        self.log = logging.getLogger("github-stats.output.dedup")
+        self.state_file = state_file
+        self.full_refresh_interval = full_refresh_interval
+        self.state = {"last_full_refresh": 0, "series": dict()}
+        self.pending = None
+        if os.path.exists(state_file):
+            try:
+                with open(state_file, "r", encoding="utf-8") as f:
+                    self.state = json.load(f)
+            except Exception as e:
+                self.log.warning(f"Couldn't load {state_file}, writing all series: {e}")
+
+    def filter(self, formatted_stats, now):
+        """
+        Return only series that changed since the last commit
+
+        Changes aren't recorded until `commit` is called (after a successful
+        write), so a failed write is retried in full on the next run.
+
+        :returns: series to write
+        :rtype: list
+        """
+        full_refresh = (
+            abs(now - self.state["last_full_refresh"]) >= self.full_refresh_interval
+        )
+        known = self.state["series"]
+        updates = dict()
+        changed = list()
+        for stat in formatted_stats:
+            key = series_key(stat)
+            value = _digest(repr(stat["value"]), 4)
+            # a batch may hold the same series for several timestamps
+            if full_refresh or updates.get(key, known.get(key)) != value:
+                changed.append(stat)
+                updates[key] = value
+        self.pending = (updates, now if full_refresh else None)
+        self.log.info(
+            f"{len(changed)} of {len(formatted_stats)} series changed ({full_refresh=})"
+        )
+        return changed
+
+    def commit(self):
+        """
+        Persist fingerprints of the series we just wrote
+        (after a full refresh, only those series are kept)
+
+        :returns: None
+        """
+        if not self.pending:
+            return
+        updates, refreshed = self.pending
+        self.pending = None
+        if refreshed is not None:
+            self.state["series"] = updates
+            self.state["last_full_refresh"] = refreshed
+        else:
+            self.state["series"].update(updates)
+        tmpfile = f"{self.state_file}.{os.getpid()}.tmp"
+        with open(tmpfile, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, separators=(",", ":"))
+        os.replace(tmpfile, self.state_file)
@@ -0,0 +1,116 @@
+"""
+Write one collection to several outputs
+
+The expensive part of formatting (building the series list from the stats
+object) happens once, then every configured output formats and writes the
+shared series on its own worker thread. Adding an output only costs its
+own write time. Profiled sections can't overlap, so with a profiler the
+outputs are written one after another instead.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+import importlib
+import logging
+
+# local imports
+from github_stats.outputs import StatsOutput
+
+"""
+Outputs are imported on demand so we only need the (optional)
+dependencies of the outputs we actually use
+"""
+OUTPUTS = {
+    "google": ("github_stats.outputs.google", "GoogleOutput"),
+    "influx": ("github_stats.outputs.influx", "InfluxOutput"),
+    "parquet": ("github_stats.outputs.parquet", "ParquetOutput"),
+    "prometheus": ("github_stats.outputs.prometheus", "PrometheusOutput"),
+}
+
+
+def load_output(name):
+    """
+    :returns: output class for a configured output name
+    :rtype: StatsOutput
+    """
+    if name not in OUTPUTS:
+        raise Exception(f"Unknown output {name}, expected one of {list(OUTPUTS)}")
+    module, classname = OUTPUTS[name]
+    return getattr(importlib.import_module(module), classname)
+
+
+class OutputFanout(object):
+    def __init__(self, config, timestamp=0.0, outputs=None, profiler=None):
+        self.log = logging.getLogger("github-stats.output.fanout")
+        self.repo = config["repo"]["name"]
+        self.profiler = profiler
+        if not outputs:
+            outputs = config.get("outputs", ["influx"])
+        self.builder = StatsOutput(config, timestamp)
+        self.outputs = [load_output(name)(config, timestamp) for name in outputs]
+        self.formatted_stats = list()
+        self.output_stat_count = 0
+
+    def set_timestamp(self, timestamp):
+        """
+        Change the timestamp of the next collection we format
+
+        :returns: None
+        """
+        self.builder.set_timestamp(timestamp)
+        for output in self.outputs:
+            output.set_timestamp(timestamp)
+
+    def format_stats(self, stats_object):
+        """
+        Build the shared series list once
+
+        Series are buffered until the next write, so several
+        collections (e.g. backfill timestamps) can be written in bulk
+
+        :returns: None
+        """
+        with self._profile("build"):
+            self.formatted_stats.extend(self.builder.build_stats(stats_object))
+        self.output_stat_count = len(self.formatted_stats)
+
+    def _profile(self, name):
+        """
+        :returns: profiling context for one step (or a no-op without a profiler)
+        """
+        if not self.profiler:
+            return nullcontext()
+        return self.profiler.section(f"{self.repo}.output.{name}")
+
+    def _write(self, output):
+        with self._profile(f"{output.output_name}.format"):
+            output.format_series(self.formatted_stats)
+        with self._profile(f"{output.output_name}.write"):
+            output.write_stats()
+
+    def write_stats(self):
+        """
+        Format and write the shared series to every output concurrently
+
+        A failing output doesn't stop the others, we raise
+        the first failure once every output has finished
+
+        :returns: None
+        """
+        workers = len(self.outputs)
+        if self.profiler and workers > 1:
+            self.log.info("Profiling, so writing to one output at a time")
+            workers = 1
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                (output, pool.submit(self._write, output)) for output in self.outputs
+            ]
+        errors = list()
+        for output, future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                self.log.error(f"Failed writing stats to {output.output_name}: {e}")
+                errors.append(e)
+        self.formatted_stats = list()
+        if errors:
+            raise errors[0]
@@ -15,8 +15,11 @@ from github_stats.outputs import StatsOutput
 
 
 class GoogleOutput(StatsOutput):
-    def __init__(self, config):
-        super().__init__(config)
+    output_name = "google"
+    dedup_supported = True
+
+    def __init__(self, config, timestamp=0.0):
+        super().__init__(config, timestamp)
         google_config = config.get("google", {})
         if not google_config:
             raise Exception("Can't load Google config section")
@@ -48,14 +51,14 @@ class GoogleOutput(StatsOutput):
         self.output_stats = dict()
         self.output_stat_count = 0
 
-    def format_stats(self, stats_object):
+    def format_series(self, formatted_stats):
         """
         We reformat the collected stats so we can cluster all
         measurements for a single view (metric) together
 
         :returns: None
         """
-        formatted_stats = super().format_stats(stats_object)
+        formatted_stats = super().format_series(formatted_stats)
 
         for stat in formatted_stats:
             self.output_stat_count += 1
@@ -229,4 +232,8 @@ class GoogleOutput(StatsOutput):
 
         # ensure at least one flush happens at the end
         time.sleep(self.export_rate + 10)
+        self.output_stats = dict()
+        self.output_stat_count = 0
+        if self.dedup:
+            self.dedup.commit()
         self.log.info(f"Wrote stats in {time.time() - starttime} seconds")
@@ -13,6 +13,9 @@ from github_stats.outputs import StatsOutput
 
 
 class InfluxOutput(StatsOutput):
+    output_name = "influx"
+    dedup_supported = True
+
     def __init__(self, config, timestamp=0.0):
         super().__init__(config, timestamp)
         influx_config = config.get("influx", {})
@@ -41,7 +44,7 @@ class InfluxOutput(StatsOutput):
         self.output_stats = list()
         self.output_stat_count = 0
 
-    def format_stats(self, stats_object):
+    def format_series(self, formatted_stats):
         """
         Because influx stats require a 'measurement' and a list of 'fields'
         to define the metric names we will create, we need to break up
@@ -59,7 +62,7 @@ class InfluxOutput(StatsOutput):
                 "time": int(stat["timestamp"].timestamp()),
                 "fields": {stat["name"].split("_")[-1]: stat["value"]},
             }
-            for stat in super().format_stats(stats_object)
+            for stat in super().format_series(formatted_stats)
         ]
         self.output_stat_count = len(self.output_stats)
 
@@ -76,3 +79,7 @@ class InfluxOutput(StatsOutput):
         )
         self.write_api.close()
         self.write_api = self.client.write_api(write_options=SYNCHRONOUS)
+        # long-running collectors reuse this output, don't hold on to old points
+        self.output_stats = list()
+        if self.dedup:
+            self.dedup.commit()
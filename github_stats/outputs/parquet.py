@@ -0,0 +1,137 @@
+"""
+This output writes stats to columnar files (Parquet or Arrow IPC) for bulk loading
+
+Files are partitioned Hive-style by repository and collection date:
+    {path}/repository_name={repo}/collection_date={YYYY-MM-DD}/part-{first timestamp}-{pid}.parquet
+
+Every label key becomes its own (dictionary-encoded, nullable) column, so
+a directory of these files can be loaded as a single dataset by most
+warehouses/engines (e.g. `pyarrow.dataset.dataset(path, partitioning="hive")`).
+
+More documentation about pyarrow is here: https://arrow.apache.org/docs/python/
+"""
+from datetime import datetime
+import logging
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# local imports
+from github_stats.outputs import StatsOutput
+
+
+class ParquetOutput(StatsOutput):
+    output_name = "parquet"
+    dedup_supported = True
+
+    def __init__(self, config, timestamp=0.0):
+        super().__init__(config, timestamp)
+        parquet_config = config.get("parquet", {})
+        if not parquet_config:
+            raise Exception("Can't load parquet config section")
+        self.log = logging.getLogger("github-stats.output.parquet")
+        self.path = parquet_config["path"]
+        self.file_format = parquet_config.get("format", "parquet")
+        if self.file_format not in ("parquet", "ipc"):
+            raise Exception(f"Unknown parquet output format {self.file_format}")
+        self.compression = parquet_config.get("compression", "zstd")
+        self.repo = config["repo"]["name"]
+        """
+        We buffer rows across format_series calls so many collections
+        (e.g. a backfill) can be flushed as a handful of large files
+        """
+        self.output_stats = list()
+        self.output_stat_count = 0
+
+    def format_series(self, formatted_stats):
+        """
+        Buffer formatted stats until the next write
+
+        :returns: None
+        """
+        now = datetime.utcnow().replace(microsecond=0)
+        self.output_stats.extend(
+            (stat.get("timestamp", now), stat)
+            for stat in super().format_series(formatted_stats)
+        )
+        self.output_stat_count = len(self.output_stats)
+
+    def _build_table(self, stats):
+        """
+        Convert a list of (timestamp, stat) pairs into a table
+        with one column per label key
+
+        :returns: table
+        :rtype: pyarrow.Table
+        """
+        timestamps = [ts for ts, _ in stats]
+        stats = [stat for _, stat in stats]
+        label_keys = sorted(
+            set(k for stat in stats for k in stat["labels"] if k != "repository_name")
+        )
+        columns = {
+            "timestamp": pa.array(timestamps, type=pa.timestamp("s")),
+            "name": pa.array([stat["name"] for stat in stats]).dictionary_encode(),
+            # stats we couldn't work out (None) are nulls, not zeros
+            "value": pa.array(
+                [
+                    None if stat["value"] is None else float(stat["value"])
+                    for stat in stats
+                ],
+                type=pa.float64(),
+            ),
+            "measurement_type": pa.array(
+                [stat["measurement_type"] for stat in stats]
+            ).dictionary_encode(),
+            "description": pa.array(
+                [stat["description"] for stat in stats]
+            ).dictionary_encode(),
+        }
+        for key in label_keys:
+            columns[f"label_{key}"] = pa.array(
+                [stat["labels"].get(key, None) for stat in stats], type=pa.string()
+            ).dictionary_encode()
+        return pa.table(columns)
+
+    def write_stats(self):
+        """
+        Flush buffered stats, one file per collection date
+
+        Files are written under a temporary name and renamed
+        so readers never pick up a partial file
+
+        :returns: None
+        """
+        self.log.info(
+            f"Attempting to write {self.output_stat_count} metrics to {self.path}..."
+        )
+        partitions = dict()
+        for ts, stat in self.output_stats:
+            day = ts.strftime("%Y-%m-%d")
+            if day in partitions:
+                partitions[day].append((ts, stat))
+            else:
+                partitions[day] = [(ts, stat)]
+        extension = "parquet" if self.file_format == "parquet" else "arrow"
+        for day, stats in partitions.items():
+            folder = f"{self.path}/repository_name={self.repo}/collection_date={day}"
+            os.makedirs(folder, exist_ok=True)
+            first_ts = int(min(ts for ts, _ in stats).timestamp())
+            filename = f"{folder}/part-{first_ts}-{os.getpid()}.{extension}"
+            tmpfile = f"{filename}.tmp"
+            table = self._build_table(stats)
+            if self.file_format == "parquet":
+                pq.write_table(table, tmpfile, compression=self.compression)
+            else:
+                with pa.ipc.new_file(
+                    tmpfile,
+                    table.schema,
+                    options=pa.ipc.IpcWriteOptions(compression=self.compression),
+                ) as writer:
+                    writer.write_table(table)
+            os.replace(tmpfile, filename)
+            self.log.debug(f"Wrote {len(stats)} metrics to {filename}")
+        self.output_stats = list()
+        self.output_stat_count = 0
+        if self.dedup:
+            self.dedup.commit()
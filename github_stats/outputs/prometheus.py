@@ -0,0 +1,243 @@
+"""
+This output renders stats in the Prometheus/OpenMetrics text formats
+
+Stats can either be written to a file (for node_exporter's textfile collector)
+or served over HTTP for a Prometheus scrape. Rendering happens once per
+collection and the finished payload is swapped in as a single object, so a
+scrape only ever copies pre-built bytes and never waits on collection.
+
+More documentation about the format is here: https://github.com/OpenObservability/OpenMetrics/blob/main/specification/OpenMetrics.md
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import logging
+import math
+import os
+import threading
+
+# local imports
+from github_stats.outputs import StatsOutput
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# one exporter per listen address, shared by every repo collected in this process
+_exporters = dict()
+_exporters_lock = threading.Lock()
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _escape_help(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, int):
+        return str(value)
+    value = float(value)
+    # python's repr() gives 'nan'/'inf', both formats spell them differently
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+class MetricsExporter(object):
+    """
+    Holds the most recent rendered snapshot of every repo's stats
+    and (optionally) serves it over HTTP
+
+    Writers hand over fully formatted families for a single repo,
+    we rebuild both payloads outside of the read path and then
+    replace the served snapshot with one reference assignment.
+    """
+
+    def __init__(self, host="", port=0):
+        self.log = logging.getLogger("github-stats.output.prometheus.exporter")
+        self._lock = threading.Lock()
+        self._repos = dict()
+        # (prometheus payload, openmetrics payload)
+        self.snapshot = (b"", b"# EOF\n")
+        self.server = None
+        if port:
+            self.server = ThreadingHTTPServer((host, port), _ScrapeHandler)
+            self.server.daemon_threads = True
+            self.server.exporter = self
+            thread = threading.Thread(
+                target=self.server.serve_forever,
+                name=f"prometheus-exporter-{port}",
+                daemon=True,
+            )
+            thread.start()
+            self.log.info(f"Serving metrics on {host or '0.0.0.0'}:{port}")
+
+    def update(self, repo, families):
+        """
+        Replace one repo's families and re-render the shared snapshot
+
+        :returns: None
+        """
+        with self._lock:
+            self._repos[repo] = families
+            self.snapshot = self._render()
+
+    def _render(self):
+        """
+        Merge families from all repos (samples of a family must be
+        contiguous in both formats) and render the two payloads
+
+        :returns: classic text payload, OpenMetrics payload
+        :rtype: tuple(bytes, bytes)
+        """
+        merged = dict()
+        for families in self._repos.values():
+            for name, family in families.items():
+                if name in merged:
+                    merged[name]["samples"].extend(family["samples"])
+                else:
+                    merged[name] = {
+                        "help": family["help"],
+                        "type": family["type"],
+                        "samples": list(family["samples"]),
+                    }
+        prom_lines = list()
+        om_lines = list()
+        for name, family in merged.items():
+            mtype = family["type"]
+            prom_lines.append(f"# HELP {name} {family['help']}")
+            prom_lines.append(f"# TYPE {name} {mtype}")
+            """
+            OpenMetrics counter families drop the '_total' suffix
+            that the individual samples carry
+            """
+            om_name = name
+            if mtype == "counter":
+                om_name = name[: -len("_total")]
+            om_lines.append(f"# HELP {om_name} {family['help']}")
+            om_lines.append(f"# TYPE {om_name} {mtype}")
+            for sample in family["samples"]:
+                line = f"{name}{sample}"
+                prom_lines.append(line)
+                om_lines.append(line)
+        om_lines.append("# EOF")
+        prom = "\n".join(prom_lines) + "\n" if prom_lines else ""
+        return prom.encode("utf-8"), ("\n".join(om_lines) + "\n").encode("utf-8")
+
+
+class _ScrapeHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        # read the snapshot once so we serve a consistent payload
+        prom, openmetrics = self.server.exporter.snapshot
+        if "application/openmetrics-text" in self.headers.get("Accept", ""):
+            body = openmetrics
+            content_type = OPENMETRICS_CONTENT_TYPE
+        else:
+            body = prom
+            content_type = PROMETHEUS_CONTENT_TYPE
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.getLogger("github-stats.output.prometheus.exporter").debug(
+            format % args
+        )
+
+
+def get_exporter(host="", port=0):
+    """
+    Return the process-wide exporter for a listen address
+    (creating and starting it if needed)
+
+    :returns: exporter
+    :rtype: MetricsExporter
+    """
+    with _exporters_lock:
+        if (host, port) not in _exporters:
+            _exporters[(host, port)] = MetricsExporter(host, port)
+        return _exporters[(host, port)]
+
+
+class PrometheusOutput(StatsOutput):
+    output_name = "prometheus"
+
+    def __init__(self, config, timestamp=0.0):
+        super().__init__(config, timestamp)
+        prom_config = config.get("prometheus", {})
+        if not prom_config:
+            raise Exception("Can't load prometheus config section")
+        self.log = logging.getLogger("github-stats.output.prometheus")
+        self.prefix = prom_config.get("metric_prefix", "")
+        self.textfile = prom_config.get("textfile", "")
+        self.repo = config["repo"]["name"]
+        self.exporter = get_exporter(
+            prom_config.get("listen_address", ""), prom_config.get("listen_port", 0)
+        )
+        self.output_stats = dict()
+        self.output_stat_count = 0
+
+    def format_series(self, formatted_stats):
+        """
+        Group formatted stats into metric families and pre-render
+        each sample line (without the metric name, which is shared)
+
+        'count' measurements become counters when their name follows
+        the '_total' convention, everything else is a gauge.
+
+        :returns: None
+        """
+        self.output_stats = dict()
+        self.output_stat_count = 0
+        for stat in super().format_series(formatted_stats):
+            if stat["value"] is None:
+                continue
+            name = stat["name"]
+            if self.prefix:
+                name = f"{self.prefix}_{name}"
+            if name not in self.output_stats:
+                if stat["measurement_type"] == "count" and name.endswith("_total"):
+                    mtype = "counter"
+                else:
+                    mtype = "gauge"
+                self.output_stats[name] = {
+                    "help": _escape_help(stat["description"]),
+                    "type": mtype,
+                    "samples": list(),
+                }
+            labels = ",".join(
+                f'{k}="{_escape_label(v)}"' for k, v in sorted(stat["labels"].items())
+            )
+            self.output_stats[name]["samples"].append(
+                f"{{{labels}}} {_format_value(stat['value'])}"
+            )
+            self.output_stat_count += 1
+
+    def write_stats(self):
+        """
+        Publish our families to the exporter and (optionally)
+        the textfile collector file
+
+        The textfile is written to a temporary file and renamed
+        so node_exporter never reads a partial file
+
+        :returns: None
+        """
+        self.log.info(
+            f"Publishing {self.output_stat_count} metrics for {self.repo} to Prometheus..."
+        )
+        self.exporter.update(self.repo, self.output_stats)
+        if self.textfile:
+            tmpfile = f"{self.textfile}.{os.getpid()}.tmp"
+            with open(tmpfile, "wb") as f:
+                f.write(self.exporter.snapshot[0])
+            os.replace(tmpfile, self.textfile)
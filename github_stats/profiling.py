@@ -0,0 +1,168 @@
+"""
+Optional CPU/memory profiling of collection sections and outputs
+
+Every profiled section writes its own reports to the profile folder:
+    cpu:    {prefix}.pstats (cProfile, load with `python -m pstats`)
+            {prefix}.collapsed (sampled stacks, for flamegraph.pl/speedscope)
+    memory: {prefix}.memory.txt (top allocating lines and peak usage)
+            {prefix}.collapsed (bytes still allocated per allocation stack)
+
+cProfile (interpreter-wide since Python 3.12) and tracemalloc snapshots
+can't tell concurrent sections apart, so profiled sections can't overlap:
+starting one while another is running is an error. Rather than quietly
+queueing sections behind each other (and measuring a different program),
+the scripts refuse `--profile` with several workers.
+"""
+import cProfile
+from contextlib import contextmanager
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+PROFILE_MODES = ["cpu", "memory"]
+
+
+def _frame_name(code, lineno):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{lineno})"
+
+
+class _StackSampler(object):
+    """
+    Sample one thread's stack at a fixed interval and count
+    each (collapsed) stack we see
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = dict()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id, None)
+            frames = list()
+            while frame is not None:
+                frames.append(_frame_name(frame.f_code, frame.f_lineno))
+                frame = frame.f_back
+            if not frames:
+                continue
+            stack = ";".join(reversed(frames))
+            if stack in self.stacks:
+                self.stacks[stack] += 1
+            else:
+                self.stacks[stack] = 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class Profiler(object):
+    def __init__(self, mode, folder):
+        self.log = logging.getLogger("github-stats.profiling")
+        if mode not in PROFILE_MODES:
+            raise Exception(
+                f"Unknown profile mode {mode}, expected one of {PROFILE_MODES}"
+            )
+        self.mode = mode
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._active = None
+
+    @contextmanager
+    def section(self, name):
+        """
+        Profile everything run inside this block
+
+        :returns: context manager
+        """
+        with self._lock:
+            if self._active:
+                raise Exception(
+                    f"Can't profile {name} while {self._active} is being profiled"
+                )
+            self._active = name
+            prefix = (
+                f"{self.folder}/{int(time.time())}-{next(self._sequence):04d}-{name}"
+            )
+        try:
+            starttime = time.time()
+            if self.mode == "cpu":
+                with self._profile_cpu(prefix):
+                    yield
+            else:
+                with self._profile_memory(prefix):
+                    yield
+            self.log.info(
+                f"Profiled {name} ({time.time() - starttime} seconds) into {prefix}.*"
+            )
+        finally:
+            self._active = None
+
+    @contextmanager
+    def _profile_cpu(self, prefix):
+        profile = cProfile.Profile()
+        sampler = _StackSampler(threading.get_ident())
+        sampler.start()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            sampler.stop()
+            profile.dump_stats(f"{prefix}.pstats")
+            self._write_collapsed(prefix, sampler.stacks)
+
+    @contextmanager
+    def _profile_memory(self, prefix):
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(25)
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        try:
+            yield
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            if started:
+                tracemalloc.stop()
+            lines = after.compare_to(before, "lineno")
+            with open(f"{prefix}.memory.txt", "w", encoding="utf-8") as f:
+                f.write(f"peak traced memory: {peak} bytes\n")
+                f.write("top allocations (by line, compared to section start):\n")
+                for stat in lines[:50]:
+                    f.write(f"{stat}\n")
+            stacks = dict()
+            for stat in after.compare_to(before, "traceback"):
+                if stat.size_diff <= 0:
+                    continue
+                # tracebacks are already ordered oldest call first
+                stack = ";".join(
+                    f"{os.path.basename(frame.filename)}:{frame.lineno}"
+                    for frame in stat.traceback
+                )
+                stacks[stack] = stacks.get(stack, 0) + stat.size_diff
+            self._write_collapsed(prefix, stacks)
+
+    def _write_collapsed(self, prefix, stacks):
+        """
+        Write stacks in the "collapsed" format flame graph tools expect:
+            frame1;frame2;frame3 <count>
+
+        :returns: None
+        """
+        with open(f"{prefix}.collapsed", "w", encoding="utf-8") as f:
+            for stack, count in sorted(stacks.items(), key=lambda x: -x[1]):
+                f.write(f"{stack} {count}\n")
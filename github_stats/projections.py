@@ -0,0 +1,86 @@
+"""
+The fields we actually read from each Github endpoint
+
+Github objects carry far more than we use: every pull request embeds the
+full repository object (twice), URL templates and its body, and every
+workflow run embeds the repository and head commit. Pages are cut down
+to these fields as soon as they're decoded, so only the projected items
+are handed to (and kept by) the `load_*` methods and the raw data cache.
+
+A projection maps field names to the projection of their value (None
+keeps the value as-is). Lists are projected item by item, and fields
+missing from a result stay missing.
+"""
+
+CONTRIBUTOR = {"login": None}
+
+USER = {"login": None, "name": None, "email": None}
+
+REPO = {"name": None, "archived": None, "fork": None, "default_branch": None}
+
+PULL_REQUEST = {
+    "title": None,
+    "state": None,
+    "draft": None,
+    "user": {"login": None},
+    "head": {"sha": None},
+    "labels": {"name": None},
+    "created_at": None,
+    "updated_at": None,
+    "closed_at": None,
+    "merged_at": None,
+}
+
+BRANCH = {
+    "protected": None,
+    "commit": {
+        "author": {"login": None},
+        "commit": {"author": {"name": None, "date": None}},
+    },
+}
+
+CONTRIBUTOR_STATS = {
+    "author": {"login": None},
+    "total": None,
+    "weeks": {"w": None, "a": None, "d": None, "c": None},
+}
+
+RELEASE = {
+    "name": None,
+    "author": {"login": None},
+    "created_at": None,
+    "body": None,
+}
+
+WORKFLOW_RUN = {
+    "name": None,
+    "status": None,
+    "conclusion": None,
+    "event": None,
+    "created_at": None,
+    "run_started_at": None,
+    "updated_at": None,
+    "run_number": None,
+    "run_attempt": None,
+    "triggering_actor": {"login": None},
+    "head_commit": {"message": None, "author": {"name": None}},
+}
+
+
+def project(value, fields):
+    """
+    Cut a decoded result down to the fields in a projection
+
+    :returns: projected value
+    """
+    if fields is None or value is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, fields) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {
+        field: project(value[field], sub)
+        for field, sub in fields.items()
+        if field in value
+    }
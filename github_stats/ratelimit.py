@@ -0,0 +1,101 @@
+"""
+Track Github's API rate limit across every collector in a process
+
+Github reports our remaining (core) quota on every response, so we keep
+the most recent view of it here and make every request "check out" one
+unit of quota first. Sharing one budget between concurrent collectors
+means they back off together instead of all running into the limit:
+the first one to reach the reserve pauses the budget until the quota
+resets, and every request waits out that pause.
+"""
+import logging
+import threading
+import time
+
+
+class RateLimitBudget(object):
+    def __init__(self, reserve=100):
+        self.log = logging.getLogger("github-stats.ratelimit")
+        self._lock = threading.Lock()
+        # keep a little quota free for anything else using the same token
+        self.reserve = reserve
+        self.limit = None
+        self.remaining = None
+        self.reset = 0
+        # no requests go out before this time (we're waiting for a reset)
+        self.paused_until = 0
+        self.requests = 0
+
+    def update(self, headers):
+        """
+        Record rate limit details from a response
+
+        Only the 'core' resource applies to the endpoints we use
+        (search/graphql/etc. have their own limits)
+
+        :returns: None
+        """
+        if headers.get("X-RateLimit-Resource", "core") != "core":
+            return
+        if "X-RateLimit-Remaining" not in headers:
+            return
+        with self._lock:
+            self.limit = int(headers.get("X-RateLimit-Limit", 0))
+            self.remaining = int(headers["X-RateLimit-Remaining"])
+            self.reset = int(headers.get("X-RateLimit-Reset", 0))
+            if self.remaining > self.reserve:
+                self.paused_until = 0
+
+    def acquire(self):
+        """
+        Block until we can make one more request
+
+        :returns: None
+        """
+        while True:
+            with self._lock:
+                now = time.time()
+                if self.paused_until <= now and (
+                    self.remaining is None
+                    or self.remaining > self.reserve
+                    or self.reset <= now
+                ):
+                    self.requests += 1
+                    if self.remaining is not None:
+                        self.remaining -= 1
+                    return
+                if self.paused_until <= now:
+                    self.paused_until = self.reset + 1
+                    self.log.warning(
+                        f"Rate limit nearly exhausted, pausing {int(self.paused_until - now)} seconds until reset"
+                    )
+                sleep_time = self.paused_until - now
+            time.sleep(sleep_time)
+
+    def wait_for(self, cost):
+        """
+        Block until we (probably) have quota for `cost` more requests
+
+        Used to pace batches of work (e.g. one backfill run) so we
+        only pause when the next batch wouldn't fit in what's left
+
+        :returns: seconds slept
+        :rtype: float
+        """
+        with self._lock:
+            now = time.time()
+            if self.paused_until <= now and (
+                self.remaining is None
+                or self.remaining - self.reserve >= cost
+                or self.reset <= now
+            ):
+                return 0
+            if self.paused_until <= now:
+                self.paused_until = self.reset + 1
+            sleep_time = self.paused_until - now
+            remaining = self.remaining
+        self.log.info(
+            f"Next run needs ~{cost} requests but only {remaining} remain, sleeping {int(sleep_time)} seconds until reset"
+        )
+        time.sleep(sleep_time)
+        return sleep_time
@@ -23,6 +23,92 @@ user_schema = {
     "workflow_totals": dict(),
     "branches": list(),
     "last_commit_time": 0,
+    # QuantileSketch of time open (closed/merged PRs) and workflow run time
+    "pr_time_open_sketch": None,
+    "workflow_run_time_sketch": None,
+}
+
+"""
+Window-scoped counters for every collection window past the first
+(the first window fills in the same keys of the stats object itself)
+Users are only added once they have something counted in the window
+"""
+window_user_schema = {
+    "total_window_branches": 0,
+    "total_window_pull_requests": 0,
+    "total_window_releases": 0,
+    "total_window_commits": 0,
+}
+
+window_schema = {
+    "branches": {"total_window_branches": 0},
+    "commits": {
+        "branch_commits": dict(),
+        "window_commits": 0,
+        "windowed_commit_time": 0,
+    },
+    "windowed_mttr": 0,
+    "pull_requests": {"total_window_pull_requests": 0, "labels": dict()},
+    "releases": {"total_window_releases": 0},
+    "workflows": {"events": dict()},
+    "users": dict(),
+}
+
+"""
+The parts of the stats object (and of each user) that each collection
+section fills in, so a section that isn't due (see `schedules`) can
+re-use the values from its last run
+"""
+sections = {
+    "pull_requests": {
+        "stats": ["pull_requests", "bug_matches"],
+        "users": [
+            "avg_pr_time_open_secs",
+            "total_closed_pull_requests",
+            "total_merged_pull_requests",
+            "total_open_pull_requests",
+            "total_draft_pull_requests",
+            "total_pr_time_open_secs",
+            "total_pull_requests",
+            "total_window_pull_requests",
+            "pr_time_open_sketch",
+        ],
+    },
+    "commits": {
+        "stats": ["commits"],
+        "users": ["total_commits", "total_window_commits", "last_commit_time"],
+    },
+    "branches": {
+        "stats": ["branches", "main_branch_commits"],
+        "users": ["total_branches", "total_window_branches"],
+    },
+    "repo_stats": {
+        "stats": ["repo_stats"],
+        "users": [],
+    },
+    "releases": {
+        "stats": ["releases"],
+        "users": ["total_releases", "total_window_releases"],
+    },
+    "workflows": {
+        "stats": ["workflows"],
+        "users": [
+            "events",
+            "workflows",
+            "workflow_totals",
+            "workflow_run_time_sketch",
+        ],
+    },
+}
+
+# what the collector itself did during one section of a collection
+collector_schema = {
+    "requests": 0,
+    "retries": 0,
+    "bytes": 0,
+    "pages": 0,
+    "git_objects": 0,
+    "quota_used": 0,
 }
 
 user_login_cache = {
@@ -40,6 +126,10 @@ stats = {
     },
     "collection_date": None,
     "window": None,
+    # every collection window (in days), the first one fills in our usual keys
+    "windows": list(),
+    # window -> window_schema, for the other windows
+    "window_stats": dict(),
     "collection_time_secs": 0,
     "commits": {
         "branch_commits": dict(),
@@ -60,6 +150,8 @@ stats = {
         "total_merged_pull_requests": 0,
         "total_pr_time_open_secs": 0,
         "avg_pr_time_open_secs": 0,
+        # QuantileSketch of time open (closed/merged PRs)
+        "pr_time_open_sketch": None,
         "total_open_pull_requests": 0,
         "total_closed_pull_requests": 0,
         "total_window_pull_requests": 0,
@@ -90,7 +182,15 @@ stats = {
     #     "dismissed": dict(),
     # },
     "users": dict(),
-    "workflows": {"events": dict(), "workflows": dict(), "collection_time": 0},
+    "workflows": {
+        "events": dict(),
+        "workflows": dict(),
+        # QuantileSketch of every run's time (each workflow keeps its own too)
+        "run_time_sketch": None,
+        "collection_time": 0,
+    },
+    # section -> collector_schema
+    "collector": dict(),
 }
 
 tmp_statobj = {
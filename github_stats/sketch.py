@@ -0,0 +1,151 @@
+"""
+Bounded-memory quantiles of durations (PR open time, workflow run time)
+
+Keeping every duration to read p50/p95 from them grows with a repo's
+history, so durations are counted into logarithmic buckets instead (the
+DDSketch approach): bucket `i` holds values in (gamma^(i-1), gamma^i],
+with gamma = (1 + accuracy) / (1 - accuracy), and a quantile read back
+from a bucket is within `accuracy` (relative) of the true value. A
+sketch of seconds between one second and a year needs fewer than 900
+buckets at 1% accuracy, however many values it has seen, and should it
+ever pass `max_buckets` the lowest buckets are folded together (so only
+the smallest values lose accuracy, not the tail we care about).
+
+Sketches with the same accuracy merge by adding up their buckets, so we
+keep one per login/workflow/user and merge them for the repo.
+Values under a millisecond (including negative durations from clock
+skew) are counted as zero.
+"""
+import math
+
+DEFAULT_ACCURACY = 0.01
+DEFAULT_MAX_BUCKETS = 2048
+DEFAULT_QUANTILES = [0.5, 0.9, 0.95, 0.99]
+MIN_VALUE = 0.001
+
+
+class QuantileSketch(object):
+    __slots__ = (
+        "accuracy",
+        "gamma",
+        "log_gamma",
+        "max_buckets",
+        "buckets",
+        "zeros",
+        "count",
+    )
+
+    def __init__(self, accuracy=DEFAULT_ACCURACY, max_buckets=DEFAULT_MAX_BUCKETS):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        # bucket index -> values counted in it
+        self.buckets = dict()
+        self.zeros = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __eq__(self, other):
+        return (
+            self.accuracy == other.accuracy
+            and self.zeros == other.zeros
+            and self.buckets == other.buckets
+        )
+
+    def __repr__(self):
+        return f"QuantileSketch(count={self.count}, buckets={len(self.buckets)})"
+
+    def add(self, value, count=1):
+        """
+        Count a value (`count` times)
+
+        :returns: None
+        """
+        self.count += count
+        if value < MIN_VALUE:
+            self.zeros += count
+            return
+        index = math.ceil(math.log(value) / self.log_gamma)
+        if index in self.buckets:
+            self.buckets[index] += count
+        else:
+            self.buckets[index] = count
+            if len(self.buckets) > self.max_buckets:
+                self._collapse()
+
+    def merge(self, other):
+        """
+        Add another sketch's values to this one
+
+        :returns: None
+        """
+        if other.accuracy != self.accuracy:
+            raise Exception(
+                f"Can't merge sketches of different accuracy ({self.accuracy} vs. {other.accuracy})"
+            )
+        self.count += other.count
+        self.zeros += other.zeros
+        for index, count in other.buckets.items():
+            if index in self.buckets:
+                self.buckets[index] += count
+            else:
+                self.buckets[index] = count
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        """
+        Fold the lowest buckets into the lowest one we keep
+
+        :returns: None
+        """
+        indexes = sorted(self.buckets)
+        keep = indexes[len(indexes) - self.max_buckets]
+        for index in indexes[: len(indexes) - self.max_buckets]:
+            self.buckets[keep] += self.buckets.pop(index)
+
+    def quantiles(self, quantiles=DEFAULT_QUANTILES):
+        """
+        Read several quantiles (0 - 1) in one pass over the buckets
+
+        :returns: value of each quantile (0 for an empty sketch)
+        :rtype: list
+        """
+        if not self.count:
+            return [0] * len(quantiles)
+        ranks = sorted((q * (self.count - 1), n) for n, q in enumerate(quantiles))
+        results = [0.0] * len(quantiles)
+        seen = self.zeros
+        indexes = iter(sorted(self.buckets))
+        index = None
+        for rank, n in ranks:
+            if rank < self.zeros:
+                continue
+            while seen <= rank:
+                index = next(indexes)
+                seen += self.buckets[index]
+            # the middle of the bucket (in relative terms)
+            results[n] = 2 * self.gamma**index / (self.gamma + 1)
+        return results
+
+    def quantile(self, q):
+        """
+        :returns: value of one quantile (0 - 1)
+        :rtype: float
+        """
+        return self.quantiles([q])[0]
+
+
+def merge_sketch(container, key, sketch):
+    """
+    Merge a sketch into the one kept under a key (a dict, or user stats),
+    starting it when there isn't one yet
+
+    :returns: None
+    """
+    if container[key] is None:
+        container[key] = QuantileSketch(sketch.accuracy, sketch.max_buckets)
+    container[key].merge(sketch)
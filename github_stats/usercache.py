@@ -0,0 +1,250 @@
+"""
+Github profiles shared by every repo collected in a run
+
+Most people contribute to several repos in an org, so rather than every
+GithubAccess resolving the same logins with its own /users/{login} calls,
+they share one (thread-safe) cache of profiles. Concurrent lookups of the
+same login wait for the first one instead of all hitting the API.
+
+With a `path`, profiles are also kept in a SQLite database, so later runs
+(and other collector processes using the same file) resolve known users
+locally. Entries expire after `ttl` seconds, and logins that don't exist
+(404) are remembered for `negative_ttl` seconds so we don't keep asking.
+
+Emails on the profiles we've stored are indexed (email -> login), so
+matching commit authors by email is a dict lookup rather than a scan.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_TTL = 7 * 86400
+DEFAULT_NEGATIVE_TTL = 86400
+
+
+class UserNotFound(Exception):
+    pass
+
+
+def load_user_cache(config):
+    """
+    Build the user cache described by the `user_cache` config section
+
+    :returns: user cache
+    :rtype: UserCache
+    """
+    cache_config = config.get("user_cache", {})
+    if not cache_config.get("enabled", True):
+        return UserCache()
+    return UserCache(
+        cache_config.get("path", f"{config['repo_folder']}/.user-cache.sqlite3"),
+        cache_config.get("ttl", DEFAULT_TTL),
+        cache_config.get("negative_ttl", DEFAULT_NEGATIVE_TTL),
+    )
+
+
+class UserCache(object):
+    def __init__(self, path=None, ttl=None, negative_ttl=DEFAULT_NEGATIVE_TTL):
+        self.log = logging.getLogger("github-stats.usercache")
+        self._lock = threading.Lock()
+        # login -> lock held while that login is being fetched
+        self._fetching = dict()
+        # login -> (profile or None for missing users, expiry time)
+        self.profiles = dict()
+        # email (lower case) -> login, and emails we couldn't match to anyone
+        self.emails = dict()
+        self._unmatched_emails = set()
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self.path = path
+        self._db = None
+        if path:
+            folder = os.path.dirname(path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            # we serialize access with our own lock, so threads can share the connection
+            self._db = sqlite3.connect(
+                path, timeout=30, isolation_level=None, check_same_thread=False
+            )
+            # WAL lets other processes read while one writes
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS users (
+                    login TEXT PRIMARY KEY,
+                    name TEXT,
+                    email TEXT,
+                    missing INTEGER NOT NULL DEFAULT 0,
+                    expires REAL NOT NULL
+                )"""
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS emails (email TEXT PRIMARY KEY, login TEXT NOT NULL)"
+            )
+
+    def _expiry(self, ttl, now):
+        if ttl is None:
+            return float("inf")
+        return now + ttl
+
+    def _lookup(self, login, now):
+        """
+        Find a login in memory, then on disk (call with the lock held)
+
+        :returns: (found, profile or None for missing users)
+        :rtype: tuple
+        """
+        if login in self.profiles:
+            profile, expires = self.profiles[login]
+            if expires > now:
+                return True, profile
+            self.profiles.pop(login)
+        if not self._db:
+            return False, None
+        row = self._db.execute(
+            "SELECT name, email, missing, expires FROM users WHERE login = ?",
+            (login,),
+        ).fetchone()
+        if not row or row[3] <= now:
+            return False, None
+        profile = None
+        if not row[2]:
+            profile = {"login": login, "name": row[0], "email": row[1]}
+            self._store_email(login, row[1])
+        self.profiles[login] = (profile, row[3])
+        return True, profile
+
+    def _store_email(self, login, email):
+        """
+        Remember which login uses an email (call with the lock held)
+
+        :returns: None
+        """
+        if not email:
+            return
+        self.emails[email.lower()] = login
+        self._unmatched_emails.clear()
+
+    def _store(self, login, profile, expires):
+        """
+        Remember a profile (None for a missing user), call with the lock held
+
+        :returns: None
+        """
+        self.profiles[login] = (profile, expires)
+        if profile:
+            self._store_email(login, profile["email"])
+        if not self._db:
+            return
+        if profile:
+            self._db.execute(
+                "INSERT OR REPLACE INTO users VALUES (?, ?, ?, 0, ?)",
+                (login, profile["name"], profile["email"], expires),
+            )
+            if profile["email"]:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO emails VALUES (?, ?)",
+                    (profile["email"].lower(), login),
+                )
+        else:
+            self._db.execute(
+                "INSERT OR REPLACE INTO users VALUES (?, NULL, NULL, 1, ?)",
+                (login, expires),
+            )
+
+    def _cached(self, login, now):
+        """
+        :returns: (found, profile), raising UserNotFound for known missing users
+        :rtype: tuple
+        """
+        found, profile = self._lookup(login, now)
+        if found:
+            self.hits += 1
+            if not profile:
+                raise UserNotFound(f"{login} isn't a Github user (cached)")
+        return found, profile
+
+    def get(self, login, fetch):
+        """
+        Return the cached profile for a login, calling `fetch(login)`
+        (which returns a Github user object) on a miss
+
+        A 404 from fetch is cached and raised as UserNotFound,
+        other failures aren't cached and are passed along
+
+        :returns: profile ({"login", "name", "email"})
+        :rtype: dict
+        """
+        with self._lock:
+            found, profile = self._cached(login, time.time())
+            if found:
+                return profile
+            if login not in self._fetching:
+                self._fetching[login] = threading.Lock()
+            fetching = self._fetching[login]
+        with fetching:
+            try:
+                return self._fetch(login, fetch)
+            finally:
+                with self._lock:
+                    self._fetching.pop(login, None)
+
+    def _fetch(self, login, fetch):
+        """
+        Fetch (and remember) a login we didn't have, call with its fetch lock held
+
+        :returns: profile
+        :rtype: dict
+        """
+        with self._lock:
+            found, profile = self._cached(login, time.time())
+            if found:
+                return profile
+        try:
+            user = fetch(login)
+        except Exception as e:
+            response = getattr(e, "response", None)
+            if getattr(response, "status_code", None) != 404:
+                raise
+            with self._lock:
+                self.misses += 1
+                self._store(login, None, self._expiry(self.negative_ttl, time.time()))
+            raise UserNotFound(f"{login} isn't a Github user: {e}")
+        profile = {
+            "login": login,
+            "name": user.get("name", None),
+            "email": user.get("email", None),
+        }
+        with self._lock:
+            self.misses += 1
+            self._store(login, profile, self._expiry(self.ttl, time.time()))
+        return profile
+
+    def login_for_email(self, email):
+        """
+        :returns: login we've seen use an email address (or None)
+        :rtype: str
+        """
+        email = email.lower()
+        login = self.emails.get(email, None)
+        if login or email in self._unmatched_emails:
+            return login
+        with self._lock:
+            row = None
+            if self._db:
+                row = self._db.execute(
+                    "SELECT login FROM emails WHERE email = ?", (email,)
+                ).fetchone()
+            if not row:
+                self._unmatched_emails.add(email)
+                return None
+            self.emails[email] = row[0]
+        return row[0]
+
+    def close(self):
+        if self._db:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,127 @@
+"""
+Compact per-user stats
+
+Org-wide collections track thousands of (mostly idle) users, so instead of
+a deep copy of `user_schema` per user (a ~20 key dict plus empty nested
+dicts/lists) every user is a slotted record. The nested maps (events,
+workflows, workflow_totals) are only allocated once a user has something
+to put in them, and each workflow/status total is a slotted pair.
+
+Both classes keep dict-style access (`user["total_commits"] += 1`,
+`runs["count"]`) so the rest of the code base (and outputs) read them like
+the old dicts. Unset maps read as a fresh empty container, so write them
+through the helper methods.
+"""
+from github_stats.schema import user_schema
+
+SPARSE_KEYS = frozenset(
+    k for k, v in user_schema.items() if isinstance(v, (dict, list))
+)
+
+
+class RunTotals(object):
+    __slots__ = ("count", "runtime")
+
+    def __init__(self, count=0, runtime=0):
+        self.count = count
+        self.runtime = runtime
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def __eq__(self, other):
+        return self["count"] == other["count"] and self["runtime"] == other["runtime"]
+
+    def __repr__(self):
+        return f"RunTotals(count={self.count}, runtime={self.runtime})"
+
+
+class UserStats(object):
+    __slots__ = tuple(user_schema)
+
+    def __init__(self):
+        for key, default in user_schema.items():
+            setattr(self, key, None if key in SPARSE_KEYS else default)
+
+    def __getitem__(self, key):
+        try:
+            value = getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+        if value is None:
+            return type(user_schema[key])()
+        return value
+
+    def __setitem__(self, key, value):
+        if key not in user_schema:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in user_schema
+
+    def __repr__(self):
+        return f"UserStats({self.export(self.keys())})"
+
+    def keys(self):
+        return user_schema.keys()
+
+    def items(self):
+        return ((key, self[key]) for key in user_schema)
+
+    def get(self, key, default=None):
+        if key not in user_schema:
+            return default
+        return self[key]
+
+    def update(self, values):
+        """
+        Set several keys at once (like dict.update)
+
+        :returns: None
+        """
+        for key, value in values.items():
+            self[key] = value
+
+    def export(self, keys):
+        """
+        :returns: the given keys (skipping maps that were never used)
+        :rtype: dict
+        """
+        return {
+            key: getattr(self, key) for key in keys if getattr(self, key) is not None
+        }
+
+    def add_event(self, event, count=1):
+        """
+        Count workflow runs triggered by an event
+
+        :returns: None
+        """
+        if self.events is None:
+            self.events = dict()
+        self.events[event] = self.events.get(event, 0) + count
+
+    def add_workflow_run(self, workflow, status, run_time, count=1):
+        """
+        Count workflow runs (per workflow and overall) and their runtime
+
+        :returns: None
+        """
+        if self.workflows is None:
+            self.workflows = dict()
+            self.workflow_totals = dict()
+        if workflow not in self.workflows:
+            self.workflows[workflow] = dict()
+        for totals in (self.workflows[workflow], self.workflow_totals):
+            if status in totals:
+                totals[status].count += count
+                totals[status].runtime += run_time
+            else:
+                totals[status] = RunTotals(count, run_time)
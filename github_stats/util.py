@@ -17,11 +17,27 @@ def load_patterns(tag_patterns=[], bug_patterns={}):
     return tag_matches, bug_matches, pr_matches
 
 
+def window_list(window):
+    """
+    Collection windows (in days) from a single window or a list of them,
+    without duplicates
+
+    :returns: windows, in the order they were given
+    :rtype: list
+    """
+    if isinstance(window, int):
+        return [window]
+    return list(dict.fromkeys(window))
+
+
 def load_config(config_file):
     """
     consistently load and format config file into config dictionary
     """
     config = yaml.safe_load(open(config_file, "r", encoding="utf-8").read())
+    # repos may come entirely from org discovery
+    if "repos" not in config:
+        config["repos"] = list()
     for k, _ in enumerate(config["repos"]):
         config["repos"][k]["folder"] = config["repo_folder"]
     return config
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for the collector
+
+    python -m tests.benchmark api --pull-requests 5000 --workflow-runs 20000
+    python -m tests.benchmark git --commits 20000 --branches 200 --tags 300
+
+The api suite runs each GithubAccess section against a local FakeGithub
+and reports time, throughput and what it cost in requests/pages/bytes
+(from the collector's own instrumentation). The `.aggregate` results
+replay the same results from memory, timing only our own processing,
+and report the bytes of those results we keep (`retained`) and the peak
+traced memory while fetching them (`peak`).
+
+The git suite generates a synthetic repo (see tests/fake_git.py), clones it
+over file:// and times each gitops.Repo method plus GithubAccess.load_commits.
+Run it at a couple of sizes: time per item that grows with the size of the
+repo points at quadratic behaviour.
+
+Each benchmark reports the fastest of `--repeat` runs.
+"""
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+import json
+import logging
+import random
+import tempfile
+import time
+import tracemalloc
+
+from github_stats.github_api import GithubAccess
+from github_stats.gitops import Repo
+from tests.fake_git import make_repo
+from tests.fake_github import LABELS, FakeGithub, FakeRepo
+
+
+def _report(suite, results, json_file=None):
+    print(f"{suite} benchmarks:")
+    for r in results:
+        throughput = r["items"] / r["seconds"] if r["seconds"] else 0
+        line = f"  {r['name']:<28} {r['seconds']:9.4f}s {throughput:12.0f} items/s"
+        for key in ("requests", "pages", "bytes", "git_objects", "retained", "peak"):
+            if key in r:
+                line += f" {r[key]:>9} {key}"
+        print(line)
+    if json_file:
+        with open(json_file, "w", encoding="utf-8") as f:
+            json.dump({"suite": suite, "results": results}, f, indent=2)
+
+
+def bench_api(args):
+    """
+    :returns: per-section results
+    :rtype: list
+    """
+    # extra raw labels, grouped into additional labels of 20 raw labels each
+    rand = random.Random(1)
+    labels = LABELS + [f"area/{i}" for i in range(args.labels)]
+    fake = FakeGithub(
+        users=args.users,
+        pull_requests=args.pull_requests,
+        workflow_runs=args.workflow_runs,
+        releases=args.releases,
+        branches=args.branches,
+        labels=labels,
+    )
+    items = {
+        "pull_requests": args.pull_requests,
+        "branches": args.branches,
+        "repo_stats": args.users,
+        "releases": args.releases,
+        "workflows": args.workflow_runs,
+    }
+    # classify and label pull requests the way a busy repo would
+    repo_config = {
+        "bug_matching": {"patterns": ["^Fix", "^hotfix"], "labels": ["bug"]},
+        "additional_labels": {
+            "bugs": ["bug", "hotfix"],
+            "docs": ["documentation"],
+            "maintenance": ["dependencies", "documentation"],
+        },
+    }
+    for group in range(args.label_groups):
+        repo_config["additional_labels"][f"group-{group}"] = rand.sample(
+            labels, min(20, len(labels))
+        )
+    best = dict()
+    with fake, tempfile.TemporaryDirectory() as folder:
+        for _ in range(args.repeat):
+            gh = GithubAccess(fake.config(folder, **repo_config), repo=FakeRepo(fake))
+            sections = [
+                ("pull_requests", gh.load_pull_requests),
+                ("branches", gh.load_branches),
+                ("repo_stats", gh.load_repo_stats),
+                ("releases", gh.load_releases),
+                ("workflows", gh.load_workflow_runs),
+            ]
+            for section, func in sections:
+                starttime = time.perf_counter()
+                gh._run_section(section, func, fake.base_date, args.window)
+                elapsed = time.perf_counter() - starttime
+                if section in best and best[section]["seconds"] <= elapsed:
+                    continue
+                counters = gh.stats["collector"].get(section, {})
+                best[section] = {
+                    "name": section,
+                    "seconds": elapsed,
+                    "items": items[section],
+                    "requests": counters.get("requests", 0),
+                    "pages": counters.get("pages", 0),
+                    "bytes": counters.get("bytes", 0),
+                }
+        # replay raw results from memory to time just our own processing
+        gh = GithubAccess(fake.config(folder, **repo_config), repo=FakeRepo(fake))
+        gh.cache_raw_data = True
+        sections = [(section, getattr(gh, func.__name__)) for section, func in sections]
+        # while fetching, also see what each section's results cost to hold
+        memory = dict()
+        tracemalloc.start()
+        for section, func in sections:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            gh._run_section(section, func, fake.base_date, args.window)
+            current, peak = tracemalloc.get_traced_memory()
+            memory[section] = {"retained": current - before, "peak": peak - before}
+        tracemalloc.stop()
+        for _ in range(args.repeat):
+            gh.reset_stats()
+            for section, func in sections:
+                _best(
+                    best,
+                    f"{section}.aggregate",
+                    items[section],
+                    lambda: gh._run_section(section, func, fake.base_date, args.window),
+                )
+        for section, usage in memory.items():
+            best[f"{section}.aggregate"].update(usage)
+    return list(best.values())
+
+
+def _best(results, name, items, func):
+    """
+    Time one call, keeping the fastest run per benchmark
+
+    :returns: whatever func returns
+    """
+    starttime = time.perf_counter()
+    value = func()
+    elapsed = time.perf_counter() - starttime
+    if name not in results or results[name]["seconds"] > elapsed:
+        results[name] = {"name": name, "seconds": elapsed, "items": items}
+    return value
+
+
+def bench_git(args):
+    """
+    :returns: per-method results
+    :rtype: list
+    """
+    results = dict()
+    fake = FakeGithub(pull_requests=0, workflow_runs=0, releases=0, users=args.users)
+    with fake, tempfile.TemporaryDirectory() as folder:
+        origin = _best(
+            results,
+            "generate",
+            args.commits,
+            lambda: make_repo(
+                f"{folder}/origin.git",
+                commits=args.commits,
+                branches=args.branches,
+                tags=args.tags,
+                merge_every=args.merge_every,
+                authors=fake.authors,
+            ),
+        )
+        config = fake.config(
+            f"{folder}/clones",
+            clone_url=f"file://{origin}",
+            tag_patterns=[{"name": "release", "pattern": ".*v.*"}],
+        )
+        repo = _best(results, "clone", args.commits, lambda: Repo(config))
+        commits = list(repo.branch_commit_log("main"))
+        # pretend every 20th commit on main was a merged bug fix
+        pr_list = [
+            (f"Bugfix {i}", c["hash"], c["time"]) for i, c in enumerate(commits[::20])
+        ]
+        gh = GithubAccess(config, repo=repo)
+        for _ in range(args.repeat):
+            _best(results, "update", args.tags, repo.update)
+            branches = _best(
+                results,
+                "list_branches",
+                args.branches,
+                lambda: list(repo.list_branches()),
+            )
+            _best(
+                results,
+                "branch_commit_log",
+                len(commits),
+                lambda: [
+                    c for branch, _ in branches for c in repo.branch_commit_log(branch)
+                ],
+            )
+            _best(
+                results,
+                "commit_release_matching",
+                len(commits),
+                lambda: repo.commit_release_matching(fake.base_date, args.window),
+            )
+            _best(
+                results,
+                "match_bugfixes",
+                len(pr_list),
+                lambda: repo.match_bugfixes(pr_list, fake.base_date, args.window),
+            )
+            _best(
+                results,
+                "tag_releases",
+                args.tags,
+                lambda: repo.tag_releases(fake.base_date, args.window),
+            )
+            gh.reset_stats()
+            walked = repo.objects_walked
+            _best(
+                results,
+                "load_commits",
+                len(commits),
+                lambda: gh.load_commits(fake.base_date, args.window),
+            )
+            results["load_commits"]["git_objects"] = repo.objects_walked - walked
+    return list(results.values())
+
+
+SUITES = {"api": bench_api, "git": bench_git}
+
+
+def cli_opts():
+    parser = ArgumentParser(
+        description="Benchmark the collector against local stand-ins",
+        formatter_class=ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("suite", choices=list(SUITES), help="What to benchmark")
+    parser.add_argument("--repeat", default=3, type=int, help="Runs per benchmark")
+    parser.add_argument("--window", default=30, type=int, help="Window (days)")
+    parser.add_argument("--json", default="", help="Also write results to a file")
+    parser.add_argument("--users", default=50, type=int)
+    parser.add_argument("--pull-requests", default=2000, type=int)
+    parser.add_argument("--workflow-runs", default=5000, type=int)
+    parser.add_argument("--releases", default=50, type=int)
+    parser.add_argument("--branches", default=20, type=int)
+    parser.add_argument("--labels", default=0, type=int, help="Extra raw labels")
+    parser.add_argument("--label-groups", default=0, type=int)
+    parser.add_argument("--commits", default=5000, type=int)
+    parser.add_argument("--tags", default=100, type=int)
+    parser.add_argument("--merge-every", default=10, type=int)
+    return parser.parse_args()
+
+
+def main():
+    args = cli_opts()
+    logging.basicConfig(level=logging.ERROR)
+    _report(args.suite, SUITES[args.suite](args), args.json)
+
+
+if __name__ == "__main__":
+    main()
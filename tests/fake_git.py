@@ -0,0 +1,90 @@
+"""
+Build synthetic git repos for exercising (and benchmarking) gitops.Repo
+
+The generated (bare) repo has:
+    * `commits` commits on main, with a merge commit every `merge_every` commits
+    * `branches` feature branches forked from main, `branch_commits` commits each
+    * `tags` release tags spread evenly over main (alternating annotated/lightweight)
+
+Commits are spaced `spacing` seconds apart, ending just before "now",
+and authored by `authors` (a count, or a list of (name, email) pairs).
+
+Clone it like any other remote:
+    repo = make_repo(tmp_path / "origin.git", commits=1000)
+    config["repo"]["clone_url"] = f"file://{repo}"
+"""
+import os
+import random
+import time
+
+import pygit2
+
+from github_stats.gitops import GIT_OBJ_COMMIT
+
+
+def make_repo(
+    path,
+    commits=500,
+    branches=10,
+    branch_commits=5,
+    tags=20,
+    merge_every=10,
+    authors=10,
+    spacing=3600,
+    seed=1,
+):
+    """
+    :returns: path to the new bare repo
+    :rtype: str
+    """
+    path = str(path)
+    rand = random.Random(seed)
+    repo = pygit2.init_repository(path, bare=True, initial_head="main")
+    people = authors
+    if isinstance(authors, int):
+        people = [(f"Dev {i}", f"dev{i}@example.com") for i in range(authors)]
+    # every commit (including side commits of merges) is one tick of the clock
+    merges = (commits - 1) // merge_every if merge_every and commits else 0
+    ticks = commits + merges + branches * branch_commits
+    start = int(time.time()) - (ticks + 1) * spacing
+    clock = [start]
+
+    def commit(ref, parents, message):
+        clock[0] += spacing
+        name, email = rand.choice(people)
+        signature = pygit2.Signature(name, email, clock[0], 0)
+        blob = repo.create_blob(f"{message}\n".encode("utf-8"))
+        builder = repo.TreeBuilder()
+        builder.insert("file.txt", blob, pygit2.GIT_FILEMODE_BLOB)
+        return repo.create_commit(
+            ref, signature, signature, message, builder.write(), parents
+        )
+
+    main = list()
+    parents = []
+    for i in range(commits):
+        if main and merge_every and i % merge_every == 0:
+            # a short-lived side branch merged back into main
+            side = commit(None, [main[-1]], f"side work {i}")
+            oid = commit(None, [main[-1], side], f"Merge side work {i}")
+        else:
+            oid = commit(None, parents, f"commit {i}")
+        main.append(oid)
+        parents = [oid]
+    repo.references.create("refs/heads/main", main[-1], force=True)
+
+    for b in range(branches):
+        parent = main[rand.randrange(len(main))]
+        for c in range(branch_commits):
+            parent = commit(None, [parent], f"feature-{b} commit {c}")
+        repo.references.create(f"refs/heads/feature-{b}", parent)
+
+    for t in range(tags):
+        target = main[min(int((t + 1) * len(main) / (tags + 1)), len(main) - 1)]
+        name = f"v1.{t}.0"
+        if t % 2:
+            repo.references.create(f"refs/tags/{name}", target)
+        else:
+            tagger = pygit2.Signature(*people[0], repo[target].commit_time, 0)
+            repo.create_tag(name, target, GIT_OBJ_COMMIT, tagger, f"Release {name}")
+    return os.path.abspath(path)
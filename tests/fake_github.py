@@ -0,0 +1,470 @@
+"""
+A local stand-in for the parts of the Github REST API we use
+
+Generates a synthetic repo (users, pull requests, workflow runs, releases,
+branches and insights) and serves it the way Github does:
+    * results are paginated (at most 100 per page) with Link headers
+    * /stats/* endpoints answer 202 with an empty body until "computed"
+    * every response carries X-RateLimit-* headers
+    * pull requests and workflow runs carry the bulk real ones do
+      (embedded repository objects, URLs, bodies) even though we don't read it
+
+Usage:
+    with FakeGithub(pull_requests=500) as fake:
+        gh = GithubAccess(fake.config(tmp_path), repo=FakeRepo(fake))
+        gh.load_all_stats(fake.base_date)
+"""
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+
+from github_stats.util import window_list
+
+MAX_PER_PAGE = 100
+WORKFLOWS = ["build", "test", "lint", "deploy", "nightly"]
+CONCLUSIONS = ["success"] * 8 + ["failure", "cancelled", "skipped"]
+EVENTS = ["push", "pull_request", "pull_request", "schedule", "workflow_dispatch"]
+LABELS = ["bug", "enhancement", "documentation", "dependencies", "hotfix"]
+
+
+def _ts(epoch):
+    return datetime.utcfromtimestamp(epoch).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _repo_object(org, repo):
+    """
+    Github's repository object (abridged), which Github embeds in
+    pull requests and workflow runs even though we never read it
+
+    :returns: repository object
+    :rtype: dict
+    """
+    api = f"https://api.github.com/repos/{org}/{repo}"
+    obj = {
+        "id": 123456789,
+        "node_id": "R_kgDOAbCdEf",
+        "name": repo,
+        "full_name": f"{org}/{repo}",
+        "private": True,
+        "owner": {
+            "login": org,
+            "id": 987654,
+            "type": "Organization",
+            "url": f"https://api.github.com/users/{org}",
+            "html_url": f"https://github.com/{org}",
+            "avatar_url": "https://avatars.githubusercontent.com/u/987654?v=4",
+        },
+        "html_url": f"https://github.com/{org}/{repo}",
+        "description": "A repository we collect stats from",
+        "fork": False,
+        "url": api,
+    }
+    for name in (
+        "forks keys collaborators teams hooks issue_events events assignees "
+        "branches tags blobs git_tags git_refs trees statuses languages "
+        "stargazers contributors subscribers subscription commits git_commits "
+        "comments issue_comment contents compare merges archive downloads "
+        "issues pulls milestones notifications labels releases deployments"
+    ).split():
+        obj[f"{name}_url"] = f"{api}/{name}{{/id}}"
+    return obj
+
+
+class FakeGithub(object):
+    def __init__(
+        self,
+        org="fake-org",
+        repo="fake-repo",
+        users=20,
+        pull_requests=200,
+        workflow_runs=500,
+        releases=10,
+        branches=5,
+        stats_pending=1,
+        rate_limit=5000,
+        days=30,
+        org_repos=(),
+        labels=LABELS,
+        seed=1,
+    ):
+        self.org = org
+        self.repo = repo
+        self.stats_pending = stats_pending
+        self.rate_limit = rate_limit
+        self.remaining = rate_limit
+        self.reset = int(time.time()) + 3600
+        # how many times each endpoint was requested
+        self.requests = dict()
+        self._lock = threading.Lock()
+        self._stats_hits = dict()
+
+        rand = random.Random(seed)
+        self.base_date = datetime.utcnow().replace(microsecond=0)
+        now = int(self.base_date.timestamp()) - 60
+        start = now - days * 86400
+        self.users = [
+            {
+                "login": f"user{i}",
+                "name": f"User {i}" if i % 4 else None,
+                "email": f"user{i}@example.com" if i % 2 else None,
+            }
+            for i in range(users)
+        ]
+        logins = [u["login"] for u in self.users]
+        repo_object = _repo_object(org, repo)
+        api = f"https://api.github.com/repos/{org}/{repo}"
+
+        self.pull_requests = list()
+        for number in range(pull_requests, 0, -1):
+            created = rand.randint(start, now)
+            state = rand.choice(["open", "closed", "closed", "closed"])
+            merged = closed = None
+            if state == "closed":
+                closed = min(created + rand.randint(60, 5 * 86400), now)
+                if rand.random() < 0.8:
+                    merged = closed
+            self.pull_requests.append(
+                {
+                    "url": f"{api}/pulls/{number}",
+                    "html_url": f"https://github.com/{org}/{repo}/pull/{number}",
+                    "diff_url": f"https://github.com/{org}/{repo}/pull/{number}.diff",
+                    "number": number,
+                    "title": rand.choice(["Fix", "Add", "Update", "hotfix:"])
+                    + f" thing {number}",
+                    "body": "Some context for reviewers. " * rand.randint(0, 40),
+                    "state": state,
+                    "draft": state == "open" and rand.random() < 0.2,
+                    "user": {"login": rand.choice(logins)},
+                    "head": {
+                        "ref": f"feature/{number}",
+                        "sha": f"{rand.getrandbits(160):040x}",
+                        "repo": repo_object,
+                    },
+                    "base": {
+                        "ref": "main",
+                        "sha": f"{rand.getrandbits(160):040x}",
+                        "repo": repo_object,
+                    },
+                    "labels": [
+                        {"name": name}
+                        for name in rand.sample(labels, rand.randint(0, 2))
+                    ],
+                    "created_at": _ts(created),
+                    "updated_at": _ts(closed or created),
+                    "closed_at": _ts(closed) if closed else None,
+                    "merged_at": _ts(merged) if merged else None,
+                }
+            )
+
+        self.workflow_runs = list()
+        run_numbers = {w: 0 for w in WORKFLOWS}
+        for created in sorted(
+            (rand.randint(start, now) for _ in range(workflow_runs)), reverse=True
+        ):
+            workflow = rand.choice(WORKFLOWS)
+            run_numbers[workflow] += 1
+            login = rand.choice(logins)
+            self.workflow_runs.append(
+                {
+                    "url": f"{api}/actions/runs/{len(self.workflow_runs)}",
+                    "html_url": f"https://github.com/{org}/{repo}/actions/runs/{len(self.workflow_runs)}",
+                    "name": workflow,
+                    "head_branch": "main",
+                    "head_sha": f"{rand.getrandbits(160):040x}",
+                    "status": "completed",
+                    "conclusion": rand.choice(CONCLUSIONS),
+                    "event": rand.choice(EVENTS),
+                    "run_number": workflow_runs - run_numbers[workflow],
+                    "run_attempt": 2 if rand.random() < 0.05 else 1,
+                    "created_at": _ts(created),
+                    "run_started_at": _ts(created),
+                    "updated_at": _ts(created + rand.randint(30, 1800)),
+                    "triggering_actor": {"login": login},
+                    "head_commit": {
+                        "message": f"commit by {login}",
+                        "author": {"name": login, "email": f"{login}@example.com"},
+                        "committer": {"name": login, "email": f"{login}@example.com"},
+                    },
+                    "repository": repo_object,
+                    "head_repository": repo_object,
+                }
+            )
+
+        self.releases = list()
+        for i in range(releases, 0, -1):
+            created = start + int((now - start) * i / (releases + 1))
+            self.releases.append(
+                {
+                    "name": f"v1.{i}.0",
+                    "author": {"login": rand.choice(logins)},
+                    "created_at": _ts(created),
+                    "body": f"Release v1.{i}.0",
+                }
+            )
+
+        self.branches = ["main"] + [f"feature-{i}" for i in range(1, branches)]
+        self.branch_times = {b: rand.randint(start, now) for b in self.branches}
+        self.branch_details = {
+            branch: {
+                "name": branch,
+                "protected": branch == "main",
+                "commit": {
+                    "author": {"login": rand.choice(logins)},
+                    "commit": {
+                        "author": {
+                            "name": "someone",
+                            "date": _ts(self.branch_times[branch]),
+                        }
+                    },
+                },
+            }
+            for branch in self.branches
+        }
+
+        weeks = [now - now % (7 * 86400) - 7 * 86400 * w for w in range(8)][::-1]
+        self.code_frequency = [
+            [w, rand.randint(0, 5000), -rand.randint(0, 3000)] for w in weeks
+        ]
+        self.commit_activity = list()
+        for w in weeks:
+            days_ = [rand.randint(0, 40) for _ in range(7)]
+            self.commit_activity.append({"days": days_, "total": sum(days_), "week": w})
+        self.contributor_stats = [
+            {
+                "author": {"login": login},
+                "total": rand.randint(1, 500),
+                "weeks": [
+                    {
+                        "w": w,
+                        "a": rand.randint(0, 500),
+                        "d": rand.randint(0, 500),
+                        "c": rand.randint(0, 20),
+                    }
+                    for w in weeks
+                ],
+            }
+            for login in logins
+        ]
+        self.punch_card = [
+            [d, h, rand.randint(0, 30)] for d in range(7) for h in range(24)
+        ]
+
+        # every repo in the org: ours plus `org_repos` (dicts of extra repo fields)
+        self.org_repos = [{"name": repo, "default_branch": "main"}] + [
+            dict(r) for r in org_repos
+        ]
+        for r in self.org_repos:
+            r.setdefault("default_branch", "main")
+            r.setdefault("archived", False)
+            r.setdefault("fork", False)
+
+        prefix = f"/repos/{org}/{repo}"
+        self.routes = [
+            (re.compile(f"^{prefix}/pulls$"), lambda m: self.pull_requests),
+            (
+                re.compile(f"^{prefix}/actions/runs$"),
+                lambda m: ("workflow_runs", self.workflow_runs),
+            ),
+            (re.compile(f"^{prefix}/releases$"), lambda m: self.releases),
+            (re.compile(f"^/orgs/{org}/repos$"), lambda m: self.org_repos),
+            (
+                re.compile(f"^{prefix}/contributors$"),
+                lambda m: [{"login": u["login"]} for u in self.users],
+            ),
+            (
+                re.compile(f"^{prefix}/branches$"),
+                lambda m: [{"name": b} for b in self.branches],
+            ),
+            (
+                re.compile(f"^{prefix}/branches/(?P<branch>.+)$"),
+                lambda m: self.branch_details.get(m.group("branch"), None),
+            ),
+            (
+                re.compile(f"^{prefix}/stats/code_frequency$"),
+                lambda m: self.code_frequency,
+            ),
+            (
+                re.compile(f"^{prefix}/stats/commit_activity$"),
+                lambda m: self.commit_activity,
+            ),
+            (
+                re.compile(f"^{prefix}/stats/contributors$"),
+                lambda m: self.contributor_stats,
+            ),
+            (re.compile(f"^{prefix}/stats/punch_card$"), lambda m: self.punch_card),
+            (
+                re.compile("^/users/(?P<login>[^/]+)$"),
+                lambda m: next(
+                    (u for u in self.users if u["login"] == m.group("login")), None
+                ),
+            ),
+        ]
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeGithubHandler)
+        self.server.daemon_threads = True
+        self.server.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    @property
+    def authors(self):
+        """
+        :returns: (name, email) of every user, as git would record them
+        :rtype: list
+        """
+        return [
+            (u["name"] or u["login"], f"{u['login']}@example.com") for u in self.users
+        ]
+
+    def config(self, folder, **repo_config):
+        """
+        :returns: collector config pointed at this server
+        :rtype: dict
+        """
+        repo = {
+            "name": self.repo,
+            "org": self.org,
+            "folder": str(folder),
+            "branches": {"main": "main", "release": "main"},
+        }
+        repo.update(repo_config)
+        return {
+            "github_url": self.url,
+            "repo_folder": str(folder),
+            "repo": repo,
+            "query": {"results_per_page": MAX_PER_PAGE, "empty_retry_delay": 0},
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def respond(self, path, query):
+        """
+        :returns: status, body, extra headers for a request
+        :rtype: tuple
+        """
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+            self.remaining = max(self.remaining - 1, 0)
+            if "/stats/" in path:
+                # Github computes stats in the background the first time they're asked for
+                self._stats_hits[path] = self._stats_hits.get(path, 0) + 1
+                if self._stats_hits[path] <= self.stats_pending:
+                    return 202, {}, {}
+        for pattern, handler in self.routes:
+            match = pattern.match(path)
+            if not match:
+                continue
+            data = handler(match)
+            if data is None:
+                return 404, {"message": "Not Found"}, {}
+            key = None
+            if isinstance(data, tuple):
+                key, data = data
+            # stats endpoints aren't paginated
+            if not isinstance(data, list) or "/stats/" in path:
+                return 200, data, {}
+            return self._paginate(path, query, data, key)
+        return 404, {"message": "Not Found"}, {}
+
+    def _paginate(self, path, query, data, key):
+        per_page = min(int(query.get("per_page", ["30"])[0]), MAX_PER_PAGE)
+        page = int(query.get("page", ["1"])[0])
+        last = max((len(data) + per_page - 1) // per_page, 1)
+        first = (page - 1) * per_page
+        end = first + per_page
+        body = data[first:end]
+        if key:
+            body = {"total_count": len(data), key: body}
+        links = list()
+        params = {k: v[0] for k, v in query.items()}
+        for rel, number in (("next", page + 1), ("last", last)):
+            if page >= last:
+                break
+            params["page"] = number
+            links.append(
+                f'<{self.url.rstrip("/")}{path}?{urllib.parse.urlencode(params)}>; rel="{rel}"'
+            )
+        headers = {"Link": ", ".join(links)} if links else {}
+        return 200, body, headers
+
+
+class _FakeGithubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are separate writes, don't let them wait on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        fake = self.server.fake
+        url = urllib.parse.urlsplit(self.path)
+        status, body, headers = fake.respond(url.path, urllib.parse.parse_qs(url.query))
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("X-RateLimit-Limit", str(fake.rate_limit))
+        self.send_header("X-RateLimit-Remaining", str(fake.remaining))
+        self.send_header("X-RateLimit-Reset", str(fake.reset))
+        self.send_header("X-RateLimit-Used", str(fake.rate_limit - fake.remaining))
+        self.send_header("X-RateLimit-Resource", "core")
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeRepo(object):
+    """
+    Stand-in for gitops.Repo so API sections can be exercised
+    without a git checkout (the branches match the fake server)
+    """
+
+    def __init__(self, fake):
+        self.releases = list()
+        self.objects_walked = 0
+        self.branch_times = dict(fake.branch_times)
+
+    def update(self):
+        pass
+
+    def list_branches(self):
+        yield from self.branch_times.items()
+
+    def branch_commit_log(self, branch_name):
+        return iter(())
+
+    def commit_release_matching(self, base_date=None, window=1):
+        return 0, {days: 0 for days in window_list(window)}, 0, 0
+
+    def match_bugfixes(self, pr_list, base_date=None, window=1):
+        return 0, {days: 0 for days in window_list(window)}
+
+    def tag_releases(self, base_date=None, window=1):
+        return {
+            "total_releases": 0,
+            "users": dict(),
+            "total_window_releases": {days: 0 for days in window_list(window)},
+        }
@@ -0,0 +1,33 @@
+import regex
+
+from github_stats.bugfixes import BugfixClassifier, add_bug_match
+
+
+def test_classifier():
+    patterns = [regex.compile(p) for p in ["^fix", "(?i)^hotfix", r"^(\w+)-\1", "^bug"]]
+    bugfixes = BugfixClassifier(patterns, ["bug", "incident"])
+    # capture groups are kept out of the combined pattern
+    assert len(bugfixes.patterns) == 2
+    assert bugfixes.is_bugfix("fix the thing")
+    assert bugfixes.is_bugfix("HOTFIX: prod is down")
+    # inline flags stay with their own pattern
+    assert not bugfixes.is_bugfix("FIX the thing")
+    assert bugfixes.is_bugfix("abc-abc repeated")
+    assert not bugfixes.is_bugfix("abc-abd")
+    assert bugfixes.is_bugfix("Add a thing", ["enhancement", "incident"])
+    assert not bugfixes.is_bugfix("Add a thing", ["enhancement"])
+    assert not BugfixClassifier().is_bugfix("fix", ["bug"])
+
+
+def test_bug_matches_stay_sorted_and_unique():
+    matches = list()
+    seen = set()
+    for match in [("b", "2", 20.0), ("a", "1", 10.0), ("c", "3", 30.0)] * 2:
+        add_bug_match(matches, seen, match)
+    add_bug_match(matches, seen, ("d", "4", 15.0))
+    assert matches == [
+        ("a", "1", 10.0),
+        ("d", "4", 15.0),
+        ("b", "2", 20.0),
+        ("c", "3", 30.0),
+    ]
@@ -0,0 +1,43 @@
+from datetime import datetime
+
+from github_stats.columns import PullRequestColumns, naive_ts, parse_ts
+
+
+def test_timestamps():
+    assert parse_ts("2023-01-02T03:04:05Z") == 1672628645
+    assert parse_ts(None) == 0
+    assert naive_ts(datetime(2023, 1, 2, 3, 4, 5)) == 1672628645
+    assert naive_ts(datetime(2023, 1, 2, 3, 4, 5, 500000)) == 1672628645.5
+
+
+def test_pull_request_columns():
+    prs = PullRequestColumns()
+    for number, (login, labels, merged) in enumerate(
+        [
+            ("alice", ["bug", "hotfix"], "2023-01-03T00:00:00Z"),
+            ("bob", [], None),
+            ("alice", ["bug"], None),
+        ]
+    ):
+        prs.append(
+            {
+                "title": f"PR {number}",
+                "head": {"sha": f"{number:040x}"},
+                "user": {"login": login},
+                "state": "closed" if merged else "open",
+                "draft": False,
+                "labels": [{"name": name} for name in labels],
+                "created_at": "2023-01-02T00:00:00Z",
+                "updated_at": "2023-01-02T12:00:00Z",
+                "closed_at": merged,
+                "merged_at": merged,
+            }
+        )
+    assert len(prs) == 3
+    assert prs.logins.values == ["alice", "bob"]
+    assert list(prs.author) == [0, 1, 0]
+    assert [prs.labels.values[c] for c in prs.labels_of(0)] == ["bug", "hotfix"]
+    assert list(prs.labels_of(1)) == []
+    assert list(prs.labels_of(2)) == [prs.labels.code("bug")]
+    assert list(prs.ended) == [prs.created[0] + 86400, 0, 0]
+    assert list(prs.open) == [0, 1, 1]
@@ -0,0 +1,51 @@
+from github_stats.discovery import discover_repos
+from github_stats.github_api import GithubAccess
+from github_stats.usercache import UserCache
+from tests.fake_github import FakeGithub, FakeRepo
+
+
+def test_discover_org_repos(tmp_path):
+    org_repos = [{"name": f"service-{i}"} for i in range(150)] + [
+        {"name": "old-service", "archived": True},
+        {"name": "forked-lib", "fork": True},
+        {"name": "docs", "default_branch": "master"},
+        {"name": "service-archive"},
+    ]
+    with FakeGithub(org_repos=org_repos) as fake:
+        config = fake.config(tmp_path)
+        config["discovery"] = {
+            "org": fake.org,
+            "exclude": ["*-archive"],
+            "defaults": {"tagged_releases": True},
+        }
+        config["repos"] = [
+            {"name": "docs", "tagged_releases": False},
+            {"name": "elsewhere", "org": "other-org"},
+        ]
+        repos = {r["name"]: r for r in discover_repos(config)}
+
+    assert len(repos) == 1 + 150 + 1 + 1
+    assert "old-service" not in repos and "forked-lib" not in repos
+    assert "service-archive" not in repos
+    assert repos["service-7"]["tagged_releases"] is True
+    assert repos["service-7"]["folder"] == str(tmp_path)
+    # explicit settings win, and default branches come from Github
+    assert repos["docs"]["tagged_releases"] is False
+    assert repos["docs"]["branches"] == {"main": "master", "release": "master"}
+    assert repos["elsewhere"]["org"] == "other-org"
+    # 155 repos at 100 per page
+    assert fake.requests[f"/orgs/{fake.org}/repos"] == 2
+
+
+def test_user_cache_shared_between_repos(tmp_path):
+    user_cache = UserCache()
+    with FakeGithub(users=15, workflow_runs=50) as fake:
+        for _ in range(3):
+            gh = GithubAccess(
+                fake.config(tmp_path), repo=FakeRepo(fake), user_cache=user_cache
+            )
+            gh.load_all_stats(fake.base_date, 30)
+    lookups = sum(v for k, v in fake.requests.items() if k.startswith("/users/"))
+    # 'unknown' isn't a real user, the 404 is cached too
+    assert lookups == 15 + 1
+    assert user_cache.misses == 15 + 1
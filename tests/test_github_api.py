@@ -0,0 +1,127 @@
+from github_stats import projections
+from github_stats.github_api import GithubAccess
+from github_stats.projections import project
+from tests.fake_github import FakeGithub, FakeRepo
+
+
+def test_load_all_stats_against_fake_github(tmp_path):
+    with FakeGithub(pull_requests=250, workflow_runs=320, releases=4) as fake:
+        gh = GithubAccess(fake.config(tmp_path), repo=FakeRepo(fake))
+        gh.load_all_stats(fake.base_date, 30)
+
+    assert gh.stats["pull_requests"]["total_pull_requests"] == 250
+    assert gh.stats["releases"]["total_releases"] == 4
+    runs = sum(
+        w["total_window_runs"] for w in gh.stats["workflows"]["workflows"].values()
+    )
+    assert runs == 320 - sum(
+        1 for r in fake.workflow_runs if r["status"] in gh.ignored_statuses
+    )
+    assert gh.stats["branches"]["total_branches"] == len(fake.branches)
+    assert gh.stats["repo_stats"]["punchcard"]["total_commits"] == sum(
+        c for _, _, c in fake.punch_card
+    )
+    # 250 PRs at 100 per page
+    assert gh.stats["collector"]["pull_requests"]["pages"] == 3
+    # every stats endpoint answers 202 once before returning data
+    assert gh.stats["collector"]["repo_stats"]["retries"] == 4
+    assert gh.stats["collector"]["repo_stats"]["requests"] == 8
+    assert gh.budget.remaining == fake.remaining
+
+
+def test_scheduled_sections_reuse_last_values(tmp_path):
+    with FakeGithub(pull_requests=30, workflow_runs=40) as fake:
+        config = fake.config(tmp_path)
+        config["schedules"] = {"pull_requests": 3600}
+        gh = GithubAccess(config, repo=FakeRepo(fake))
+        gh.load_all_stats(fake.base_date, 30)
+        first = dict(gh.stats["pull_requests"])
+        requests = dict(fake.requests)
+        gh.refresh()
+        gh.load_all_stats(fake.base_date, 30)
+
+    pulls = f"/repos/{fake.org}/{fake.repo}/pulls"
+    runs = f"/repos/{fake.org}/{fake.repo}/actions/runs"
+    assert fake.requests[pulls] == requests[pulls]
+    assert fake.requests[runs] == requests[runs] + 1
+    assert gh.stats["pull_requests"] == first
+    assert "pull_requests" not in gh.stats["collector"]
+
+
+def test_results_are_projected(tmp_path):
+    with FakeGithub(pull_requests=150, workflow_runs=150) as fake:
+        gh = GithubAccess(fake.config(tmp_path), repo=FakeRepo(fake))
+        gh.cache_raw_data = True
+        gh.load_pull_requests(fake.base_date, 30)
+        gh.load_workflow_runs(fake.base_date, 30)
+    cached = {key[1].rsplit("/", 1)[-1]: value for key, value in gh._raw_cache.items()}
+    assert len(cached["pulls"]) == 150 and len(cached["runs"]) == 150
+    assert set(cached["pulls"][0]) == set(projections.PULL_REQUEST)
+    assert cached["pulls"][0]["head"] == {"sha": fake.pull_requests[0]["head"]["sha"]}
+    assert set(cached["runs"][0]) == set(projections.WORKFLOW_RUN)
+    assert "repository" not in cached["runs"][0]
+
+
+def test_project():
+    fields = {"a": None, "b": {"c": None}, "d": {"e": None}}
+    value = {"a": [1], "b": {"c": 2, "x": 3}, "d": [{"e": 4, "y": 5}], "z": 6}
+    assert project(value, fields) == {"a": [1], "b": {"c": 2}, "d": [{"e": 4}]}
+    assert project({"b": None}, fields) == {"b": None}
+    assert project([[0, 1, 2]], None) == [[0, 1, 2]]
+
+
+def test_additional_labels(tmp_path):
+    additional = {"bugs": ["bug", "hotfix", "bug"], "enhancement": ["dependencies"]}
+    with FakeGithub(pull_requests=300) as fake:
+        config = fake.config(tmp_path, additional_labels=additional)
+        gh = GithubAccess(config, repo=FakeRepo(fake))
+        gh.load_pull_requests(fake.base_date, 30)
+    totals = dict()
+    for pull in fake.pull_requests:
+        for label in pull["labels"]:
+            totals[label["name"]] = totals.get(label["name"], 0) + 1
+    labels = {k: v["total_prs"] for k, v in gh.stats["pull_requests"]["labels"].items()}
+    assert labels["bugs"] == totals["bug"] + totals["hotfix"]
+    # "enhancement" is one of our labels, so the raw label only counts towards it
+    assert labels["enhancement"] == totals["dependencies"]
+    assert labels["bug"] == totals["bug"]
+    assert set(labels) == set(additional) | set(totals)
+
+
+def test_multiple_windows(tmp_path):
+    with FakeGithub(pull_requests=250, workflow_runs=320) as fake:
+        config = fake.config(tmp_path)
+        gh = GithubAccess(config, repo=FakeRepo(fake))
+        gh.load_all_stats(fake.base_date, [30, 3])
+        single = dict()
+        for days in (30, 3):
+            single[days] = GithubAccess(config, repo=FakeRepo(fake))
+            single[days].load_all_stats(fake.base_date, days)
+
+    assert gh.stats["windows"] == [30, 3]
+    assert list(gh.stats["window_stats"]) == [3]
+    for days, stats in [(30, gh.stats), (3, gh.stats["window_stats"][3])]:
+        expected = single[days].stats
+        assert (
+            stats["pull_requests"]["total_window_pull_requests"]
+            == expected["pull_requests"]["total_window_pull_requests"]
+        )
+        for label, counts in stats["pull_requests"]["labels"].items():
+            assert (
+                counts["total_window_prs"]
+                == expected["pull_requests"]["labels"][label]["total_window_prs"]
+            )
+        for event, counts in stats["workflows"]["events"].items():
+            assert counts["window"] == expected["workflows"]["events"][event]["window"]
+        assert (
+            stats["branches"]["total_window_branches"]
+            == expected["branches"]["total_window_branches"]
+        )
+        for user, counts in expected["users"].items():
+            window_user = stats["users"].get(user, {})
+            for key in ("total_window_pull_requests", "total_window_branches"):
+                assert window_user.get(key, 0) == counts[key]
+    assert (
+        gh.stats["window_stats"][3]["pull_requests"]["total_window_pull_requests"]
+        < gh.stats["pull_requests"]["total_window_pull_requests"]
+    )
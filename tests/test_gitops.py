@@ -0,0 +1,57 @@
+from github_stats.github_api import GithubAccess
+from github_stats.gitops import Repo
+from tests.fake_git import make_repo
+from tests.fake_github import FakeGithub
+
+
+def test_repo_against_synthetic_history(tmp_path):
+    with FakeGithub(pull_requests=0, workflow_runs=0, releases=0) as fake:
+        origin = make_repo(
+            tmp_path / "origin.git",
+            commits=120,
+            branches=3,
+            branch_commits=4,
+            tags=5,
+            merge_every=10,
+            authors=fake.authors,
+        )
+        config = fake.config(
+            tmp_path / "clones",
+            clone_url=f"file://{origin}",
+            tag_patterns=[{"name": "release", "pattern": ".*v.*"}],
+        )
+        repo = Repo(config)
+        assert len(repo.releases) == 5
+        assert [b for b, _ in repo.list_branches()] == [
+            "main",
+            "feature-0",
+            "feature-1",
+            "feature-2",
+        ]
+        # 120 commits on main plus one side commit per merge
+        assert sum(1 for _ in repo.branch_commit_log("main")) == 131
+        assert sum(1 for _ in repo.branch_commit_log("feature-1")) == 4
+        _, _, unreleased, total = repo.commit_release_matching()
+        assert total == 131
+        assert 0 < unreleased < total
+        # the walk is re-used (for any base date/window) until the next update
+        walked = repo.objects_walked
+        assert repo.commit_release_matching(fake.base_date, [1, 30])[2:] == (
+            unreleased,
+            total,
+        )
+        assert repo.objects_walked == walked
+
+        gh = GithubAccess(config, repo=repo)
+        gh._run_section("commits", gh.load_commits, fake.base_date, 30)
+    assert gh.stats["commits"]["total_commits"] == 131
+    user_commits = sum(u["total_commits"] for u in gh.stats["users"].values())
+    assert user_commits == 131 + 3 * 4
+    assert gh.stats["users"]["unknown"]["total_commits"] == 0
+    # main was already matched to releases above, so only branch logs are walked
+    assert gh.stats["collector"]["commits"]["git_objects"] == 131 + 3 * 4
+    # a fetch can change main (and our releases), so we walk again
+    walked = repo.objects_walked
+    repo.update()
+    repo.commit_release_matching()
+    assert repo.objects_walked == walked + 131
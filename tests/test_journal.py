@@ -0,0 +1,112 @@
+from argparse import Namespace
+import importlib.util
+import os
+
+import pytest
+
+from github_stats.github_api import GithubAccess
+from github_stats.journal import BackfillJournal
+from github_stats.ratelimit import RateLimitBudget
+from tests.fake_github import FakeGithub, FakeRepo
+
+
+def test_journal_resume(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = BackfillJournal(path)
+    journal.record("repo1", [3600, 7200])
+    journal.close()
+    # simulate a crash in the middle of writing an entry
+    with open(path, "a") as f:
+        f.write('{"repo": "repo1", "timest')
+
+    resumed = BackfillJournal(path)
+    assert resumed.done("repo1", 3600)
+    assert resumed.done("repo1", 7200.0)
+    assert not resumed.done("repo1", 10800)
+    assert not resumed.done("repo2", 3600)
+    resumed.close()
+
+    assert not BackfillJournal(path, restart=True).done("repo1", 3600)
+
+
+def _backfill_script():
+    path = os.path.join(os.path.dirname(__file__), "..", "backfill-stats.py")
+    spec = importlib.util.spec_from_file_location("backfill_stats", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _flaky_backfill(monkeypatch, fake, tmp_path, attempts):
+    """
+    :returns: the backfill script, with collections after fake.base_date failing
+    """
+    backfill = _backfill_script()
+
+    class FlakyAccess(GithubAccess):
+        def __init__(self, config, *args, **kwargs):
+            super().__init__(config, *args, repo=FakeRepo(fake), **kwargs)
+
+        def load_all_stats(self, base_date, window):
+            # collect (some) stats before failing, like a real failure would
+            super().load_all_stats(base_date, window)
+            if base_date.timestamp() > fake.base_date.timestamp():
+                attempts.append(base_date)
+                raise Exception("Github is down")
+
+    monkeypatch.setattr(backfill, "GithubAccess", FlakyAccess)
+    return backfill
+
+
+def _backfill_config(fake, tmp_path):
+    config = dict(fake.config(tmp_path), parquet={"path": str(tmp_path / "lake")})
+    config["repos"] = [config["repo"]]
+    args = Namespace(
+        output=["parquet"], window=[1], batch_size=10, pacing="rate", sleep_time=1800
+    )
+    return config, args
+
+
+def test_failed_unit_stays_out_of_journal(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    attempts = list()
+    with FakeGithub(pull_requests=5, workflow_runs=5) as fake:
+        backfill = _flaky_backfill(monkeypatch, fake, tmp_path, attempts)
+        config, args = _backfill_config(fake, tmp_path)
+        repo = config["repo"]
+        journal = BackfillJournal(str(tmp_path / "journal.jsonl"))
+        budget = RateLimitBudget()
+        good = int(fake.base_date.timestamp())
+        bad = [good + 3600, good + 7200]
+        jobs = [(config, repo, bad[0], args, budget, journal)]
+        assert backfill._run_all(backfill.backfill_unit, jobs, 1) == 1
+        jobs = [(config, repo, [good] + bad, args, budget, journal)]
+        assert backfill._run_all(backfill.backfill_once, jobs, 1) == 1
+    # every unit is tried 3 times, and backfill_once stops at its first failure
+    assert len(attempts) == 6
+    # timestamps collected before the failure are still written
+    assert journal.done(repo["name"], good)
+    assert not journal.done(repo["name"], bad[0])
+    assert not journal.done(repo["name"], bad[1])
+    journal.close()
+
+
+def test_serial_backfill_keeps_going_after_a_failure(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    attempts = list()
+    with FakeGithub(pull_requests=5, workflow_runs=5) as fake:
+        backfill = _flaky_backfill(monkeypatch, fake, tmp_path, attempts)
+        config, args = _backfill_config(fake, tmp_path)
+        journal = BackfillJournal(str(tmp_path / "journal.jsonl"))
+        good = int(fake.base_date.timestamp())
+        bad = good + 3600
+        # the failing unit comes first, and doesn't stop the one after it
+        failures = backfill._run_serial(
+            config, [bad, good - 3600, good], args, RateLimitBudget(), journal
+        )
+    assert failures == 1
+    assert len(attempts) == 3
+    assert not journal.done(config["repo"]["name"], bad)
+    assert journal.done(config["repo"]["name"], good - 3600)
+    assert journal.done(config["repo"]["name"], good)
+    journal.close()
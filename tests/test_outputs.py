@@ -0,0 +1,288 @@
+from copy import deepcopy
+from datetime import datetime
+
+import pytest
+
+from github_stats.outputs import StatsOutput
+from github_stats.outputs.cardinality import CardinalityGuard
+from github_stats.outputs.dedup import SeriesDeduplicator
+from github_stats.outputs.prometheus import MetricsExporter, PrometheusOutput
+from github_stats.outputs.prometheus import _format_value
+from github_stats.schema import stats as stats_schema, user_schema, collector_schema
+from github_stats.schema import window_schema
+from github_stats.sketch import QuantileSketch
+
+CONFIG = {
+    "repo": {"name": "repo1", "branches": {"main": "main", "release": "main"}},
+    "prometheus": {"metric_prefix": "github"},
+}
+
+
+def _stats():
+    stats = deepcopy(stats_schema)
+    stats["collection_date"] = datetime(2022, 5, 1)
+    stats["window"] = 1
+    stats["windowed_mttr"] = 0
+    stats["commits"]["windowed_commit_time"] = 0
+    stats["commits"]["unreleased_commits"] = 0
+    stats["commits"]["collection_time"] = 1
+    stats["commits"]["total_commits"] = 12
+    stats["pull_requests"]["labels"]["bug"] = {"total_prs": 3, "total_window_prs": 1}
+    stats["users"]['Joe "JJ" Smith'] = deepcopy(user_schema)
+    stats["users"]['Joe "JJ" Smith']["total_commits"] = 4
+    return stats
+
+
+def test_prometheus_render():
+    output = PrometheusOutput(CONFIG)
+    output.exporter = MetricsExporter()
+    output.format_stats(_stats())
+    output.write_stats()
+    prom, openmetrics = output.exporter.snapshot
+    prom = prom.decode()
+    openmetrics = openmetrics.decode()
+
+    assert "# TYPE github_commits_total counter" in prom
+    assert 'github_commits_total{repository_name="repo1"} 12' in prom
+    assert 'user="Joe \\"JJ\\" Smith"} 4' in prom
+    # openmetrics counter families drop the suffix, samples keep it
+    assert "# TYPE github_commits counter" in openmetrics
+    assert 'github_commits_total{repository_name="repo1"} 12' in openmetrics
+    assert openmetrics.endswith("# EOF\n")
+
+
+def test_prometheus_special_values():
+    assert _format_value(float("nan")) == "NaN"
+    assert _format_value(float("inf")) == "+Inf"
+    assert _format_value(float("-inf")) == "-Inf"
+    assert _format_value(1.5) == "1.5"
+    assert _format_value(3) == "3"
+    assert _format_value(True) == "1"
+
+
+def test_multiple_windows():
+    stats = _stats()
+    stats["windows"] = [1, 7]
+    stats["commits"]["window_commits"] = 2
+    window = deepcopy(window_schema)
+    window["commits"]["window_commits"] = 5
+    window["pull_requests"]["labels"]["bug"] = {"total_window_prs": 2}
+    window["users"]['Joe "JJ" Smith'] = {"total_window_commits": 3}
+    stats["window_stats"] = {7: window}
+    series = StatsOutput(CONFIG).build_stats(stats)
+
+    def values(name, **labels):
+        return {
+            s["labels"].get("window"): s["value"]
+            for s in series
+            if s["name"] == name
+            and all(s["labels"].get(k) == v for k, v in labels.items())
+        }
+
+    assert values("window_commits_total") == {"1d": 2, "7d": 5}
+    assert values("window_labelled_prs_total", label="bug") == {"1d": 1, "7d": 2}
+    assert values("users_window_commits_total") == {"1d": 0, "7d": 3}
+    assert values("users_window_releases_total") == {"1d": 0, "7d": 0}
+    # series that aren't windowed only show up once, without a window
+    assert values("commits_total") == {None: 12}
+
+    # a single window keeps our series as they were
+    del stats["window_stats"][7]
+    stats["windows"] = [1]
+    series = StatsOutput(CONFIG).build_stats(stats)
+    assert values("window_commits_total") == {None: 2}
+
+
+def test_exporter_merges_repos():
+    exporter = MetricsExporter()
+    family = {"help": "h", "type": "gauge", "samples": ['{repository_name="a"} 1']}
+    exporter.update("a", {"m": family})
+    exporter.update(
+        "b", {"m": dict(family, samples=['{repository_name="b"} 2']), "n": family}
+    )
+    prom = exporter.snapshot[0].decode().splitlines()
+    # all samples of one family must be contiguous
+    assert prom.index('m{repository_name="b"} 2') == (
+        prom.index('m{repository_name="a"} 1') + 1
+    )
+    assert prom.count("# TYPE m gauge") == 1
+
+
+def test_dedup_only_emits_changes(tmp_path):
+    state = str(tmp_path / "dedup.json")
+    first = SeriesDeduplicator(state, full_refresh_interval=3600)
+    series = [
+        {"name": "a_total", "labels": {"repository_name": "r"}, "value": 1},
+        {"name": "b_total", "labels": {"repository_name": "r"}, "value": 2},
+    ]
+    assert len(first.filter(series, 1000)) == 2
+    first.commit()
+
+    second = SeriesDeduplicator(state, full_refresh_interval=3600)
+    changed = [dict(series[0]), dict(series[1], value=3)]
+    assert second.filter(changed, 2000) == [changed[1]]
+    # nothing is recorded until we commit, so an unwritten run is retried
+    assert len(second.filter(changed, 2000)) == 1
+    # periodic full refresh writes everything again
+    assert len(second.filter(changed, 5000)) == 2
+
+
+def test_dedup_forgets_series_missing_from_full_refresh(tmp_path):
+    state = str(tmp_path / "dedup.json")
+    dedup = SeriesDeduplicator(state, full_refresh_interval=3600)
+    series = [
+        {"name": "a_total", "labels": {"branch": "main"}, "value": 1},
+        {"name": "a_total", "labels": {"branch": "old"}, "value": 1},
+    ]
+    dedup.filter(series, 1000)
+    dedup.commit()
+    # partial runs only add to what we know
+    dedup.filter(series[:1], 2000)
+    dedup.commit()
+    assert len(dedup.state["series"]) == 2
+    # a full refresh without the old branch drops it
+    dedup.filter(series[:1], 5000)
+    dedup.commit()
+    assert len(SeriesDeduplicator(state).state["series"]) == 1
+    assert dedup.filter(series, 6000) == [series[1]]
+
+
+def test_cardinality_rollup_keeps_totals():
+    series = [
+        {
+            "name": "users_commits_total",
+            "labels": {"user": user},
+            "value": value,
+            "measurement_type": "count",
+        }
+        for user, value in (("a", 10), ("b", 5), ("c", 2), ("d", 1))
+    ]
+    guard = CardinalityGuard({"users_*": {"label": "user", "top_k": 2}})
+    guarded = guard.apply(series)
+    assert {s["labels"]["user"]: s["value"] for s in guarded} == {
+        "a": 10,
+        "b": 5,
+        "other": 3,
+    }
+    assert guard.dropped == {"users_*": 2}
+
+
+def test_collector_series_per_section():
+    stats = _stats()
+    stats["collector"]["workflows"] = dict(collector_schema, requests=3, pages=2)
+    collector = [
+        s
+        for s in StatsOutput(CONFIG).build_stats(stats)
+        if s["name"].startswith("collector_")
+    ]
+    series = {(s["name"], s["labels"].get("section")): s["value"] for s in collector}
+    assert series[("collector_requests", "workflows")] == 3
+    assert series[("collector_pages", "workflows")] == 2
+    assert ("collector_requests", "pull_requests") not in series
+    # amounts for one collection, not running totals
+    assert all(s["measurement_type"] == "gauge" for s in collector)
+    assert not any(s["name"].endswith("_total") for s in collector)
+
+
+def test_quantile_series():
+    stats = _stats()
+    sketch = QuantileSketch()
+    for value in range(1, 101):
+        sketch.add(value)
+    stats["workflows"]["run_time_sketch"] = sketch
+    stats["users"]['Joe "JJ" Smith']["pr_time_open_sketch"] = sketch
+    config = dict(CONFIG, quantiles=[0.5, 0.99])
+    series = {
+        (s["name"], s["labels"].get("quantile")): s
+        for s in StatsOutput(config).build_stats(stats)
+        if "quantile" in s["labels"]
+    }
+    assert sorted(series) == [
+        ("users_pr_time_open_secs", "0.5"),
+        ("users_pr_time_open_secs", "0.99"),
+        ("workflow_run_time_secs", "0.5"),
+        ("workflow_run_time_secs", "0.99"),
+    ]
+    assert series[("workflow_run_time_secs", "0.5")]["value"] == pytest.approx(
+        50, rel=0.01
+    )
+    assert series[("users_pr_time_open_secs", "0.99")]["value"] == pytest.approx(
+        99, rel=0.01
+    )
+
+
+def test_parquet_output(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    from github_stats.outputs.parquet import ParquetOutput
+
+    config = dict(CONFIG, parquet={"path": str(tmp_path)})
+    output = ParquetOutput(config, timestamp=datetime(2022, 5, 1, 12))
+    stats = _stats()
+    # nothing to average over in the window
+    stats["windowed_mttr"] = None
+    output.format_stats(stats)
+    output.write_stats()
+    folder = tmp_path / "repository_name=repo1" / "collection_date=2022-05-01"
+    files = sorted(folder.iterdir())
+    assert [f.suffix for f in files] == [".parquet"]
+
+    table = pq.read_table(files[0]).to_pylist()
+    columns = pq.read_schema(files[0]).names
+    assert columns[:5] == [
+        "timestamp",
+        "name",
+        "value",
+        "measurement_type",
+        "description",
+    ]
+    assert "label_user" in columns and "label_repository_name" not in columns
+    rows = {(row["name"], row["label_user"], row["label_label"]): row for row in table}
+    assert rows[("commits_total", None, None)]["value"] == 12
+    assert rows[("users_commits_total", 'Joe "JJ" Smith', None)]["value"] == 4
+    assert rows[("labelled_prs_total", None, "bug")]["value"] == 3
+    assert rows[("windowed_mttr_secs", None, None)]["value"] is None
+    assert rows[("unreleased_commits_count", None, None)]["value"] == 0
+    assert rows[("commits_total", None, None)]["timestamp"] == datetime(2022, 5, 1, 12)
+
+    # writing again adds another part file (and nothing is buffered twice)
+    output.set_timestamp(datetime(2022, 5, 1, 13))
+    output.format_stats(stats)
+    output.write_stats()
+    files = sorted(folder.iterdir())
+    assert len(files) == 2
+    assert pq.read_table(folder).num_rows == 2 * len(table)
+
+
+def test_cardinality_rollup_mixed_family():
+    series = list()
+    for user, commits, last_commit, secs in (
+        ("busy", 50, 1600000000, 10),
+        ("steady", 20, 1600000100, 20),
+        ("recent", 1, 1700000000, 900000),
+    ):
+        for name, value, mtype in (
+            ("users_commits_total", commits, "count"),
+            ("users_last_commit_time", last_commit, "gauge"),
+            ("users_pr_time_open_secs", secs, "gauge"),
+        ):
+            series.append(
+                {
+                    "name": name,
+                    "labels": {"user": user},
+                    "value": value,
+                    "measurement_type": mtype,
+                }
+            )
+    guard = CardinalityGuard({"users_*": {"label": "user", "top_k": 2}})
+    guarded = {
+        (s["name"], s["labels"]["user"]): s["value"] for s in guard.apply(series)
+    }
+    # ranked by activity (counts), not by timestamps or durations
+    assert guarded[("users_commits_total", "busy")] == 50
+    assert guarded[("users_commits_total", "steady")] == 20
+    assert guarded[("users_commits_total", "other")] == 1
+    # timestamps/durations of the folded user are dropped rather than summed
+    assert ("users_last_commit_time", "other") not in guarded
+    assert ("users_pr_time_open_secs", "other") not in guarded
+    assert not any(user == "recent" for _, user in guarded)
+    assert guard.dropped == {"users_*": 3}
@@ -0,0 +1,60 @@
+import os
+import pstats
+import threading
+
+from github_stats.profiling import Profiler
+
+
+def _work():
+    return sorted(str(i) * 10 for i in range(20000))
+
+
+def test_cpu_profile_reports(tmp_path):
+    profiler = Profiler("cpu", str(tmp_path))
+    with profiler.section("repo1.commits"):
+        _work()
+    files = sorted(os.listdir(tmp_path))
+    assert [f.split("-", 2)[2] for f in files] == [
+        "repo1.commits.collapsed",
+        "repo1.commits.pstats",
+    ]
+    stats = pstats.Stats(str(tmp_path / files[1]))
+    assert any(func[2] == "_work" for func in stats.stats)
+
+
+def test_memory_profile_reports(tmp_path):
+    profiler = Profiler("memory", str(tmp_path))
+    with profiler.section("repo1.commits"):
+        kept = _work()
+    assert kept
+    files = sorted(os.listdir(tmp_path))
+    assert [f.split("-", 2)[2] for f in files] == [
+        "repo1.commits.collapsed",
+        "repo1.commits.memory.txt",
+    ]
+    collapsed = (tmp_path / files[0]).read_text()
+    assert "test_profiling.py" in collapsed.splitlines()[0]
+
+
+def test_sections_dont_overlap(tmp_path):
+    profiler = Profiler("memory", str(tmp_path))
+    errors = list()
+
+    def other_section():
+        try:
+            with profiler.section("repo2.commits"):
+                pass
+        except Exception as e:
+            errors.append(e)
+
+    with profiler.section("repo1.commits"):
+        # a concurrent section fails right away instead of waiting for ours
+        thread = threading.Thread(target=other_section)
+        thread.start()
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+    assert len(errors) == 1
+    # and the profiler is free again afterwards
+    with profiler.section("repo2.commits"):
+        pass
+    assert len(os.listdir(tmp_path)) == 4
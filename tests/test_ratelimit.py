@@ -0,0 +1,72 @@
+import threading
+import time
+
+from github_stats.ratelimit import RateLimitBudget
+
+
+def test_budget_paces_on_observed_quota(monkeypatch):
+    slept = list()
+    monkeypatch.setattr(time, "sleep", lambda secs: slept.append(secs))
+    budget = RateLimitBudget(reserve=10)
+    # nothing observed yet, so nothing to wait on
+    assert budget.wait_for(1000) == 0
+
+    reset = int(time.time()) + 600
+    budget.update(
+        {
+            "X-RateLimit-Limit": "5000",
+            "X-RateLimit-Remaining": "60",
+            "X-RateLimit-Reset": str(reset),
+        }
+    )
+    assert budget.wait_for(50) == 0
+    budget.acquire()
+    assert budget.remaining == 59
+    assert budget.wait_for(50) > 0
+    assert slept and slept[0] > 590
+
+    # other resources (search, graphql) don't count against core
+    budget.update({"X-RateLimit-Resource": "search", "X-RateLimit-Remaining": "1"})
+    assert budget.remaining == 59
+
+
+def test_budget_pause_holds_every_acquirer(monkeypatch):
+    clock = [1000.0]
+    slept = list()
+    both_waiting = threading.Barrier(2)
+
+    def _sleep(secs):
+        slept.append(secs)
+        # only wake up (at the reset) once the other acquirer is waiting too
+        both_waiting.wait(timeout=5)
+        clock[0] = 1700.0
+
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+    monkeypatch.setattr(time, "sleep", _sleep)
+    budget = RateLimitBudget(reserve=10)
+    budget.update(
+        {
+            "X-RateLimit-Limit": "5000",
+            "X-RateLimit-Remaining": "10",
+            "X-RateLimit-Reset": "1600",
+        }
+    )
+    errors = list()
+
+    def _acquire():
+        try:
+            budget.acquire()
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=_acquire) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=10)
+    assert not errors
+    assert slept == [601.0, 601.0]
+    assert budget.paused_until == 1601
+    assert budget.requests == 2
+    # we keep our last view of the quota instead of forgetting it
+    assert budget.remaining == 8
@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from github_stats.github_api import GithubAccess
+from github_stats.sketch import QuantileSketch
+from tests.fake_github import FakeGithub, FakeRepo
+
+
+def _exact(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))]
+
+
+def test_quantiles_within_accuracy():
+    rand = random.Random(7)
+    values = [rand.lognormvariate(6, 1.5) for _ in range(20000)] + [0, -3]
+    sketch = QuantileSketch()
+    for value in values:
+        sketch.add(value)
+
+    assert len(sketch) == len(values)
+    quantiles = [0.5, 0.9, 0.95, 0.99, 1]
+    for q, value in zip(quantiles, sketch.quantiles(quantiles)):
+        assert value == pytest.approx(_exact(values, q), rel=0.01)
+    # zeros (and negative durations) sit below everything else
+    assert sketch.quantile(0) == 0
+    assert QuantileSketch().quantiles([0.5, 0.99]) == [0, 0]
+
+
+def test_merge_and_bounded_buckets():
+    rand = random.Random(11)
+    values = [rand.uniform(1, 100000) for _ in range(5000)]
+    merged = QuantileSketch()
+    whole = QuantileSketch()
+    for n, value in enumerate(values):
+        part = QuantileSketch()
+        part.add(value)
+        merged.merge(part)
+        whole.add(value)
+        if n % 1000 == 0:
+            merged.merge(QuantileSketch())
+    assert merged.buckets == whole.buckets
+    assert merged.quantiles() == whole.quantiles()
+    with pytest.raises(Exception):
+        merged.merge(QuantileSketch(accuracy=0.05))
+
+    # collapsing only costs the lowest values their accuracy
+    small = QuantileSketch(max_buckets=50)
+    for value in values:
+        small.add(value)
+    assert len(small.buckets) == 50
+    assert small.quantile(0.99) == pytest.approx(_exact(values, 0.99), rel=0.01)
+
+
+def test_collector_sketches(tmp_path):
+    with FakeGithub(pull_requests=120, workflow_runs=200) as fake:
+        gh = GithubAccess(fake.config(tmp_path), repo=FakeRepo(fake))
+        gh.load_all_stats(fake.base_date, 30)
+
+    pulls = gh.stats["pull_requests"]
+    ended = pulls["total_pull_requests"] - pulls["total_open_pull_requests"]
+    assert len(pulls["pr_time_open_sketch"]) == ended
+    assert ended == sum(
+        len(data["pr_time_open_sketch"])
+        for data in gh.stats["users"].values()
+        if data["pr_time_open_sketch"]
+    )
+    workflows = gh.stats["workflows"]
+    assert len(workflows["run_time_sketch"]) == sum(
+        len(data["run_time_sketch"]) for data in workflows["workflows"].values()
+    )
+    for data in workflows["workflows"].values():
+        assert len(data["run_time_sketch"]) == data["total_window_runs"]
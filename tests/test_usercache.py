@@ -0,0 +1,111 @@
+import sqlite3
+import time
+
+import pytest
+
+from github_stats.github_api import GithubAccess
+from github_stats.usercache import UserCache, UserNotFound, load_user_cache
+from tests.fake_github import FakeGithub, FakeRepo
+
+
+def _user_lookups(fake):
+    return sum(v for k, v in fake.requests.items() if k.startswith("/users/"))
+
+
+def test_user_cache_persists_between_runs(tmp_path):
+    with FakeGithub(users=15, workflow_runs=50) as fake:
+        config = fake.config(tmp_path)
+        for _ in range(2):
+            # a fresh cache per run, like separate collector processes
+            user_cache = load_user_cache(config)
+            gh = GithubAccess(config, repo=FakeRepo(fake), user_cache=user_cache)
+            gh.load_all_stats(fake.base_date, 30)
+            user_cache.close()
+    # the second run resolved everyone (and 'unknown') from disk
+    assert _user_lookups(fake) == 15 + 1
+    assert user_cache.hits >= 16 and user_cache.misses == 0
+    db = sqlite3.connect(tmp_path / ".user-cache.sqlite3")
+    assert db.execute("SELECT count(*) FROM users WHERE missing = 1").fetchone() == (1,)
+    assert db.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    assert load_user_cache(config).login_for_email("USER3@example.com") == "user3"
+
+
+def test_user_cache_expiry(tmp_path):
+    path = str(tmp_path / "users.sqlite3")
+    fetched = list()
+
+    def fetch(login):
+        fetched.append(login)
+        if login == "ghost":
+            error = Exception("404 Not Found")
+            error.response = type("Response", (), {"status_code": 404})()
+            raise error
+        if login == "flaky":
+            raise Exception("500 Server Error")
+        return {"name": login.title()}
+
+    cache = UserCache(path, ttl=60, negative_ttl=60)
+    assert cache.get("alice", fetch)["name"] == "Alice"
+    for _ in range(2):
+        with pytest.raises(UserNotFound):
+            cache.get("ghost", fetch)
+        # other failures aren't cached
+        with pytest.raises(Exception, match="500"):
+            cache.get("flaky", fetch)
+    assert fetched == ["alice", "ghost", "flaky", "flaky"]
+
+    # entries expire on disk too
+    later = UserCache(path, ttl=60, negative_ttl=60)
+    later.get("alice", fetch)
+    assert fetched.count("alice") == 1
+    real_time = time.time
+    time.time = lambda: real_time() + 120
+    try:
+        later.get("alice", fetch)
+        with pytest.raises(UserNotFound):
+            later.get("ghost", fetch)
+    finally:
+        time.time = real_time
+    assert fetched.count("alice") == 2 and fetched.count("ghost") == 2
+
+
+def test_login_for_email_index(tmp_path):
+    path = str(tmp_path / "users.sqlite3")
+    queries = list()
+
+    def fetch(login):
+        return {"name": login.title(), "email": f"{login}@Example.com"}
+
+    cache = UserCache(path)
+    cache._db.set_trace_callback(queries.append)
+    assert cache.login_for_email("bob@example.com") is None
+    # unmatched emails are remembered until we learn a new one
+    assert cache.login_for_email("bob@example.com") is None
+    assert len([q for q in queries if "FROM emails" in q]) == 1
+    cache.get("bob", fetch)
+    queries.clear()
+    assert cache.login_for_email("BOB@example.com") == "bob"
+    assert queries == []
+
+    # another process finds it on disk once, then in memory
+    other = UserCache(path)
+    other._db.set_trace_callback(queries.append)
+    for _ in range(3):
+        assert other.login_for_email("bob@example.com") == "bob"
+    assert len(queries) == 1
+    assert UserCache().login_for_email("bob@example.com") is None
+
+
+def test_commit_author_email_matching(tmp_path):
+    author = "U. Three <user3@example.com>"
+    with FakeGithub(users=15, workflow_runs=50) as fake:
+        gh = GithubAccess(fake.config(tmp_path), repo=FakeRepo(fake))
+        gh.load_all_stats(fake.base_date, 30)
+        # off by default, so attribution stays the same as it always was
+        assert gh._cache_commit_author(author) == "unknown"
+
+        config = fake.config(tmp_path, match_author_emails=True)
+        gh = GithubAccess(config, repo=FakeRepo(fake))
+        gh.load_all_stats(fake.base_date, 30)
+        assert gh._cache_commit_author(author) == "User 3"
+        assert gh._cache_commit_author("Nobody <nobody@example.com>") == "unknown"
@@ -0,0 +1,38 @@
+from copy import deepcopy
+
+from github_stats.outputs import StatsOutput
+from github_stats.userstats import UserStats
+from tests.test_outputs import CONFIG, _stats
+
+
+def test_user_stats_reads_like_a_dict():
+    user = UserStats()
+    user["total_commits"] += 2
+    assert user["total_commits"] == 2
+    # unused maps aren't allocated
+    assert user["workflows"] == {} and user.workflows is None
+    user.add_event("push")
+    user.add_workflow_run("build", "success", 10)
+    user.add_workflow_run("build", "success", 5)
+    user.add_workflow_run("lint", "failure", 1)
+    assert user["events"] == {"push": 1}
+    assert user["workflows"]["build"]["success"]["count"] == 2
+    assert user["workflow_totals"]["success"]["runtime"] == 15
+    assert deepcopy(user)["workflow_totals"] == user["workflow_totals"]
+    assert sorted(user.export(["events", "branches"])) == ["events"]
+
+
+def test_outputs_read_user_stats():
+    stats = _stats()
+    user = UserStats()
+    user["total_commits"] = 4
+    user.add_workflow_run("build", "success", 10)
+    stats["users"]["someone"] = user
+    series = {
+        (s["name"], s["labels"].get("workflow")): s["value"]
+        for s in StatsOutput(CONFIG).build_stats(stats)
+        if s["labels"].get("user") == "someone"
+    }
+    assert series[("users_commits_total", None)] == 4
+    assert series[("users_workflow_total", "build")] == 1
+    assert series[("users_workflow_runtime_total", "build")] == 10